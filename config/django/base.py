@@ -92,6 +92,51 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# Shared between gunicorn workers so climatology results are only computed once per dataset version.
+# Defaults to a file based cache, point CACHE_BACKEND/CACHE_LOCATION at memcached or redis in larger deployments.
+
+CACHES = {
+    'default': {
+        'BACKEND': env.str('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': env.str('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', 20000),
+        },
+    },
+    # climatologies (see core.api.views.get_climatologies) have their own cache so they don't cull, or get culled by,
+    # the default cache's entries. There's one ~50 KB entry per MPA, model, type, depth and indicator series, set
+    # MAX_ENTRIES above the number of TimeseriesCatalog rows. The default, 100000 entries, is about 5 GB.
+    'climatology': {
+        'BACKEND': env.str('CLIMATOLOGY_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': env.str('CLIMATOLOGY_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'climatology')),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('CLIMATOLOGY_CACHE_MAX_ENTRIES', 100000),
+        },
+    },
+}
+
+# Map tiles are cached as files under this directory (see core.tiles), it's cleared when the MPA shapes are reloaded
+TILE_CACHE_DIR = env.str('TILE_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'tiles'))
+
+# GeoTIFFs of the spatial raster sets, rendered to PNG tiles by core.rasters. The raster tile cache evicts the least
+# recently used tiles once it grows past RASTER_TILE_CACHE_MAX_BYTES.
+RASTER_DIR = env.str('RASTER_DIR', os.path.join(BASE_DIR, 'core', 'static', 'core', 'spatial'))
+RASTER_TILE_CACHE_MAX_BYTES = env.int('RASTER_TILE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+# Quantized multi-band payloads of the raster sets, one file per set version (see core.rasters.get_raster_stack)
+RASTER_STACK_CACHE_DIR = env.str('RASTER_STACK_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'rasters'))
+
+# PDF reports rendered by the run_report_worker command (see core.reports). A job still running after
+# REPORT_JOB_TIMEOUT seconds is assumed lost with its worker and queued again.
+REPORT_CACHE_DIR = env.str('REPORT_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'reports'))
+REPORT_JOB_TIMEOUT = env.int('REPORT_JOB_TIMEOUT', 600)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
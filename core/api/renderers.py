@@ -0,0 +1,136 @@
+import json
+import struct
+
+import numpy as np
+import pyarrow as pa
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class BinaryRenderer(BaseRenderer):
+    """Base for renderers producing binary responses, errors are still rendered as JSON"""
+    charset = None
+    render_style = 'binary'
+
+    @staticmethod
+    def render_error(data, renderer_context):
+        # errors are still reported as JSON so the client can read them
+        response = renderer_context.get('response') if renderer_context else None
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return json.dumps(data, cls=JSONEncoder).encode('utf-8')
+
+    @staticmethod
+    def is_error(renderer_context):
+        response = renderer_context.get('response') if renderer_context else None
+        return response is not None and response.status_code >= 400
+
+
+class TimeseriesBinaryRenderer(BinaryRenderer):
+    """
+    Base for the binary timeseries formats. Views check for this class to decide whether to build the columnar
+    payload, where 'data' is a dict of start_epoch_day, step (days), length and a dict of float32 columns on a
+    dense daily grid (NaN where there's no value). Every other key in the payload is passed along as metadata.
+    """
+
+    @staticmethod
+    def split_payload(data):
+        columnar = data.get('data') or {'start_epoch_day': None, 'step': 1, 'length': 0, 'columns': {}}
+        metadata = {key: value for key, value in data.items() if key != 'data'}
+        metadata.update({
+            'start_epoch_day': columnar['start_epoch_day'],
+            'step': columnar['step'],
+            'length': columnar['length'],
+            'columns': list(columnar['columns'].keys()),
+        })
+
+        columns = {name: np.asarray(column, dtype='<f4') for name, column in columnar['columns'].items()}
+        return metadata, columns
+
+
+class Float32Renderer(TimeseriesBinaryRenderer):
+    """
+    Raw little-endian float32 columns.
+
+    Layout: uint32 header length | UTF-8 JSON header, space padded to a 4 byte boundary | one float32 array of
+    'length' values per column, in the order listed in the header's 'columns' entry.
+    """
+    media_type = 'application/octet-stream'
+    format = 'f32'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if self.is_error(renderer_context):
+            return self.render_error(data, renderer_context)
+
+        metadata, columns = self.split_payload(data)
+
+        header = json.dumps(metadata, cls=JSONEncoder).encode('utf-8')
+        header += b' ' * (-(len(header) + 4) % 4)
+
+        return b''.join([struct.pack('<I', len(header)), header] + [column.tobytes() for column in columns.values()])
+
+
+class ArrowStreamRenderer(TimeseriesBinaryRenderer):
+    """Apache Arrow IPC stream with one float32 field per column, metadata is stored as JSON on the schema"""
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if self.is_error(renderer_context):
+            return self.render_error(data, renderer_context)
+
+        metadata, columns = self.split_payload(data)
+
+        table = pa.table(
+            {name: pa.array(column, type=pa.float32()) for name, column in columns.items()},
+            metadata={'dto': json.dumps(metadata, cls=JSONEncoder)}
+        )
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        return sink.getvalue().to_pybytes()
+
+
+class MVTRenderer(BinaryRenderer):
+    """Mapbox Vector Tile, the view's data is the already encoded tile"""
+    media_type = 'application/vnd.mapbox-vector-tile'
+    format = 'mvt'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if self.is_error(renderer_context):
+            return self.render_error(data, renderer_context)
+
+        return data or b''
+
+
+class PNGRenderer(BinaryRenderer):
+    """PNG image, the view's data is the already encoded image"""
+    media_type = 'image/png'
+    format = 'png'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if self.is_error(renderer_context):
+            return self.render_error(data, renderer_context)
+
+        return data or b''
+
+
+class RasterStackRenderer(BinaryRenderer):
+    """Quantized multi-band raster set (see core.rasters.build_raster_stack), the view's data is the encoded stack"""
+    media_type = 'application/octet-stream'
+    format = 'stack'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if self.is_error(renderer_context):
+            return self.render_error(data, renderer_context)
+
+        return data or b''
@@ -1,8 +1,11 @@
 # core/serializers.py
 import json
+import math
 
+from django.urls import reverse
 from rest_framework import serializers
-from core import models
+from core import models, rasters
+from core.geometry import FULL_RESOLUTION
 
 
 class ClimateModelSerialzier(serializers.ModelSerializer):
@@ -42,7 +45,7 @@ class MPAZonesWithoutGeometrySerializer(serializers.ModelSerializer):
                 "url": instance.url_e,
                 "class": instance.classification.name_e,
                 "km2": instance.km2,
-                "depths": list(instance.timeseries.order_by('depth').values_list('depth', flat=True).distinct())
+                "depths": self.get_depths(instance)
             }
         }
         return representation
@@ -50,6 +53,12 @@ class MPAZonesWithoutGeometrySerializer(serializers.ModelSerializer):
     def get_sorted_zones(self, queryset):
         return queryset.order_by('-km2')
 
+    def get_depths(self, instance):
+        # read from the series catalog, which querysets can prefetch, rather than the Timeseries table.
+        # Sorted ascending with the total average (None) last, the way the database orders them.
+        depths = {entry.depth for entry in instance.timeseries_catalog.all()}
+        return sorted(depths, key=lambda depth: (depth is None, depth or 0))
+
 
 class MPAZonesSerializer(MPAZonesWithoutGeometrySerializer):
     class Meta:
@@ -59,16 +68,24 @@ class MPAZonesSerializer(MPAZonesWithoutGeometrySerializer):
     def to_representation(self, instance):
         # Create a proper GeoJSON Feature object
         representation = super().to_representation(instance)
-        if hasattr(instance, 'serialized_representation') and instance.serialized_representation:
-            representation['geometry'] = instance.serialized_representation
-        else:
-            representation['geometry'] = json.loads(instance.geom.geojson) if instance.geom else None
-            if representation['geometry']:
-                instance.serialized_representation = representation['geometry']
-                instance.save()
+        representation['geometry'] = self.get_geometry(instance)
 
         return representation
 
+    def get_geometry(self, instance):
+        # the views put the requested resolution in the context, the simplified geometries are generated when the
+        # MPA shapes are loaded. This is a read path so nothing is saved here.
+        resolution = self.context.get('resolution', FULL_RESOLUTION)
+        if resolution != FULL_RESOLUTION:
+            for geometry in instance.geometries.all():
+                if geometry.resolution == resolution:
+                    return geometry.geometry
+
+        if instance.serialized_representation:
+            return instance.serialized_representation
+
+        return json.loads(instance.geom.geojson) if instance.geom else None
+
 
 class SpeciesSerializer(serializers.ModelSerializer):
     # Create custom fields for choice fields
@@ -110,9 +127,39 @@ class SpatialReferencesSerializer(serializers.ModelSerializer):
 
 
 class RastersSerializer(serializers.ModelSerializer):
+    tile_url = serializers.SerializerMethodField()
+    sample_url = serializers.SerializerMethodField()
+    zonal_url = serializers.SerializerMethodField()
+    bounds = serializers.SerializerMethodField()
+    nodata = serializers.SerializerMethodField()
+
     class Meta:
         model = models.Rasters
-        fields = ['id', 'order', 'label', 'file_name']
+        fields = ['id', 'order', 'label', 'file_name', 'tile_url', 'sample_url', 'zonal_url', 'bounds', 'crs',
+                  'nodata', 'min_value', 'max_value', 'stretch_min', 'stretch_max']
+
+    def get_bounds(self, instance):
+        # [[south, west], [north, east]] in WGS84, the order Leaflet takes bounds in
+        if instance.left is None:
+            return None
+        return [[instance.bottom, instance.left], [instance.top, instance.right]]
+
+    def get_nodata(self, instance):
+        # NaN isn't valid JSON, send it as the string JavaScript's parseFloat understands
+        if instance.nodata is not None and math.isnan(instance.nodata):
+            return 'NaN'
+        return instance.nodata
+
+    def get_tile_url(self, instance):
+        # Leaflet style {z}/{x}/{y} template for the raster's PNG tiles
+        url = reverse('api:raster-tiles', kwargs={'raster_id': instance.pk, 'z': 0, 'x': 0, 'y': 0})
+        return url[:-len('0/0/0.png')] + '{z}/{x}/{y}.png'
+
+    def get_sample_url(self, instance):
+        return reverse('api:raster-sample', kwargs={'raster_id': instance.pk})
+
+    def get_zonal_url(self, instance):
+        return reverse('api:raster-zonal', kwargs={'raster_id': instance.pk})
 
 
 class ColorRampsSerializer(serializers.ModelSerializer):
@@ -125,7 +172,19 @@ class SpatialRasterSetsSerializer(serializers.ModelSerializer):
     references = SpatialReferencesSerializer(many=True, read_only=True)
     rasters = RastersSerializer(many=True, read_only=True)
     color = ColorRampsSerializer(read_only=True)
+    value_range = serializers.SerializerMethodField()
+    stack_url = serializers.SerializerMethodField()
 
     class Meta:
         model = models.SpatialRasterSets
-        fields = ['id', 'title', 'label', 'description', 'units', 'precision', 'references', 'rasters', 'color']
\ No newline at end of file
+        fields = ['id', 'title', 'label', 'description', 'units', 'precision', 'references', 'rasters', 'color',
+                  'value_range', 'stack_url']
+
+    def get_stack_url(self, instance):
+        return reverse('api:spatial-raster-set-stack', kwargs={'set_id': instance.pk})
+
+    def get_value_range(self, instance):
+        # the range the raster tiles are coloured over, for the colour bar. Only the stored ranges are used, listing
+        # the sets shouldn't read every raster file, load_rasters stores them when the rasters are loaded
+        minimum, maximum = rasters.stored_value_range(instance)
+        return {'min': minimum, 'max': maximum}
\ No newline at end of file
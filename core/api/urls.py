@@ -11,7 +11,12 @@ from .views import (
     SelectedDateDataView,
     TimeseriesDataView,
     QuantileDataView,
-    SpatialRasterSetsViewSet
+    SpatialRasterSetsViewSet,
+    MPATileView,
+    RasterTileView,
+    RasterSampleView,
+    RasterZonalView,
+    SpatialRasterSetStackView
 )
 from .. import api
 
@@ -30,6 +35,11 @@ api_urlpatterns = router.urls + [
     path('timeseries-data/', TimeseriesDataView.as_view(), name='timeseries-data'),
     path('quantile-data/', QuantileDataView.as_view(), name='quantile-data'),
     path('climate-aois/', AOIListView.as_view(), name='climate-aois'),
+    path('tiles/mpas/<str:model>/<int:z>/<int:x>/<int:y>.mvt', MPATileView.as_view(), name='mpa-tiles'),
+    path('tiles/rasters/<int:raster_id>/<int:z>/<int:x>/<int:y>.png', RasterTileView.as_view(), name='raster-tiles'),
+    path('rasters/<int:raster_id>/sample/', RasterSampleView.as_view(), name='raster-sample'),
+    path('rasters/<int:raster_id>/zonal/', RasterZonalView.as_view(), name='raster-zonal'),
+    path('spatial-raster-sets/<int:set_id>/stack/', SpatialRasterSetStackView.as_view(), name='spatial-raster-set-stack'),
 ]
 
 urlpatterns = [
@@ -1,25 +1,57 @@
+import gzip
+import os
+
 import pandas as pd
 import numpy as np
 
-from functools import lru_cache
-
-from django.db.models import Min, Max
+from django.core.cache import caches
+from django.db.models import F, Prefetch
 
 from django.http import JsonResponse
 
 from rest_framework import viewsets, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.settings import api_settings
 
 from core.api.pagination import CustomPageNumberPagination
+from core.api.renderers import TimeseriesBinaryRenderer, ArrowStreamRenderer, Float32Renderer, MVTRenderer, \
+    PNGRenderer, RasterStackRenderer
 from core.api.serializers import AreaOfInterestSerializer, MPAZonesSerializer, MPAZonesWithoutGeometrySerializer, \
     SpeciesSerializer, SpatialRasterSetsSerializer
-from core import models
+from core import models, rasters, tiles
+from core.climatology import Climatology, compute_climatology, day_of_year_index
+from core.geometry import FULL_RESOLUTION, RESOLUTION_NAMES, resolution_for_zoom
 from core.models import SpatialRasterSets
 
 
+def get_timeseries_array_dataframe(mpa_zone: models.MPAZones, ts_model=1, ts_type=1, depth=None, start_date=None, end_date=None, indicator=1):
+    """Builds the timeseries dataframe from a single packed TimeseriesArrays row, returns None if the series isn't packed"""
+    series = mpa_zone.timeseries_arrays.filter(
+        model__pk=ts_model,
+        type=ts_type,
+        depth=depth,
+        indicator=indicator
+    ).first()
+
+    if series is None:
+        return None
+
+    dates, values = series.get_series(start_date, end_date)
+    if not len(dates):
+        return None
+
+    return pd.DataFrame({'value': values}, index=pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='date_time'))
+
+
 def get_timeseries_dataframe(mpa_zone: models.MPAZones, ts_model=1, ts_type=1, depth=None, start_date=None, end_date=None, indicator=1):
+    # prefer the packed series, it's one row fetch instead of one row per day
+    df = get_timeseries_array_dataframe(mpa_zone, ts_model, ts_type, depth, start_date, end_date, indicator)
+    if df is not None:
+        return df
+
     mpa_timeseries = mpa_zone.timeseries.filter(
         model__pk=ts_model,
         type=ts_type,
@@ -75,35 +107,79 @@ def get_timeseries_dataframe_with_observations(mpa_zone: models.MPAZones, ts_mod
     return dataframe
 
 
-@lru_cache(maxsize=128)
-def _get_cached_climatology_data(mpa_zone_id, ts_model, ts_type, depth, indicator):
-    """Cached helper that returns climatology data dict for a given MPA/model/type/depth/indicator combo"""
-    mpa_zone = models.MPAZones.objects.get(pk=mpa_zone_id)
+def get_data_version(ts_model):
+    return models.ClimateModels.objects.filter(pk=ts_model).values_list('data_version', flat=True).first()
 
-    df = get_timeseries_dataframe_with_observations(mpa_zone, ts_model, ts_type, depth, indicator=indicator)
+
+def get_climatology_cache_key(mpa_zone_id, ts_model, ts_type, depth, indicator, data_version):
+    """Cache key for a climatology, includes the model's dataset version so reloading a model invalidates it"""
+    return f"climatology:{mpa_zone_id}:{ts_model}:{ts_type}:{depth}:{indicator}:v{data_version}"
+
+
+def _load_climatology_data(mpa_zone_id, ts_model, ts_type, depth, indicator) -> Climatology:
+    """Computes the day of year climatology for a given MPA/model/type/depth/indicator combo from the daily data"""
+    # the climatology wasn't materialized when the series was loaded, compute it from the daily data
+    mpa_zone = models.MPAZones.objects.get(pk=mpa_zone_id)
+    df = get_timeseries_dataframe(mpa_zone, ts_model, ts_type, depth, indicator=indicator)
     if df is None:
         raise ValueError(f"No data found for zone {mpa_zone}")
 
-    # our climatology data is based off the first 30 years of data we have
-    timeseries_30_year = df[(df.index <= '2022-12-31')]
-    grouped = timeseries_30_year.groupby([timeseries_30_year.index.month, timeseries_30_year.index.day])
+    return compute_climatology(df.index, df['value'].to_numpy())
+
+
+def get_climatologies(mpa_zone_ids, ts_model, ts_type, depth, indicator, refresh=False) -> dict:
+    """
+    Returns a {zone id: Climatology} dict for several zones at once, zones without data are left out.
+
+    Climatologies come from the shared 'climatology' cache in one round trip, misses are read from the Climatologies
+    table in one query and only computed from the daily data if they were never materialized. The cache is shared by
+    every worker process, so each climatology is only built once per dataset version.
+    """
+    data_version = get_data_version(ts_model)
+    keys = {zone_id: get_climatology_cache_key(zone_id, ts_model, ts_type, depth, indicator, data_version)
+            for zone_id in mpa_zone_ids}
+
+    climatologies = {}
+    if not refresh:
+        cached = caches['climatology'].get_many(keys.values())
+        climatologies = {zone_id: Climatology.from_bytes(cached[key]) for zone_id, key in keys.items() if key in cached}
+
+    missing = [zone_id for zone_id in keys if zone_id not in climatologies]
+    if not missing:
+        return climatologies
+
+    stored = models.Climatologies.objects.filter(
+        series__zone__pk__in=missing,
+        series__model__pk=ts_model,
+        series__type=ts_type,
+        series__depth=depth,
+        series__indicator=indicator
+    ).annotate(zone_id=F('series__zone'))
+    for climatology in stored:
+        climatologies[climatology.zone_id] = climatology.get_climatology()
+
+    for zone_id in missing:
+        if zone_id not in climatologies:
+            try:
+                climatologies[zone_id] = _load_climatology_data(zone_id, ts_model, ts_type, depth, indicator)
+            except ValueError:
+                continue
 
-    # Calculate min/max deltas
-    max_val = df[(df.value == df.max().value)]
-    min_val = df[(df.value == df.min().value)]
+    caches['climatology'].set_many(
+        {keys[zone_id]: climatologies[zone_id].to_bytes() for zone_id in missing if zone_id in climatologies},
+        timeout=None
+    )
 
-    climatology = grouped.quantile()
-    std = grouped.std()
+    return climatologies
 
-    max_delta = df.max().value - climatology.loc[(max_val.index.month[0], max_val.index.day[0])].value
-    min_delta = df.min().value - climatology.loc[(min_val.index.month[0], min_val.index.day[0])].value
 
-    return {
-        'std': std,
-        'climatology': climatology,
-        'max_delta': max_delta,
-        'min_delta': min_delta
-    }
+def get_climatology_data(mpa_zone_id, ts_model, ts_type, depth, indicator, refresh=False) -> Climatology:
+    """Returns the climatology for a single MPA/model/type/depth/indicator combo"""
+    climatologies = get_climatologies([mpa_zone_id], ts_model, ts_type, depth, indicator, refresh=refresh)
+    if mpa_zone_id not in climatologies:
+        raise ValueError(f"No data found for zone {mpa_zone_id}")
+
+    return climatologies[mpa_zone_id]
 
 
 def get_base_timeseries(mpa_zone, ts_model=1, ts_type=1, depth=None, indicator=1):
@@ -112,17 +188,99 @@ def get_base_timeseries(mpa_zone, ts_model=1, ts_type=1, depth=None, indicator=1
     if df is None:
         raise ValueError(f"No data found for zone {mpa_zone}")
 
-    # Get cached climatology data
-    data_dict = _get_cached_climatology_data(mpa_zone.pk, ts_model, ts_type, depth, indicator)
+    climatology = get_climatology_data(mpa_zone.pk, ts_model, ts_type, depth, indicator)
 
-    # Add the grouped data reference (not cached since it's a GroupBy object)
-    timeseries_30_year = df[(df.index <= '2022-12-31')]
-    data_dict['data'] = timeseries_30_year.groupby([timeseries_30_year.index.month, timeseries_30_year.index.day])
+    return df, climatology
 
-    return df, data_dict
 
+def format_dates(index: pd.DatetimeIndex):
+    """Dates are sent to the charts as 'YYYY-MM-DD 00:01' strings"""
+    return [f'{date} 00:01' for date in np.datetime_as_string(index.values, unit='D').tolist()]
+
+
+def build_timeseries_records(df: pd.DataFrame, climatology: Climatology, ts_type):
+    """
+    Build the timeseries payload column-wise. The climatology and standard deviation are aligned to the rows
+    with a single take on the day of year index rather than a lookup per row.
+    """
+    days = day_of_year_index(df.index)
+    type_label = dict(models.Timeseries.TIMESERIES_TYPES).get(ts_type)
+
+    dates = format_dates(df.index)
+    ts_data = [str(value) for value in df['value'].tolist()]
+    climatologies = [str(value) for value in climatology.median[days].tolist()]
+    std_devs = [str(value) for value in climatology.std[days].tolist()]
+
+    observations = [None] * len(df)
+    if 'observation' in df.columns:
+        observed = df['observation'].notnull().to_numpy()
+        observations = [
+            {'value': value, 'count': count, 'std_dev': std} if has_observation else None
+            for has_observation, value, count, std in zip(
+                observed,
+                df['observation'].tolist(),
+                df['count'].astype(float).tolist(),
+                df['std'].astype(float).tolist()
+            )
+        ]
+
+    return [{
+        "type": {
+            "id": ts_type,
+            "label": type_label,
+        },
+        "date": date,
+        "ts_data": value,
+        "climatology": clim,
+        "std_dev": std,
+        "observation": observation
+    } for date, value, clim, std, observation in zip(dates, ts_data, climatologies, std_devs, observations)]
 
-def get_timeseries_data(mpa_id, ts_model=1, ts_type=1, depth=None, start_date=None, end_date=None, indicator=1):
+
+def build_quantile_records(df: pd.DataFrame, lower, upper):
+    """Build the quantile payload, lower and upper are 366 element day of year quantile arrays"""
+    days = day_of_year_index(df.index)
+
+    return [{"date": date, "lowerq": lowerq, "upperq": upperq}
+            for date, lowerq, upperq in zip(
+                format_dates(df.index),
+                [str(value) for value in lower[days].tolist()],
+                [str(value) for value in upper[days].tolist()]
+            )]
+
+
+def build_columns(df: pd.DataFrame, row_columns: dict, day_of_year_columns: dict):
+    """
+    Lay columns out on a dense daily grid covering the dataframe's date range for the binary renderers.
+
+    row_columns: arrays aligned with the dataframe rows, days without a row are NaN
+    day_of_year_columns: 366 element day of year arrays, e.g. the climatology or quantiles
+    """
+    if df.empty:
+        return {'start_epoch_day': None, 'step': 1, 'length': 0, 'columns': {}}
+
+    days = df.index.values.astype('datetime64[D]')
+    offsets = (days - days[0]).astype(np.int64)
+    length = int(offsets[-1]) + 1
+
+    columns = {}
+    for name, column in row_columns.items():
+        columns[name] = np.full(length, np.nan, dtype='<f4')
+        columns[name][offsets] = column
+
+    grid_days = day_of_year_index(pd.date_range(days[0], periods=length))
+    for name, column in day_of_year_columns.items():
+        columns[name] = np.asarray(column)[grid_days].astype('<f4')
+
+    return {
+        'start_epoch_day': int(days[0].astype(np.int64)),
+        'step': 1,
+        'length': length,
+        'columns': columns
+    }
+
+
+def get_timeseries_data(mpa_id, ts_model=1, ts_type=1, depth=None, start_date=None, end_date=None, indicator=1, columnar=False):
     results = {}
 
     if mpa_id == -1 or not models.MPAZones.objects.filter(pk=mpa_id).exists():
@@ -131,10 +289,10 @@ def get_timeseries_data(mpa_id, ts_model=1, ts_type=1, depth=None, start_date=No
     mpa_zone = models.MPAZones.objects.get(pk=mpa_id)
     results['name'] = mpa_zone.name_e
 
-    df, data_dict = get_base_timeseries(mpa_zone, ts_model, ts_type, depth, indicator)
+    df, climatology = get_base_timeseries(mpa_zone, ts_model, ts_type, depth, indicator)
 
-    results['max_delta'] = data_dict['max_delta']
-    results['min_delta'] = data_dict['min_delta']
+    results['max_delta'] = climatology.max_delta
+    results['min_delta'] = climatology.min_delta
 
     df = df[(df.index >= start_date) & (df.index <= end_date)]
 
@@ -144,26 +302,23 @@ def get_timeseries_data(mpa_id, ts_model=1, ts_type=1, depth=None, start_date=No
         rmse = np.sqrt(df['squared_error'].mean())
         results['rmse'] = rmse
 
-    results['data'] = [{
-        "type": {
-            "id": ts_type,
-            "label": dict(models.Timeseries.TIMESERIES_TYPES).get(ts_type),
-        },
-        "date": f'{date.strftime("%Y-%m-%d")} 00:01',
-        "ts_data": str(daily_data['value'].item()),
-        "climatology": f'{data_dict['climatology']["value"][date.month, date.day]}',
-        "std_dev": f'{data_dict['std']["value"][date.month, date.day]}',
-        "observation": ({
-            'value': daily_data['observation'],
-            'count': daily_data['count'],
-            'std_dev': daily_data['std'] } if 'observation' in daily_data and pd.notnull(daily_data['observation']) else None)
-    } for date, daily_data in df.iterrows()]
+    if columnar:
+        row_columns = {'value': df['value'].to_numpy()}
+        if 'observation' in df.columns:
+            row_columns.update({
+                'observation': df['observation'].to_numpy(),
+                'observation_count': df['count'].to_numpy(dtype=float),
+                'observation_std_dev': df['std'].to_numpy(dtype=float),
+            })
+        results['data'] = build_columns(df, row_columns, {'climatology': climatology.median, 'std_dev': climatology.std})
+    else:
+        results['data'] = build_timeseries_records(df, climatology, ts_type)
 
     return results
 
 
 def get_quantile_data(mpa_id, ts_model=1, ts_type=1, depth=None, start_date=None,
-                      end_date=None, indicator=1, quantile_upper=None, quantile_lower=None):
+                      end_date=None, indicator=1, quantile_upper=None, quantile_lower=None, columnar=False):
     results = {}
 
     if mpa_id == -1 or not models.MPAZones.objects.filter(pk=mpa_id).exists():
@@ -172,94 +327,157 @@ def get_quantile_data(mpa_id, ts_model=1, ts_type=1, depth=None, start_date=None
     mpa_zone = models.MPAZones.objects.get(pk=mpa_id)
     results['name'] = mpa_zone.name_e
 
-    df, data_dict = get_base_timeseries(mpa_zone, ts_model, ts_type, depth, indicator)
+    df, climatology = get_base_timeseries(mpa_zone, ts_model, ts_type, depth, indicator)
 
     if df is None:
         return None
 
-    lower = data_dict['data'].quantile(quantile_lower)
-    upper = data_dict['data'].quantile(quantile_upper)
+    lower = climatology.quantile(quantile_lower)
+    upper = climatology.quantile(quantile_upper)
 
     # the min/max delta is used by the progress bar to have an absolute zero and absolute max
-    results['max_delta'] = data_dict['max_delta']
-    results['min_delta'] = data_dict['min_delta']
+    results['max_delta'] = climatology.max_delta
+    results['min_delta'] = climatology.min_delta
 
     df = df[(df.index >= start_date) & (df.index <= end_date)]
-    results['data'] = [{"date": f'{date.strftime("%Y-%m-%d")} 00:01',
-                        "lowerq": f'{lower["value"][date.month, date.day]}',
-                        "upperq": f'{upper["value"][date.month, date.day]}'}
-                       for date, mt in df.iterrows()]
+    if columnar:
+        results['data'] = build_columns(df, {}, {'lowerq': lower, 'upperq': upper})
+    else:
+        results['data'] = build_quantile_records(df, lower, upper)
     return results
 
 
 def get_selected_date_data(mpa_id, selected_date, ts_model=1, ts_type=1, depth=None, lower_quantile=0.1, upper_quantile=0.9, indicator=1):
+    """
+    Point lookup for a single date, an indexed query for the day's value and observation plus the cached day of
+    year climatology. The cost doesn't depend on the length of the series.
+    """
+    if mpa_id == -1:
+        return {}
+
+    return get_selected_date_data_batch(
+        [mpa_id], selected_date, ts_model, ts_type, depth, lower_quantile, upper_quantile, indicator
+    )[mpa_id]
+
+
+def get_selected_date_data_batch(mpa_ids, selected_date, ts_model=1, ts_type=1, depth=None, lower_quantile=0.1,
+                                 upper_quantile=0.9, indicator=1):
+    """
+    Selected date data for several MPAs, returns a {mpa id: result} dict where each result matches
+    get_selected_date_data. Values and observations for the date are read for every zone in one query each and
+    the quantiles come from the day of year climatology samples, so the daily series are never loaded.
+    """
+    selected_date = pd.to_datetime(selected_date)
+    date_str = selected_date.strftime("%Y-%m-%d")
+    day = day_of_year_index([selected_date])[0]
 
-    results = {}
-    if mpa_id == -1 or not models.MPAZones.objects.filter(pk=mpa_id).exists():
-        return results
+    zones = dict(models.MPAZones.objects.filter(pk__in=mpa_ids).values_list('pk', 'name_e'))
+    climatologies = get_climatologies(list(zones), ts_model, ts_type, depth, indicator)
 
-    mpa_zone = models.MPAZones.objects.get(pk=mpa_id)
-    results['name'] = mpa_zone.name_e
+    values = dict(models.Timeseries.objects.filter(
+        zone__pk__in=climatologies.keys(),
+        model__pk=ts_model,
+        type=ts_type,
+        depth=depth,
+        indicator=indicator,
+        date_time=selected_date.date()
+    ).values_list('zone', 'value'))
+
+    observations = {}
+    if depth is not None:
+        observations = {observation['zone']: observation for observation in models.Observations.objects.filter(
+            zone__pk__in=values.keys(),
+            depth=depth,
+            indicator=indicator,
+            date_time=selected_date.date()
+        ).values('zone', 'value', 'count', 'std')}
 
-    df, data_dict = get_base_timeseries(mpa_zone, ts_model, ts_type, depth, indicator)
+    results = {}
+    for mpa_id in mpa_ids:
+        if mpa_id not in climatologies:
+            results[mpa_id] = {}
+            continue
+
+        climatology = climatologies[mpa_id]
+        result = {
+            'min_delta': climatology.min_delta,
+            'max_delta': climatology.max_delta,
+            'name': zones[mpa_id],
+            'data': {},
+            'quantile': {}
+        }
 
-    # Filter for just the selected date
-    selected_date = pd.to_datetime(selected_date)
-    date_data = df[df.index.date == selected_date.date()]
-
-    # Calculate climatology and quantiles
-    q_upper = float(upper_quantile)
-    q_lower = float(lower_quantile)
-
-    upper = data_dict['data'].quantile(q=q_upper)
-    lower = data_dict['data'].quantile(q=q_lower)
-
-    # Prepare combined response
-    results = {
-        'min_delta': data_dict['min_delta'],
-        'max_delta': data_dict['max_delta'],
-        'name': mpa_zone.name_e,
-        'data': {},
-        'quantile': {}
-    }
+        if mpa_id in values:
+            result['data'] = {
+                'date': f'{date_str} 00:01',
+                'ts_data': float(values[mpa_id]),
+                'climatology': float(climatology.median[day]),
+                'std_dev': float(climatology.std[day])
+            }
 
-    # If we have data for the selected date
-    if not date_data.empty:
-        row = date_data.iloc[0]
-        date_str = selected_date.strftime("%Y-%m-%d")
-
-        # Get the current value and climatology
-        results['data'] = {
-            'date': f'{date_str} 00:01',
-            'ts_data': float(row['value']),
-            'climatology': float(data_dict['climatology'].loc[(selected_date.month, selected_date.day), 'value']),
-            'std_dev': float(data_dict['std'].loc[(selected_date.month, selected_date.day), 'value'  ])
-        }
+            result['data']['observations'] = {'value': None, 'std_dev': None, 'count': None}
+            if (observation := observations.get(mpa_id)) and observation['value'] is not None:
+                result['data']['observations'] = {
+                    'value': observation['value'],
+                    'std_dev': float(observation['count']),
+                    'count': observation['std']
+                }
 
-        results['data']['observations'] = { 'value': None, 'std_dev': None, 'count': None }
-        if 'observation' in row and pd.notnull(row['observation']):
-            results['data']['observations'] = {
-                'value': row['observation'],
-                'std_dev': row['count'],
-                'count': row['std']
+            result['quantile'] = {
+                'date': f'{date_str} 00:01',
+                'lowerq': float(climatology.quantile(float(lower_quantile), days=day)),
+                'upperq': float(climatology.quantile(float(upper_quantile), days=day))
             }
 
-        # Get the quantile values
-        results['quantile'] = {
-            'date': f'{date_str} 00:01',
-            'lowerq': float(lower.loc[(selected_date.month, selected_date.day), 'value']),
-            'upperq': float(upper.loc[(selected_date.month, selected_date.day), 'value'])
-        }
+        results[mpa_id] = result
 
     return results
 
 
-class MPAZonesViewSet(viewsets.ModelViewSet):
-    queryset = models.MPAZones.objects.all()
+class MPAGeometryResolutionMixin:
+    """
+    Lets MPA listings choose one of the stored geometry resolutions with ?resolution=low|medium|high|full, or
+    with the map's ?zoom=<level>. The full resolution geometry is used when neither is given.
+    """
+
+    def get_resolution(self):
+        if resolution := self.request.GET.get('resolution'):
+            if resolution not in RESOLUTION_NAMES:
+                raise ValidationError({'resolution': f"Must be one of {', '.join(RESOLUTION_NAMES)}"})
+            return resolution
+
+        if zoom := self.request.GET.get('zoom'):
+            try:
+                return resolution_for_zoom(int(zoom))
+            except ValueError:
+                raise ValidationError({'zoom': "Must be an integer zoom level"})
+
+        return FULL_RESOLUTION
+
+    def prefetch_geometries(self, queryset):
+        resolution = self.get_resolution()
+        if resolution == FULL_RESOLUTION:
+            return queryset
+
+        return queryset.prefetch_related(
+            Prefetch('geometries', queryset=models.MPAZoneGeometries.objects.filter(resolution=resolution))
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['resolution'] = self.get_resolution()
+        return context
+
+
+class MPAZonesViewSet(MPAGeometryResolutionMixin, viewsets.ModelViewSet):
+    queryset = models.MPAZones.objects.select_related('classification').prefetch_related('timeseries_catalog')
     serializer_class = MPAZonesSerializer
 
+    def get_queryset(self):
+        return self.prefetch_geometries(super().get_queryset())
+
 
-class MPAZonesWithTimeseriesViewSet(viewsets.ReadOnlyModelViewSet):
+class MPAZonesWithTimeseriesViewSet(MPAGeometryResolutionMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet that only returns MPAZones that have Timeseries data"""
     serializer_class = MPAZonesSerializer
     pagination_class = CustomPageNumberPagination
@@ -278,15 +496,15 @@ class MPAZonesWithTimeseriesViewSet(viewsets.ReadOnlyModelViewSet):
 
         model = int(self.request.session.get('selected_model', 1))
         ts_type = int(self.request.session.get('type', 1))
-        timeseries = models.Timeseries.objects.filter(type=ts_type, model__id=model)
+        catalog = models.TimeseriesCatalog.objects.filter(type=ts_type, model__id=model)
         if filter_mpas:
-            timeseries = timeseries.filter(zone__pk__in=filter_mpas)
+            catalog = catalog.filter(zone__pk__in=filter_mpas)
 
-        timeseries = timeseries.values_list('zone__pk', flat=True).distinct()
-        # Filter MPAZones that have at least one related Timeseries entry
-        return models.MPAZones.objects.filter(
-            pk__in=timeseries
-        ).order_by('-km2')
+        catalog = catalog.values_list('zone__pk', flat=True).distinct()
+        # Filter MPAZones that have at least one Timeseries, the serializer reads the depths from the catalog
+        return self.prefetch_geometries(models.MPAZones.objects.filter(
+            pk__in=catalog
+        ).select_related('classification').prefetch_related('timeseries_catalog').order_by('-km2'))
 
 
 class SpeciesViewSet(viewsets.ReadOnlyModelViewSet):
@@ -334,21 +552,16 @@ class HeatWaveIndicatorsViewSet(viewsets.ReadOnlyModelViewSet):
             mpa_ids = [int(mpa_id) for mpa_id in mpa_ids]
 
         # Build response object with data for each MPA
-        result = {}
-        for mpa_id in mpa_ids:
-            try:
-                result[mpa_id] = get_selected_date_data(
-                    mpa_id=mpa_id,
-                    ts_model=ts_model,
-                    ts_type=ts_type,
-                    selected_date=selected_date,
-                    depth=int(depth) if depth else None,
-                    lower_quantile=float(lower_quantile),
-                    upper_quantile=float(upper_quantile),
-                    indicator=int(indicator)
-                )
-            except ValueError as e:
-                result[mpa_id] = {}
+        result = get_selected_date_data_batch(
+            mpa_ids=mpa_ids,
+            ts_model=ts_model,
+            ts_type=ts_type,
+            selected_date=selected_date,
+            depth=int(depth) if depth else None,
+            lower_quantile=float(lower_quantile),
+            upper_quantile=float(upper_quantile),
+            indicator=int(indicator)
+        )
         return Response(result)
 
     def get_queryset(self):
@@ -388,6 +601,9 @@ class SelectedDateDataView(APIView):
 
 
 class TimeseriesDataView(APIView):
+    # JSON by default, Accept: application/vnd.apache.arrow.stream or application/octet-stream for columnar data
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ArrowStreamRenderer, Float32Renderer]
+
     def get(self, request):
         # Extract query parameters
         mpa_id = request.query_params.get('mpa_id')
@@ -414,12 +630,16 @@ class TimeseriesDataView(APIView):
             depth=int(depth) if depth else None,
             start_date=start_date,
             end_date=end_date,
-            indicator=int(indicator)
+            indicator=int(indicator),
+            columnar=isinstance(request.accepted_renderer, TimeseriesBinaryRenderer)
         )
         return Response(result)
 
 
 class QuantileDataView(APIView):
+    # JSON by default, Accept: application/vnd.apache.arrow.stream or application/octet-stream for columnar data
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ArrowStreamRenderer, Float32Renderer]
+
     def get(self, request):
         # Extract query parameters
         mpa_id = request.query_params.get('mpa_id')
@@ -451,7 +671,8 @@ class QuantileDataView(APIView):
             end_date=end_date,
             indicator=int(indicator),
             quantile_upper=float(upper_quantile),
-            quantile_lower=float(lower_quantile)
+            quantile_lower=float(lower_quantile),
+            columnar=isinstance(request.accepted_renderer, TimeseriesBinaryRenderer)
         )
         return Response(result)
 
@@ -480,57 +701,64 @@ class NetworkIndicatorsViewSet(viewsets.ReadOnlyModelViewSet):
         # if a year isn't provided then we'll include the indicator with all data.
         year = request.query_params.get('year', None)
 
-        climate_model = models.ClimateModels.objects.get(pk=ts_model)
-        for mid in mpa_ids:
-            zone = models.MPAZones.objects.get(site_id=mid)
-            db_indicators = zone.indicators.filter(model=climate_model)
-            if year:
-                db_indicators = db_indicators.filter(year=year)
+        # every indicator for the requested MPAs in one query, the per type min/max is stored on the type
+        db_indicators = models.Indicators.objects.filter(model=ts_model, zone__in=mpa_ids).select_related(
+            'zone', 'type').order_by('zone', 'type', 'year', 'pk')
+        if year:
+            db_indicators = db_indicators.filter(year=year)
+
+        weights = {
+            (zone_id, type_id): weight for zone_id, type_id, weight in
+            models.IndicatorWeights.objects.filter(zone__in=mpa_ids).values_list('zone', 'type', 'weight')
+        }
+
+        zone_indicators = {}
+        for db_indicator in db_indicators:
+            zone = db_indicator.zone
+            indicator_type_meta = db_indicator.type
 
-            if db_indicators:
-                indicator_types = db_indicators.values_list('type', flat=True).distinct()
-                indicator = {
+            if zone.site_id not in zone_indicators:
+                zone_indicators[zone.site_id] = {
                     "mpa": {
                         "id": zone.site_id,
                         "name": zone.name_e,
                     },
-                    "indicators": []
+                    "indicators": {}
                 }
-                for indicator_type in indicator_types:
-                    indicator_type_meta = models.IndicatorTypes.objects.get(pk=indicator_type)
-                    min_max = indicator_type_meta.indicators.exclude(value=np.nan).aggregate(
-                        min_value=Min('value'),
-                        max_value=Max('value')
-                    )
-                    min = min_max['min_value']
-                    max = min_max['max_value']
-
-                    indicator_meta = {
-                        "indicator_id": indicator_type_meta.id,
-                        "title": indicator_type_meta.name,
-                        "description": indicator_type_meta.description,
-                        "unit": indicator_type_meta.unit,
-                        "min": min,
-                        "max": max,
-                        "weight": zone.indicator_weights.get(type=indicator_type_meta).weight,
-                        "data": []
-                    }
-                    tmp_indicators = db_indicators.filter(type=indicator_type)
-                    for tmp_indicator in tmp_indicators:
-                        value = tmp_indicator.value
-                        # Ensure min and max are not equal to avoid division by zero
-                        if max != min:
-                            percentage = ((value - min) / (max - min)) * 100
-                        else:
-                            percentage = 0  # Default to 0 if min and max are the same
-                        indicator_meta["data"].append({
-                            "year": tmp_indicator.year,
-                            "value": str(value),
-                            "width": str(percentage),
-                            "colorbar": "success"
-                        })
-                    indicator["indicators"].append(indicator_meta)
 
+            type_indicators = zone_indicators[zone.site_id]["indicators"]
+            if indicator_type_meta.pk not in type_indicators:
+                type_indicators[indicator_type_meta.pk] = {
+                    "indicator_id": indicator_type_meta.id,
+                    "title": indicator_type_meta.name,
+                    "description": indicator_type_meta.description,
+                    "unit": indicator_type_meta.unit,
+                    "min": indicator_type_meta.min_value,
+                    "max": indicator_type_meta.max_value,
+                    "weight": weights.get((zone.site_id, indicator_type_meta.pk), 1),
+                    "data": []
+                }
+
+            min = indicator_type_meta.min_value
+            max = indicator_type_meta.max_value
+            value = db_indicator.value
+            # Ensure min and max are not equal to avoid division by zero
+            if max != min:
+                percentage = ((value - min) / (max - min)) * 100
+            else:
+                percentage = 0  # Default to 0 if min and max are the same
+            type_indicators[indicator_type_meta.pk]["data"].append({
+                "year": db_indicator.year,
+                "value": str(value),
+                "width": str(percentage),
+                "colorbar": "success"
+            })
+
+        # results are returned in the order the MPAs were requested
+        for mid in dict.fromkeys(int(mid) for mid in mpa_ids):
+            if mid in zone_indicators:
+                indicator = zone_indicators[mid]
+                indicator["indicators"] = list(indicator["indicators"].values())
                 results.append(indicator)
 
         return Response(results)
@@ -559,7 +787,7 @@ class AOIListView(generics.ListAPIView):
 
 
 class SpatialRasterSetsViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = SpatialRasterSets.objects.all().order_by("pk")
+    queryset = SpatialRasterSets.objects.select_related('color').prefetch_related('rasters', 'references').order_by("pk")
     serializer_class = SpatialRasterSetsSerializer
 
     def get_queryset(self):
@@ -572,4 +800,174 @@ class SpatialRasterSetsViewSet(viewsets.ReadOnlyModelViewSet):
         elif model_name:
             queryset = queryset.filter(model__name__iexact=model_name)
 
-        return queryset
\ No newline at end of file
+        return queryset
+
+
+class FirstRendererNegotiation(BaseContentNegotiation):
+    """Always use the view's first renderer, for endpoints with a single format whatever the Accept header says"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class MPATileView(APIView):
+    """
+    Vector tiles of the MPAs with data for a climate model, given by id or name, e.g.
+    /api/v1/tiles/mpas/CANSO500/6/20/22.mvt. Each feature has the site_id, name, class and colour of the MPA.
+    """
+    renderer_classes = [MVTRenderer]
+    content_negotiation_class = FirstRendererNegotiation
+
+    def get(self, request, model, z, x, y):
+        if not tiles.is_valid_tile(z, x, y):
+            raise NotFound(f"No tile {z}/{x}/{y}")
+
+        climate_models = models.ClimateModels.objects.all()
+        climate_model = (climate_models.filter(pk=int(model)) if model.isdigit() else
+                         climate_models.filter(name__iexact=model)).first()
+        if climate_model is None:
+            raise NotFound(f"Unknown climate model '{model}'")
+
+        response = Response(tiles.get_mpa_tile(climate_model, z, x, y))
+        response['Cache-Control'] = 'public, max-age=3600'
+        return response
+
+
+def get_raster(raster_id) -> models.Rasters:
+    """Raster with its set and colour ramp, NotFound if there's no such raster or its file is missing"""
+    raster = models.Rasters.objects.filter(pk=raster_id).select_related('spatial_set__color').first()
+    if raster is None:
+        raise NotFound(f"Unknown raster {raster_id}")
+
+    if not os.path.exists(rasters.raster_file_path(raster)):
+        raise NotFound(f"The file for raster {raster_id} is missing")
+
+    return raster
+
+
+class RasterTileView(APIView):
+    """
+    PNG tiles of a spatial raster, given by Rasters id, e.g. /api/v1/tiles/rasters/3/6/20/22.png. Pixels are
+    coloured with the raster set's colour ramp over the value range of the whole set, no data is transparent.
+    """
+    renderer_classes = [PNGRenderer]
+    content_negotiation_class = FirstRendererNegotiation
+
+    def get(self, request, raster_id, z, x, y):
+        if not tiles.is_valid_tile(z, x, y):
+            raise NotFound(f"No tile {z}/{x}/{y}")
+
+        response = Response(tiles.get_raster_tile(get_raster(raster_id), z, x, y))
+        response['Cache-Control'] = 'public, max-age=86400'
+        return response
+
+
+class RasterSampleView(APIView):
+    """
+    Value of a raster at a point, e.g. /api/v1/rasters/3/sample/?lat=44.5&lng=-62.1. The value is null outside the
+    raster or where it has no data.
+    """
+
+    def get(self, request, raster_id):
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+        except (KeyError, ValueError):
+            raise ValidationError("Required parameters 'lat' and 'lng' must be numbers")
+
+        raster = get_raster(raster_id)
+        return Response({
+            'raster': raster.pk,
+            'label': raster.label,
+            'units': raster.spatial_set.units,
+            'lat': lat,
+            'lng': lng,
+            'value': rasters.sample_raster(rasters.raster_file_path(raster), lng, lat),
+        })
+
+
+class RasterZonalView(APIView):
+    """
+    Statistics of a raster inside one or more MPAs, e.g. /api/v1/rasters/3/zonal/?mpa_id=1&mpa_id=2. Each MPA gets
+    the count, mean, std, min, max and percentiles of the pixels inside it, or null statistics if it covers none.
+    Statistics stored when the raster was loaded are read in one query, anything else is computed and cached per
+    raster and MPA.
+    """
+
+    def get(self, request, raster_id):
+        mpa_ids = request.query_params.getlist('mpa_id')
+        if not mpa_ids:
+            raise ValidationError("Missing required parameter: 'mpa_id'")
+        try:
+            mpa_ids = [int(mpa_id) for mpa_id in mpa_ids]
+        except ValueError:
+            raise ValidationError({'mpa_id': "Must be integer MPA ids"})
+
+        raster = get_raster(raster_id)
+        zones = models.MPAZones.objects.defer('geom', 'serialized_representation').in_bulk(mpa_ids)
+        missing = [mpa_id for mpa_id in mpa_ids if mpa_id not in zones]
+        if missing:
+            raise NotFound(f"Unknown MPAs {', '.join(str(mpa_id) for mpa_id in missing)}")
+
+        statistics = {stored.zone_id: stored.as_dict()
+                      for stored in raster.zonal_statistics.filter(zone__pk__in=mpa_ids)}
+        if statistics or raster.zonal_statistics.exists():
+            # the raster was summarized when it was loaded, MPAs without a row cover no valid pixels
+            statistics = {mpa_id: statistics.get(mpa_id) for mpa_id in mpa_ids}
+        else:
+            # computed from the MPA shapes, load them in one query instead of one deferred load per MPA
+            shapes = models.MPAZones.objects.only('geom').in_bulk(mpa_ids)
+            statistics = {mpa_id: rasters.get_zonal_statistics(raster, shapes[mpa_id]) for mpa_id in mpa_ids}
+
+        return Response({
+            'raster': raster.pk,
+            'label': raster.label,
+            'units': raster.spatial_set.units,
+            'results': [
+                {
+                    'mpa_id': mpa_id,
+                    'name': zones[mpa_id].name_e,
+                    'statistics': statistics[mpa_id],
+                }
+                for mpa_id in mpa_ids
+            ],
+        })
+
+
+class SpatialRasterSetStackView(APIView):
+    """
+    Every raster of a set as one quantized uint16 multi-band array, e.g. /api/v1/spatial-raster-sets/2/stack/, so
+    the client can switch between the months of a set without fetching each one. See core.rasters.build_raster_stack
+    for the layout. The stack is gzip compressed and revalidated with its ETag.
+    """
+    renderer_classes = [RasterStackRenderer]
+    content_negotiation_class = FirstRendererNegotiation
+
+    def get(self, request, set_id):
+        raster_set = SpatialRasterSets.objects.prefetch_related('rasters').filter(pk=set_id).first()
+        if raster_set is None:
+            raise NotFound(f"Unknown raster set {set_id}")
+        if not raster_set.rasters.all():
+            raise NotFound(f"Raster set {set_id} has no rasters")
+
+        try:
+            etag, payload = rasters.get_raster_stack(raster_set)
+        except FileNotFoundError:
+            raise NotFound(f"A file for raster set {set_id} is missing")
+
+        etag = f'"{etag}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=304)
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = Response(payload)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(gzip.decompress(payload))
+
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'public, no-cache'
+        return response
@@ -0,0 +1,120 @@
+import io
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# our climatology data is based off the first 30 years of data we have
+CLIMATOLOGY_END = '2022-12-31'
+
+# days in a leap year, every (month, day) pair gets a slot so Feb 29th is always addressable
+DAYS_IN_YEAR = 366
+
+
+def widen_float32(values) -> np.ndarray:
+    """
+    Widen stored float32 values to the float64 of their shortest decimal representation, so a stored 12.345 reads
+    back as 12.345 rather than 12.345000267028809, the same value the Timeseries rows hold.
+    """
+    return np.asarray(values, dtype=np.float32).astype(str).astype(np.float64)
+
+
+def day_of_year_index(dates):
+    """
+    Map dates onto a 0-365 index where each (month, day) pair always lands in the same slot, regardless of
+    whether the year is a leap year. This mirrors grouping a series by [index.month, index.day].
+    """
+    dates = pd.DatetimeIndex(dates)
+    index = dates.dayofyear.to_numpy() - 1
+    index[~dates.is_leap_year & (dates.month > 2)] += 1
+    return index
+
+
+class Climatology:
+    """
+    Day of year statistics for a single series.
+
+    median: 366 element array of the day of year median (the climatology)
+    std: 366 element array of the day of year standard deviation
+    samples: 366 x n-years array of the values in the climatology period, NaN padded, used for quantiles
+    max_delta/min_delta: difference between the series extremes and the climatology on the day they occurred
+    """
+
+    def __init__(self, median, std, samples, max_delta, min_delta):
+        self.median = median
+        self.std = std
+        self.samples = samples
+        self.max_delta = max_delta
+        self.min_delta = min_delta
+
+    def to_bytes(self) -> bytes:
+        """Serialize to a compact numpy archive for storage in a shared cache"""
+        deltas = np.array([
+            np.nan if self.max_delta is None else self.max_delta,
+            np.nan if self.min_delta is None else self.min_delta
+        ])
+        buffer = io.BytesIO()
+        np.savez(buffer, median=self.median, std=self.std, samples=self.samples.astype('<f4'), deltas=deltas)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Climatology':
+        with np.load(io.BytesIO(data)) as archive:
+            max_delta, min_delta = (None if np.isnan(delta) else float(delta) for delta in archive['deltas'])
+            return cls(
+                median=archive['median'],
+                std=archive['std'],
+                samples=widen_float32(archive['samples']),
+                max_delta=max_delta,
+                min_delta=min_delta
+            )
+
+    def quantile(self, q, days=None):
+        """Returns a 366 element array of the day of year quantile q, or just the quantile for the given day index(es)"""
+        samples = self.samples if days is None else self.samples[days]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            return np.nanquantile(samples, q, axis=-1)
+
+
+def compute_climatology(dates, values) -> Climatology:
+    """
+    Compute the day of year climatology for a daily series.
+
+    Parameters:
+    dates: array-like of dates
+    values: array-like of values, NaN values are skipped the same way a pandas groupby would skip them
+    """
+    dates = pd.DatetimeIndex(dates)
+    values = np.asarray(values, dtype=np.float64)
+
+    in_period = dates <= CLIMATOLOGY_END
+    period_dates = dates[in_period]
+    period_values = values[in_period]
+
+    day_index = day_of_year_index(period_dates)
+    years = period_dates.year.to_numpy()
+    first_year = years.min() if len(years) else 0
+    n_years = (years.max() - first_year + 1) if len(years) else 0
+
+    samples = np.full((DAYS_IN_YEAR, n_years), np.nan)
+    samples[day_index, years - first_year] = period_values
+
+    median = np.full(DAYS_IN_YEAR, np.nan)
+    std = np.full(DAYS_IN_YEAR, np.nan)
+    if n_years:
+        with warnings.catch_warnings():
+            # days without any values are left as NaN
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            median = np.nanmedian(samples, axis=1)
+            std = np.nanstd(samples, axis=1, ddof=1)
+
+    max_delta = None
+    min_delta = None
+    if np.isfinite(values).any():
+        max_pos = np.nanargmax(values)
+        min_pos = np.nanargmin(values)
+        max_delta = float(values[max_pos] - median[day_of_year_index(dates[max_pos:max_pos + 1])[0]])
+        min_delta = float(values[min_pos] - median[day_of_year_index(dates[min_pos:min_pos + 1])[0]])
+
+    return Climatology(median, std, samples, max_delta, min_delta)
@@ -0,0 +1,36 @@
+"""
+Writing cache and static files that other processes may be reading.
+"""
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_file(path: str, mode: str = 'wb'):
+    """
+    Open a temporary file in the same directory as 'path' for content that is written a piece at a time, it's renamed
+    to 'path' when the block finishes and removed if the block raises. The file is created world readable, nginx
+    serves some of these files.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    file = tempfile.NamedTemporaryFile(mode, dir=directory, suffix='.tmp', delete=False)
+    try:
+        with file:
+            yield file
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(file.name)
+        raise
+
+
+def atomic_write(path: str, data):
+    """
+    Write bytes, or text, to 'path' through atomic_file, so readers see either the old file or the complete new one.
+    """
+    with atomic_file(path, 'w' if isinstance(data, str) else 'wb') as file:
+        file.write(data)
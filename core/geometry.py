@@ -0,0 +1,52 @@
+import json
+
+from django.contrib.gis.geos import GEOSGeometry
+
+# Zoom bands for the stored MPA geometries: (resolution, highest web map zoom level, simplification tolerance in
+# degrees, decimal places kept). A pixel at zoom z is about 360 / (256 * 2^z) degrees wide, so each tolerance is
+# roughly half a pixel at the band's highest zoom. Anything above the last band uses the full geometry.
+RESOLUTIONS = [
+    ('low', 5, 0.02, 2),
+    ('medium', 8, 0.0025, 3),
+    ('high', 11, 0.0003, 4),
+]
+
+FULL_RESOLUTION = 'full'
+
+RESOLUTION_NAMES = [resolution for resolution, _, _, _ in RESOLUTIONS] + [FULL_RESOLUTION]
+
+
+def resolution_for_zoom(zoom: int) -> str:
+    for resolution, max_zoom, _, _ in RESOLUTIONS:
+        if zoom <= max_zoom:
+            return resolution
+    return FULL_RESOLUTION
+
+
+def quantize_ring(ring, precision):
+    """Round a ring's coordinates and drop repeated points, keeping at least the 4 points a ring needs"""
+    rounded = [[round(x, precision), round(y, precision)] for x, y, *_ in ring]
+    deduplicated = [point for index, point in enumerate(rounded) if index == 0 or point != rounded[index - 1]]
+    return deduplicated if len(deduplicated) >= 4 else rounded
+
+
+def quantize_geojson(geometry: dict, precision: int) -> dict:
+    """Round the coordinates of a GeoJSON Polygon or MultiPolygon to 'precision' decimal places"""
+    if geometry['type'] == 'Polygon':
+        coordinates = [quantize_ring(ring, precision) for ring in geometry['coordinates']]
+    else:
+        coordinates = [[quantize_ring(ring, precision) for ring in polygon] for polygon in geometry['coordinates']]
+
+    return {'type': geometry['type'], 'coordinates': coordinates}
+
+
+def simplified_geojson(geom: GEOSGeometry, tolerance: float, precision: int) -> dict:
+    """
+    GeoJSON for a geometry simplified to 'tolerance' degrees and quantized to 'precision' decimal places.
+    Topology is preserved so small MPAs don't collapse away at low zoom.
+    """
+    simplified = geom.simplify(tolerance, preserve_topology=True)
+    if simplified.empty:
+        simplified = geom
+
+    return quantize_geojson(json.loads(simplified.geojson), precision)
@@ -1,72 +1,267 @@
 # core/management/commands/generate_mpa_geojson.py
-from django.core.management.base import BaseCommand
+import functools
+import gzip
+import hashlib
 import json
 import os
-from core.models import ClimateModels
-from core.api.serializers import MPAZonesSerializer
-from core.api.views import MPAZonesWithTimeseriesViewSet
-from django.test.client import RequestFactory
-from django.contrib.sessions.middleware import SessionMiddleware
+import re
+import shutil
+import tempfile
 
-class Command(BaseCommand):
-    help = 'Generate static GeoJSON files for MPA polygons with timeseries data'
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
 
-    def add_arguments(self, parser):
-        parser.add_argument('--force', action='store_true', help='Force regeneration of files')
+from core import models, topojson
+from core.api.serializers import MPAZonesWithoutGeometrySerializer
+from core.files import atomic_file, atomic_write
+from core.geometry import FULL_RESOLUTION, RESOLUTION_NAMES, quantize_geojson
+from core.parallel import run_in_processes
 
-    def handle(self, *args, **options):
-        # Create directory structure if it doesn't exist
-        output_dir = 'core/static/core/geojson'
-        os.makedirs(output_dir, exist_ok=True)
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-        # Get all climate models
-        climate_models = ClimateModels.objects.all()
+OUTPUT_DIR = os.path.join(settings.BASE_DIR, 'core', 'static', 'core', 'geojson')
 
-        factory = RequestFactory()
+# maps the plain file names the frontend asks for to the current content hashed file
+MANIFEST_NAME = 'mpa_manifest.json'
 
-        for model in climate_models:
-            self.stdout.write(f"Processing climate model: {model.name}")
+HASH_LENGTH = 12
 
-            # Create a file name based on the model ID
-            filename = os.path.join(output_dir, f"mpa_model_{model.name.upper()}.geojson")
+# bytes read at a time when copying and compressing the generated files
+COPY_BLOCK_SIZE = 1024 * 1024
 
-            if os.path.exists(filename) and not options['force']:
-                self.stdout.write(f"File {filename} already exists, skipping (use --force to regenerate)")
-                continue
 
-            # Simulate a request to the viewset
-            request = factory.get('/')
+def mpa_features(climate_model: models.ClimateModels, timeseries_type: int = 1, resolution: str = FULL_RESOLUTION,
+                 precision: int = None):
+    """
+    GeoJSON features for the MPAs with timeseries data for a climate model, largest first, in the shape the MPA API
+    returns them. Geometries come from the stored zoom band for 'resolution', falling back to the serialized full
+    geometry.
 
-            # Add session to request
-            middleware = SessionMiddleware(get_response=lambda r: None)
-            middleware.process_request(request)
-            request.session['selected_model'] = model.id
-            request.session.save()
+    Parameters:
+        climate_model: model the MPAs need timeseries for
+        timeseries_type: 1 bottom, 2 surface
+        resolution: one of core.geometry.RESOLUTION_NAMES
+        precision: decimal places to round the coordinates to, None keeps them as stored
+    """
+    catalog = models.TimeseriesCatalog.objects.filter(model=climate_model, type=timeseries_type)
 
-            # Create a viewset instance
-            viewset = MPAZonesWithTimeseriesViewSet()
-            viewset.request = request
+    # the serializer lists the depths of the prefetched catalog, so only this model and type's depths are listed
+    zones = models.MPAZones.objects.filter(pk__in=catalog.values('zone_id')).select_related(
+        'classification').prefetch_related(Prefetch('timeseries_catalog', queryset=catalog)).order_by('-km2', 'site_id')
+    if resolution != FULL_RESOLUTION:
+        zones = zones.prefetch_related(
+            Prefetch('geometries', queryset=models.MPAZoneGeometries.objects.filter(resolution=resolution))
+        )
 
-            # Get the queryset (MPAs with timeseries for this model)
-            queryset = viewset.get_queryset()
+    serializer = MPAZonesWithoutGeometrySerializer()
+    for zone in zones.iterator(chunk_size=100):
+        geometry = None
+        if resolution != FULL_RESOLUTION:
+            stored = zone.geometries.all()
+            geometry = stored[0].geometry if stored else None
+        if geometry is None:
+            geometry = zone.serialized_representation or (json.loads(zone.geom.geojson) if zone.geom else None)
+        if geometry is None:
+            continue
 
-            if not queryset.exists():
-                self.stdout.write(self.style.WARNING(f"No MPAs with timeseries for model {model.name}"))
-                continue
+        if precision is not None:
+            geometry = quantize_geojson(geometry, precision)
+
+        feature = serializer.to_representation(zone)
+        feature["geometry"] = geometry
+        yield feature
+
+
+class HashingFile:
+    """Wraps a binary file so everything written to it is also added to a sha256 of the content"""
+
+    def __init__(self, file):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data: bytes):
+        self.sha256.update(data)
+        return self.file.write(data)
+
+
+def write_feature_collection(features, file) -> int:
+    """Write a FeatureCollection one feature at a time, returns the number of features written"""
+    count = 0
+    file.write(b'{"type":"FeatureCollection","features":[')
+    for feature in features:
+        if count:
+            file.write(b',')
+        file.write(json.dumps(feature, separators=(',', ':')).encode('utf-8'))
+        count += 1
+    file.write(b']}')
+    return count
+
+
+def write_with_siblings(path: str, source):
+    """
+    Copy the open binary file 'source' to 'path' with the .gz (and .br when brotli is installed) siblings nginx's
+    gzip_static/brotli_static serve, a block at a time so the content is never held in memory.
+    """
+    source.seek(0)
+    with atomic_file(path) as file:
+        shutil.copyfileobj(source, file)
+
+    source.seek(0)
+    with atomic_file(path + '.gz') as file:
+        # mtime=0 and no file name keep the compressed output identical for identical content
+        with gzip.GzipFile(filename='', mode='wb', compresslevel=9, fileobj=file, mtime=0) as compressed:
+            shutil.copyfileobj(source, compressed)
+
+    if brotli is not None:
+        source.seek(0)
+        with atomic_file(path + '.br') as file:
+            compressor = brotli.Compressor(quality=11)
+            for block in iter(functools.partial(source.read, COPY_BLOCK_SIZE), b''):
+                file.write(compressor.process(block))
+            file.write(compressor.finish())
+
+
+def publish(source, digest: str, output_dir: str, base_name: str, extension: str, force: bool = False) -> tuple:
+    """
+    Copy generated content to its content hashed name and to the plain name older clients load, with the
+    compressed siblings of both, and remove earlier hashed versions.
+
+    Parameters:
+        source: open binary file with the content
+        digest: hex sha256 of the content
+        output_dir: directory the files are published in
+        base_name: file name without the hash and extension
+        extension: file extension without the dot
+        force: rewrite the files even if the hashed file already exists
+
+    Returns the hashed file name and whether the content changed.
+    """
+    hashed_name = f"{base_name}.{digest[:HASH_LENGTH]}.{extension}"
+    hashed_path = os.path.join(output_dir, hashed_name)
+    plain_path = os.path.join(output_dir, f"{base_name}.{extension}")
+
+    changed = force or not os.path.exists(hashed_path)
+    if changed:
+        write_with_siblings(hashed_path, source)
+    if changed or not os.path.exists(plain_path):
+        write_with_siblings(plain_path, source)
+
+    stale = re.compile(rf"^{re.escape(base_name)}\.[0-9a-f]{{{HASH_LENGTH}}}\.{re.escape(extension)}(\.gz|\.br)?$")
+    for name in os.listdir(output_dir):
+        if stale.match(name) and not name.startswith(hashed_name):
+            os.remove(os.path.join(output_dir, name))
+
+    return hashed_name, changed
 
-            # Serialize MPAs with geometry
-            serializer = MPAZonesSerializer(queryset, many=True)
-            serialized_data = serializer.data
 
-            # Write to file as GeoJSON FeatureCollection
-            feature_collection = {
-                "type": "FeatureCollection",
-                "features": serialized_data
-            }
+def generate_model(model_id: int, output_dir: str, resolution: str, precision: int, topology: bool,
+                   force: bool) -> dict:
+    """Write the GeoJSON (and optionally TopoJSON) files for one climate model"""
+    climate_model = models.ClimateModels.objects.get(pk=model_id)
+    base_name = f"mpa_model_{climate_model.name.upper()}"
+    result = {'model': climate_model.name, 'features': 0, 'files': {}, 'changed': []}
+
+    # features are streamed to a scratch file and hashed as they're written, the hash names the published file
+    with tempfile.TemporaryFile(dir=output_dir) as scratch:
+        hashing = HashingFile(scratch)
+        result['features'] = write_feature_collection(
+            mpa_features(climate_model, resolution=resolution, precision=precision), hashing
+        )
+
+        if not result['features']:
+            return result
+
+        hashed_name, changed = publish(scratch, hashing.sha256.hexdigest(), output_dir, base_name, 'geojson', force)
+        result['files'][f"{base_name}.geojson"] = hashed_name
+        if changed:
+            result['changed'].append(hashed_name)
+
+    if topology:
+        # the topology needs every ring at once to find the shared boundaries
+        features = list(mpa_features(climate_model, resolution=resolution))
+        encoded = topojson.topology(features, 'mpas', precision if precision is not None else 5)
+
+        with tempfile.TemporaryFile(dir=output_dir) as scratch:
+            hashing = HashingFile(scratch)
+            hashing.write(json.dumps(encoded, separators=(',', ':')).encode('utf-8'))
+
+            hashed_name, changed = publish(scratch, hashing.sha256.hexdigest(), output_dir, base_name, 'topojson',
+                                           force)
+            result['files'][f"{base_name}.topojson"] = hashed_name
+            if changed:
+                result['changed'].append(hashed_name)
+
+    return result
+
+
+def write_manifest(output_dir: str, files: dict):
+    """Merge the plain to hashed file names into the manifest, written atomically so clients never see half of it"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(path):
+        with open(path) as file:
+            manifest = json.load(file)
+    manifest.update(files)
+
+    atomic_write(path, json.dumps(manifest, indent=2, sort_keys=True))
+
+
+class Command(BaseCommand):
+    help = ('Generate static, content hashed GeoJSON files for the MPA polygons with timeseries data, with '
+            'precompressed siblings. Files are only rewritten when their content changes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', type=int, action='append', help='Only generate the files for this climate '
+                                                                       'model id, can be repeated')
+        parser.add_argument('--precision', type=int, default=5,
+                            help='Decimal places kept in the coordinates, 5 is about a metre (default 5)')
+        parser.add_argument('--resolution', choices=RESOLUTION_NAMES, default=FULL_RESOLUTION,
+                            help='Stored geometry resolution to write (default full)')
+        parser.add_argument('--topojson', action='store_true', help='Also write a TopoJSON file with shared arcs')
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                            help='Number of climate models to generate in parallel')
+        parser.add_argument('--force', action='store_true',
+                            help='Rewrite the files and their compressed siblings even if the content is unchanged')
+
+    def handle(self, *args, **options):
+        output_dir = OUTPUT_DIR
+        os.makedirs(output_dir, exist_ok=True)
+
+        if brotli is None:
+            self.stdout.write(self.style.WARNING("brotli is not installed, only .gz files will be written"))
+
+        climate_models = models.ClimateModels.objects.all()
+        if options['model']:
+            climate_models = climate_models.filter(pk__in=options['model'])
+        model_ids = list(climate_models.values_list('pk', flat=True))
+
+        generate = functools.partial(generate_model, output_dir=output_dir, resolution=options['resolution'],
+                                     precision=options['precision'], topology=options['topojson'],
+                                     force=options['force'])
+
+        results = []
+        for model_id, result, error in run_in_processes(generate, model_ids, options['workers']):
+            if error is not None:
+                self.stdout.write(self.style.ERROR(f"Failed generating model {model_id}: {str(error)}"))
+                continue
+            results.append(result)
+
+        files = {}
+        for result in results:
+            if not result['features']:
+                self.stdout.write(self.style.WARNING(f"No MPAs with timeseries for model {result['model']}"))
+                continue
 
-            with open(filename, 'w') as f:
-                json.dump(feature_collection, f)
+            files.update(result['files'])
+            if result['changed']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Created {', '.join(result['changed'])} with {result['features']} MPAs"
+                ))
+            else:
+                self.stdout.write(f"{result['model']} is unchanged")
 
-            self.stdout.write(self.style.SUCCESS(
-                f"Created {filename} with {len(serialized_data)} MPAs"
-            ))
\ No newline at end of file
+        write_manifest(output_dir, files)
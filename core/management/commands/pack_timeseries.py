@@ -0,0 +1,30 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from core import models
+from scripts import load_timeseries2
+
+logger = logging.getLogger('django')
+
+
+class Command(BaseCommand):
+
+    help = ("Rebuild the packed series and their climatologies from the Timeseries table, for data loaded before "
+            "the packed arrays existed")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', type=int, help='Only pack the series of this climate model id')
+
+    def handle(self, *args, **options):
+        climate_model = None
+        if options['model']:
+            climate_model = models.ClimateModels.objects.get(pk=options['model'])
+
+        load_timeseries2.pack_timeseries(climate_model)
+
+        # cached climatologies were built from whatever was packed before
+        for model in ([climate_model] if climate_model else models.ClimateModels.objects.all()):
+            model.bump_data_version()
+
+        self.stdout.write(self.style.SUCCESS("Packed timeseries"))
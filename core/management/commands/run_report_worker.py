@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import reports
+
+logger = logging.getLogger('django')
+
+# how often an idle worker checks for stale jobs and reports from earlier dataset versions, in seconds
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+
+    help = ("Render the queued PDF reports. Several workers can run at once, each job is only claimed by one of "
+            "them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty instead of waiting '
+                                                                 'for new jobs')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait before checking an empty queue again (default 2)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Waiting for report jobs")
+
+        last_maintenance = None
+        while True:
+            # the worker outlives any single connection's CONN_MAX_AGE, drop connections that have gone away
+            close_old_connections()
+
+            if last_maintenance is None or time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL:
+                requeued = reports.requeue_stale_jobs()
+                if requeued:
+                    logger.warning(f"Requeued {requeued} report jobs that stopped running")
+                removed = reports.remove_outdated_reports()
+                if removed:
+                    logger.info(f"Removed {removed} reports of earlier dataset versions")
+                last_maintenance = time.monotonic()
+
+            job = reports.claim_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            started = time.monotonic()
+            reports.run_job(job)
+            self.stdout.write(f"Report job {job.pk} {job.status} in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,36 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from core import models
+from core.api.views import get_climatology_data
+
+logger = logging.getLogger('django')
+
+
+class Command(BaseCommand):
+
+    help = "Precompute the climatology for every MPA, model, type, depth and indicator and store it in the shared cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', type=int, help='Only warm the climatologies for this climate model id')
+        parser.add_argument('--refresh', action='store_true', help='Rebuild entries that are already cached')
+
+    def handle(self, *args, **options):
+        catalog = models.TimeseriesCatalog.objects.all()
+        if options['model']:
+            catalog = catalog.filter(model__pk=options['model'])
+
+        series_keys = list(catalog.values_list('zone', 'model', 'type', 'depth', 'indicator'))
+        self.stdout.write(f"Warming {len(series_keys)} climatologies")
+
+        failed = 0
+        for zone_id, model_id, ts_type, depth, indicator_id in tqdm(series_keys, desc="Warming climatologies"):
+            try:
+                get_climatology_data(zone_id, model_id, ts_type, depth, indicator_id, refresh=options['refresh'])
+            except ValueError as e:
+                failed += 1
+                logger.error(f"Could not build climatology for zone {zone_id}, model {model_id}: {str(e)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Warmed {len(series_keys) - failed} climatologies, {failed} failed"))
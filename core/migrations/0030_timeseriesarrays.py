@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_alter_rasters_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeseriesArrays',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.IntegerField(choices=[(1, 'BOTTOM'), (2, 'SURFACE')], default=1)),
+                ('depth', models.IntegerField(null=True, verbose_name='Depth')),
+                ('start_date', models.DateField(verbose_name='Start Date')),
+                ('length', models.IntegerField(help_text='Number of days covered by the packed array', verbose_name='Length')),
+                ('values', models.BinaryField(verbose_name='Values')),
+                ('mask', models.BinaryField(verbose_name='Validity Mask')),
+                ('indicator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeseries_arrays', to='core.timeseriesvariables')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeseries_arrays', to='core.climatemodels')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeseries_arrays', to='core.mpazones')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['zone', 'model', 'type', 'indicator', 'depth'], name='core_ts_array_series_idx')],
+            },
+        ),
+    ]
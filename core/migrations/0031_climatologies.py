@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_timeseriesarrays'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Climatologies',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('years', models.IntegerField(help_text='Number of years in the climatology period', verbose_name='Years')),
+                ('median', models.BinaryField(verbose_name='Median')),
+                ('std', models.BinaryField(verbose_name='Standard Deviation')),
+                ('samples', models.BinaryField(verbose_name='Samples')),
+                ('max_delta', models.FloatField(null=True, verbose_name='Max Delta')),
+                ('min_delta', models.FloatField(null=True, verbose_name='Min Delta')),
+                ('series', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='climatology', to='core.timeseriesarrays')),
+            ],
+        ),
+    ]
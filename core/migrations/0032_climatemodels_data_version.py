@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_climatologies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='climatemodels',
+            name='data_version',
+            field=models.IntegerField(default=1, help_text='Incremented whenever the model data is reloaded, used to key cached results', verbose_name='Dataset Version'),
+        ),
+    ]
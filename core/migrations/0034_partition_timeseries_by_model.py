@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:54
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def partition_timeseries(apps, schema_editor):
+    """
+    Rebuild core_timeseries as a table list partitioned by model_id, with one partition per climate model and a
+    default partition for anything else. Each partition gets a composite b-tree for series lookups and a BRIN
+    index on date_time, both declared on the parent so new partitions inherit them.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    ClimateModels = apps.get_model('core', 'ClimateModels')
+
+    statements = [
+        "CREATE SEQUENCE core_timeseries_part_id_seq",
+        "CREATE TABLE core_timeseries_part (LIKE core_timeseries INCLUDING DEFAULTS) PARTITION BY LIST (model_id)",
+        "ALTER TABLE core_timeseries_part ALTER COLUMN id SET DEFAULT nextval('core_timeseries_part_id_seq')",
+        # the partition key has to be part of the primary key
+        "ALTER TABLE core_timeseries_part ADD CONSTRAINT core_timeseries_part_pkey PRIMARY KEY (id, model_id)",
+        "ALTER TABLE core_timeseries_part ADD CONSTRAINT core_timeseries_model_id_fk "
+        "FOREIGN KEY (model_id) REFERENCES core_climatemodels (id) DEFERRABLE INITIALLY DEFERRED",
+        "ALTER TABLE core_timeseries_part ADD CONSTRAINT core_timeseries_zone_id_fk "
+        "FOREIGN KEY (zone_id) REFERENCES core_mpazones (site_id) DEFERRABLE INITIALLY DEFERRED",
+        "ALTER TABLE core_timeseries_part ADD CONSTRAINT core_timeseries_indicator_id_fk "
+        "FOREIGN KEY (indicator_id) REFERENCES core_timeseriesvariables (id) DEFERRABLE INITIALLY DEFERRED",
+        "CREATE TABLE core_timeseries_default PARTITION OF core_timeseries_part DEFAULT",
+    ]
+
+    for model_id in ClimateModels.objects.values_list('pk', flat=True):
+        statements.append(
+            f"CREATE TABLE core_timeseries_model_{int(model_id)} PARTITION OF core_timeseries_part "
+            f"FOR VALUES IN ({int(model_id)})"
+        )
+
+    statements += [
+        "INSERT INTO core_timeseries_part SELECT * FROM core_timeseries",
+        "SELECT setval('core_timeseries_part_id_seq', COALESCE((SELECT MAX(id) FROM core_timeseries_part), 0) + 1, false)",
+        "DROP TABLE core_timeseries",
+        "ALTER TABLE core_timeseries_part RENAME TO core_timeseries",
+        "ALTER TABLE core_timeseries RENAME CONSTRAINT core_timeseries_part_pkey TO core_timeseries_pkey",
+        "ALTER SEQUENCE core_timeseries_part_id_seq RENAME TO core_timeseries_id_seq",
+        "ALTER SEQUENCE core_timeseries_id_seq OWNED BY core_timeseries.id",
+        "CREATE INDEX core_ts_series_date_idx ON core_timeseries (zone_id, type, indicator_id, depth, date_time)",
+        "CREATE INDEX core_ts_date_brin ON core_timeseries USING brin (date_time)",
+        "ANALYZE core_timeseries",
+    ]
+
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_climatemodels_data_version'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                # the table is dropped and rebuilt, there is no going back to the unpartitioned table
+                migrations.RunPython(partition_timeseries),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='timeseries',
+                    index=models.Index(fields=['zone', 'type', 'indicator', 'depth', 'date_time'], name='core_ts_series_date_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='timeseries',
+                    index=django.contrib.postgres.indexes.BrinIndex(fields=['date_time'], name='core_ts_date_brin'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_partition_timeseries_by_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoadManifests',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, verbose_name='Source File')),
+                ('size', models.BigIntegerField(help_text='Size of the file in bytes', verbose_name='File Size')),
+                ('mtime', models.FloatField(help_text='Modification time of the file as a timestamp', verbose_name='Modified Time')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('series', models.JSONField(default=list, verbose_name='Series')),
+                ('loaded', models.DateTimeField(auto_now=True, verbose_name='Loaded')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='load_manifests', to='core.climatemodels')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='loadmanifests',
+            constraint=models.UniqueConstraint(fields=('model', 'path'), name='core_load_manifest_model_path'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+def set_indicator_ranges(apps, schema_editor):
+    IndicatorTypes = apps.get_model('core', 'IndicatorTypes')
+
+    for indicator_type in IndicatorTypes.objects.all():
+        min_max = indicator_type.indicators.exclude(value=float('nan')).aggregate(
+            min_value=models.Min('value'),
+            max_value=models.Max('value')
+        )
+        indicator_type.min_value = min_max['min_value']
+        indicator_type.max_value = min_max['max_value']
+        indicator_type.save(update_fields=['min_value', 'max_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_loadmanifests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indicatortypes',
+            name='max_value',
+            field=models.FloatField(blank=True, help_text='Largest value of this indicator over every model and MPA', null=True, verbose_name='Maximum Value'),
+        ),
+        migrations.AddField(
+            model_name='indicatortypes',
+            name='min_value',
+            field=models.FloatField(blank=True, help_text='Smallest value of this indicator over every model and MPA', null=True, verbose_name='Minimum Value'),
+        ),
+        migrations.RunPython(set_indicator_ranges, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_catalog(apps, schema_editor):
+    Timeseries = apps.get_model('core', 'Timeseries')
+    TimeseriesCatalog = apps.get_model('core', 'TimeseriesCatalog')
+
+    series = Timeseries.objects.values('zone', 'model', 'type', 'indicator', 'depth').annotate(
+        first_date=models.Min('date_time'),
+        last_date=models.Max('date_time'),
+        count=models.Count('id'),
+        nan_count=models.Count('id', filter=models.Q(value=float('nan'))),
+    ).order_by()
+
+    TimeseriesCatalog.objects.bulk_create([
+        TimeseriesCatalog(zone_id=row['zone'], model_id=row['model'], type=row['type'], indicator_id=row['indicator'],
+                          depth=row['depth'], first_date=row['first_date'], last_date=row['last_date'],
+                          count=row['count'], nan_count=row['nan_count'])
+        for row in series
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_indicatortypes_range'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeseriesCatalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.IntegerField(choices=[(1, 'BOTTOM'), (2, 'SURFACE')], default=1)),
+                ('depth', models.IntegerField(null=True, verbose_name='Depth')),
+                ('first_date', models.DateField(verbose_name='First Date')),
+                ('last_date', models.DateField(verbose_name='Last Date')),
+                ('count', models.IntegerField(help_text='Number of records in the series', verbose_name='Count')),
+                ('nan_count', models.IntegerField(help_text='Number of records without a value', verbose_name='NaN Count')),
+                ('indicator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeseries_catalog', to='core.timeseriesvariables')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeseries_catalog', to='core.climatemodels')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeseries_catalog', to='core.mpazones')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'type', 'zone'], name='core_ts_catalog_model_idx'), models.Index(fields=['zone', 'model'], name='core_ts_catalog_zone_idx')],
+            },
+        ),
+        migrations.RunPython(build_catalog, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_timeseriescatalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MPAZoneGeometries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('low', 'low'), ('medium', 'medium'), ('high', 'high')], max_length=10, verbose_name='Resolution')),
+                ('geometry', models.JSONField(verbose_name='Geometry')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geometries', to='core.mpazones')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='mpazonegeometries',
+            constraint=models.UniqueConstraint(fields=('zone', 'resolution'), name='core_mpa_geometry_zone_resolution'),
+        ),
+    ]
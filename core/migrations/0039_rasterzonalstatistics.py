@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_mpazonegeometries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RasterZonalStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(verbose_name='Number of pixels inside the MPA')),
+                ('mean', models.FloatField(verbose_name='Mean')),
+                ('std', models.FloatField(verbose_name='Standard deviation')),
+                ('min', models.FloatField(verbose_name='Minimum')),
+                ('max', models.FloatField(verbose_name='Maximum')),
+                ('p5', models.FloatField(verbose_name='5th percentile')),
+                ('p25', models.FloatField(verbose_name='25th percentile')),
+                ('p50', models.FloatField(verbose_name='Median')),
+                ('p75', models.FloatField(verbose_name='75th percentile')),
+                ('p95', models.FloatField(verbose_name='95th percentile')),
+                ('raster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zonal_statistics', to='core.rasters', verbose_name='Raster')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='raster_statistics', to='core.mpazones', verbose_name='MPA Zone')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='rasterzonalstatistics',
+            constraint=models.UniqueConstraint(fields=('raster', 'zone'), name='core_raster_zonal_raster_zone'),
+        ),
+    ]
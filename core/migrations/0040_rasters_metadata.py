@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_rasterzonalstatistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rasters',
+            name='bottom',
+            field=models.FloatField(blank=True, null=True, verbose_name='South bound (WGS84)'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='cog_file_name',
+            field=models.CharField(blank=True, default='', max_length=120, verbose_name='Cloud optimized GeoTIFF filename'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='crs',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='Coordinate reference system'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='left',
+            field=models.FloatField(blank=True, null=True, verbose_name='West bound (WGS84)'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='max_value',
+            field=models.FloatField(blank=True, null=True, verbose_name='Maximum value'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='min_value',
+            field=models.FloatField(blank=True, null=True, verbose_name='Minimum value'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='nodata',
+            field=models.FloatField(blank=True, null=True, verbose_name='No data value'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='right',
+            field=models.FloatField(blank=True, null=True, verbose_name='East bound (WGS84)'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='stretch_max',
+            field=models.FloatField(blank=True, null=True, verbose_name='Upper percentile for the colour stretch'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='stretch_min',
+            field=models.FloatField(blank=True, null=True, verbose_name='Lower percentile for the colour stretch'),
+        ),
+        migrations.AddField(
+            model_name='rasters',
+            name='top',
+            field=models.FloatField(blank=True, null=True, verbose_name='North bound (WGS84)'),
+        ),
+    ]
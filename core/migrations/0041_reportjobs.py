@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_rasters_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJobs',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, verbose_name='Report Key')),
+                ('type', models.IntegerField(choices=[(1, 'BOTTOM'), (2, 'SURFACE')], default=1)),
+                ('depth', models.IntegerField(null=True, verbose_name='Depth')),
+                ('start_date', models.DateField(verbose_name='Start Date')),
+                ('end_date', models.DateField(verbose_name='End Date')),
+                ('data_version', models.IntegerField(verbose_name='Dataset Version')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10, verbose_name='Status')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Attempts')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Started')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Finished')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='core.climatemodels')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='core.mpazones')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created'], name='core_report_job_status_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportjobs',
+            constraint=models.UniqueConstraint(fields=('key',), name='core_report_job_key'),
+        ),
+    ]
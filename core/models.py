@@ -1,7 +1,16 @@
+import datetime
+
+import numpy as np
+
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import BrinIndex
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import transaction
 from django.utils.translation import gettext as _
 
+from core.climatology import Climatology, DAYS_IN_YEAR, widen_float32
+from core.geometry import RESOLUTIONS
+
 
 class Classifications(models.Model):
     name_e = models.CharField(max_length=50, verbose_name=_('Classification Name (English)'))
@@ -26,6 +35,22 @@ class MPAZones(models.Model):
         return f"{self.name_e}"
 
 
+class MPAZoneGeometries(models.Model):
+    """
+    Simplified, coordinate quantized GeoJSON geometry of an MPA for one zoom band (see core.geometry.RESOLUTIONS),
+    generated when the MPA shapes are loaded. The full resolution geometry is the MPA's serialized_representation.
+    """
+    zone = models.ForeignKey(MPAZones, on_delete=models.CASCADE, related_name='geometries')
+    resolution = models.CharField(max_length=10, choices=[(name, name) for name, _, _, _ in RESOLUTIONS],
+                                  verbose_name=_('Resolution'))
+    geometry = models.JSONField(verbose_name=_('Geometry'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zone', 'resolution'], name='core_mpa_geometry_zone_resolution'),
+        ]
+
+
 class TimeseriesVariables(models.Model):
     name = models.CharField(max_length=50, verbose_name=_('Indicator Name'))
 
@@ -33,6 +58,12 @@ class TimeseriesVariables(models.Model):
 class ClimateModels(models.Model):
     name = models.CharField(max_length=50, verbose_name=_('Model Name'))
     priority = models.IntegerField(default=0)
+    data_version = models.IntegerField(default=1, verbose_name=_('Dataset Version'),
+                                       help_text=_('Incremented whenever the model data is reloaded, used to key cached results'))
+
+    def bump_data_version(self):
+        ClimateModels.objects.filter(pk=self.pk).update(data_version=models.F('data_version') + 1)
+        self.refresh_from_db(fields=['data_version'])
 
 
 class ColorRamps(models.Model):
@@ -61,6 +92,19 @@ class Rasters(models.Model):
     file_name = models.CharField(max_length=100, verbose_name=_('Filename'))
     label = models.CharField(max_length=50, verbose_name=_('Label of the raster'))
 
+    # written by scripts/load_rasters.py (see core.rasters.convert_to_cog and core.rasters.raster_metadata)
+    cog_file_name = models.CharField(max_length=120, blank=True, default='', verbose_name=_('Cloud optimized GeoTIFF filename'))
+    left = models.FloatField(null=True, blank=True, verbose_name=_('West bound (WGS84)'))
+    bottom = models.FloatField(null=True, blank=True, verbose_name=_('South bound (WGS84)'))
+    right = models.FloatField(null=True, blank=True, verbose_name=_('East bound (WGS84)'))
+    top = models.FloatField(null=True, blank=True, verbose_name=_('North bound (WGS84)'))
+    crs = models.CharField(max_length=50, blank=True, default='', verbose_name=_('Coordinate reference system'))
+    nodata = models.FloatField(null=True, blank=True, verbose_name=_('No data value'))
+    min_value = models.FloatField(null=True, blank=True, verbose_name=_('Minimum value'))
+    max_value = models.FloatField(null=True, blank=True, verbose_name=_('Maximum value'))
+    stretch_min = models.FloatField(null=True, blank=True, verbose_name=_('Lower percentile for the colour stretch'))
+    stretch_max = models.FloatField(null=True, blank=True, verbose_name=_('Upper percentile for the colour stretch'))
+
     class Meta:
         ordering = ['order']
 
@@ -68,6 +112,38 @@ class Rasters(models.Model):
         return f"{self.order}: {self.label} - {self.file_name}"
 
 
+class RasterZonalStatistics(models.Model):
+    """
+    Statistics of a raster's pixels inside an MPA, computed for every MPA when the raster set is loaded (see
+    scripts/load_rasters.py). MPAs that cover no valid pixels of the raster have no row.
+    """
+    STATISTICS = ['count', 'mean', 'std', 'min', 'max', 'p5', 'p25', 'p50', 'p75', 'p95']
+
+    raster = models.ForeignKey(Rasters, on_delete=models.CASCADE, related_name='zonal_statistics', verbose_name=_('Raster'))
+    zone = models.ForeignKey(MPAZones, on_delete=models.CASCADE, related_name='raster_statistics', verbose_name=_('MPA Zone'))
+    count = models.IntegerField(verbose_name=_('Number of pixels inside the MPA'))
+    mean = models.FloatField(verbose_name=_('Mean'))
+    std = models.FloatField(verbose_name=_('Standard deviation'))
+    min = models.FloatField(verbose_name=_('Minimum'))
+    max = models.FloatField(verbose_name=_('Maximum'))
+    p5 = models.FloatField(verbose_name=_('5th percentile'))
+    p25 = models.FloatField(verbose_name=_('25th percentile'))
+    p50 = models.FloatField(verbose_name=_('Median'))
+    p75 = models.FloatField(verbose_name=_('75th percentile'))
+    p95 = models.FloatField(verbose_name=_('95th percentile'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['raster', 'zone'], name='core_raster_zonal_raster_zone'),
+        ]
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.STATISTICS}
+
+    def __str__(self):
+        return f"{self.raster} - {self.zone}"
+
+
 class SpatialReferences(models.Model):
     spatial_set = models.ForeignKey(SpatialRasterSets, on_delete=models.CASCADE, related_name='references', verbose_name=_('Spatial raster set'))
     citation = models.CharField(max_length=255, verbose_name=_('Citation'))
@@ -96,6 +172,226 @@ class Timeseries(models.Model):
     depth = models.IntegerField(verbose_name="Depth", null=True)  # if null this is a total average bottom timeseries
     value = models.FloatField(verbose_name="Value")
 
+    class Meta:
+        # the table is list partitioned by model (see core.partitions), these indexes exist on every partition
+        indexes = [
+            models.Index(fields=['zone', 'type', 'indicator', 'depth', 'date_time'], name='core_ts_series_date_idx'),
+            BrinIndex(fields=['date_time'], name='core_ts_date_brin'),
+        ]
+
+
+class TimeseriesArrays(models.Model):
+    """
+    Series level copy of the Timeseries table. Each row holds a complete daily (zone, model, type, indicator, depth)
+    series as one packed little-endian float32 array beginning at start_date, along with a bit-packed mask flagging
+    the days that actually have a record.
+    """
+    model = models.ForeignKey(ClimateModels, on_delete=models.CASCADE, related_name='timeseries_arrays')
+    zone = models.ForeignKey(MPAZones, on_delete=models.CASCADE, related_name='timeseries_arrays')
+    type = models.IntegerField(choices=Timeseries.TIMESERIES_TYPES, default=1)
+    indicator = models.ForeignKey(TimeseriesVariables, on_delete=models.CASCADE, related_name='timeseries_arrays')
+    depth = models.IntegerField(verbose_name="Depth", null=True)  # if null this is a total average bottom timeseries
+    start_date = models.DateField(verbose_name="Start Date")
+    length = models.IntegerField(verbose_name="Length", help_text=_('Number of days covered by the packed array'))
+    values = models.BinaryField(verbose_name="Values")
+    mask = models.BinaryField(verbose_name="Validity Mask")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['zone', 'model', 'type', 'indicator', 'depth'], name='core_ts_array_series_idx'),
+        ]
+
+    @staticmethod
+    def _as_day(date):
+        if isinstance(date, datetime.datetime):
+            date = date.date()
+        return np.datetime64(date, 'D')
+
+    def set_series(self, dates, values):
+        """
+        Pack a daily series into this row.
+
+        Parameters:
+        dates: array-like of dates, one per value
+        values: array-like of floats, NaN is allowed and kept as a valid (but empty) day
+        """
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        values = np.asarray(values, dtype=np.float64)
+
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        values = values[order]
+
+        start = dates[0]
+        offsets = (dates - start).astype(np.int64)
+        length = int(offsets[-1]) + 1
+
+        packed = np.full(length, np.nan, dtype='<f4')
+        packed[offsets] = values
+        present = np.zeros(length, dtype=bool)
+        present[offsets] = True
+
+        self.start_date = start.item()
+        self.length = length
+        self.values = packed.tobytes()
+        self.mask = np.packbits(present).tobytes()
+
+    def get_series(self, start_date=None, end_date=None):
+        """
+        Unpack the series, optionally limited to an inclusive date range.
+
+        Returns a tuple of (dates, values) numpy arrays containing only the days flagged in the validity mask. Values
+        are widened to float64 through their shortest decimal representation (see core.climatology.widen_float32).
+        """
+        start = self._as_day(self.start_date)
+        first, last = 0, self.length
+        if start_date:
+            first = min(max(int((self._as_day(start_date) - start).astype(np.int64)), 0), self.length)
+        if end_date:
+            last = max(min(int((self._as_day(end_date) - start).astype(np.int64)) + 1, self.length), first)
+
+        values = np.frombuffer(self.values, dtype='<f4', count=self.length)[first:last]
+        present = np.unpackbits(np.frombuffer(self.mask, dtype=np.uint8), count=self.length)[first:last].astype(bool)
+        dates = start + np.arange(first, last)
+
+        return dates[present], widen_float32(values[present])
+
+
+class Climatologies(models.Model):
+    """
+    Day of year climatology for a packed series, computed when the series is loaded. The median and standard
+    deviation are stored as 366 element little-endian float64 arrays, the climatology period values as a
+    366 x years float32 array so any quantile can be taken without going back to the daily data.
+    """
+    series = models.OneToOneField(TimeseriesArrays, on_delete=models.CASCADE, related_name='climatology')
+    years = models.IntegerField(verbose_name="Years", help_text=_('Number of years in the climatology period'))
+    median = models.BinaryField(verbose_name="Median")
+    std = models.BinaryField(verbose_name="Standard Deviation")
+    samples = models.BinaryField(verbose_name="Samples")
+    max_delta = models.FloatField(verbose_name="Max Delta", null=True)
+    min_delta = models.FloatField(verbose_name="Min Delta", null=True)
+
+    def set_climatology(self, climatology: Climatology):
+        self.years = climatology.samples.shape[1]
+        self.median = np.asarray(climatology.median, dtype='<f8').tobytes()
+        self.std = np.asarray(climatology.std, dtype='<f8').tobytes()
+        self.samples = np.asarray(climatology.samples, dtype='<f4').tobytes()
+        self.max_delta = climatology.max_delta
+        self.min_delta = climatology.min_delta
+
+    def get_climatology(self) -> Climatology:
+        return Climatology(
+            median=np.frombuffer(self.median, dtype='<f8'),
+            std=np.frombuffer(self.std, dtype='<f8'),
+            samples=widen_float32(np.frombuffer(self.samples, dtype='<f4').reshape(DAYS_IN_YEAR, self.years)),
+            max_delta=self.max_delta,
+            min_delta=self.min_delta,
+        )
+
+
+class TimeseriesCatalog(models.Model):
+    """
+    One row per (zone, model, type, indicator, depth) series in the Timeseries table with its date range, number
+    of records and number of NaN values. Listings and availability checks are answered from here instead of
+    scanning the Timeseries table. Kept up to date by the loaders through refresh().
+    """
+    zone = models.ForeignKey(MPAZones, on_delete=models.CASCADE, related_name='timeseries_catalog')
+    model = models.ForeignKey(ClimateModels, on_delete=models.CASCADE, related_name='timeseries_catalog')
+    type = models.IntegerField(choices=Timeseries.TIMESERIES_TYPES, default=1)
+    indicator = models.ForeignKey(TimeseriesVariables, on_delete=models.CASCADE, related_name='timeseries_catalog')
+    depth = models.IntegerField(verbose_name="Depth", null=True)  # if null this is a total average bottom timeseries
+    first_date = models.DateField(verbose_name="First Date")
+    last_date = models.DateField(verbose_name="Last Date")
+    count = models.IntegerField(verbose_name="Count", help_text=_('Number of records in the series'))
+    nan_count = models.IntegerField(verbose_name="NaN Count", help_text=_('Number of records without a value'))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'type', 'zone'], name='core_ts_catalog_model_idx'),
+            models.Index(fields=['zone', 'model'], name='core_ts_catalog_zone_idx'),
+        ]
+
+    @classmethod
+    def refresh(cls, **filters):
+        """
+        Rebuild the catalog rows for the Timeseries matching the filters, e.g. refresh(zone=mpa, model=model).
+        With no filters the whole catalog is rebuilt.
+        """
+        series = Timeseries.objects.filter(**filters).values('zone', 'model', 'type', 'indicator', 'depth').annotate(
+            first_date=models.Min('date_time'),
+            last_date=models.Max('date_time'),
+            count=models.Count('id'),
+            nan_count=models.Count('id', filter=models.Q(value=np.nan)),
+        ).order_by()
+
+        entries = [
+            cls(zone_id=row['zone'], model_id=row['model'], type=row['type'], indicator_id=row['indicator'],
+                depth=row['depth'], first_date=row['first_date'], last_date=row['last_date'], count=row['count'],
+                nan_count=row['nan_count'])
+            for row in series
+        ]
+
+        with transaction.atomic():
+            cls.objects.filter(**filters).delete()
+            cls.objects.bulk_create(entries)
+
+
+class LoadManifests(models.Model):
+    """
+    Record of a source file that was loaded for a climate model, so a reload can skip files that haven't changed.
+    'series' lists the zone, indicator, type and depth of each series the file produced.
+    """
+    model = models.ForeignKey(ClimateModels, on_delete=models.CASCADE, related_name='load_manifests')
+    path = models.CharField(max_length=255, verbose_name=_('Source File'))
+    size = models.BigIntegerField(verbose_name=_('File Size'), help_text=_('Size of the file in bytes'))
+    mtime = models.FloatField(verbose_name=_('Modified Time'), help_text=_('Modification time of the file as a timestamp'))
+    sha256 = models.CharField(max_length=64, verbose_name=_('SHA-256'))
+    series = models.JSONField(default=list, verbose_name=_('Series'))
+    loaded = models.DateTimeField(auto_now=True, verbose_name=_('Loaded'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'path'], name='core_load_manifest_model_path'),
+        ]
+
+
+class ReportStatus(models.TextChoices):
+    queued = 'queued', "Queued"
+    running = 'running', "Running"
+    done = 'done', "Done"
+    failed = 'failed', "Failed"
+
+
+class ReportJobs(models.Model):
+    """
+    A PDF report request, rendered in the background by the run_report_worker command (see core.reports). 'key'
+    identifies the report's parameters and the model's dataset version, so repeated requests share one job and
+    its finished PDF until the model is reloaded.
+    """
+    key = models.CharField(max_length=64, verbose_name=_('Report Key'))
+    zone = models.ForeignKey(MPAZones, on_delete=models.CASCADE, related_name='report_jobs')
+    model = models.ForeignKey(ClimateModels, on_delete=models.CASCADE, related_name='report_jobs')
+    type = models.IntegerField(choices=Timeseries.TIMESERIES_TYPES, default=1)
+    depth = models.IntegerField(verbose_name="Depth", null=True)
+    start_date = models.DateField(verbose_name=_('Start Date'))
+    end_date = models.DateField(verbose_name=_('End Date'))
+    data_version = models.IntegerField(verbose_name=_('Dataset Version'))
+    status = models.CharField(max_length=10, choices=ReportStatus.choices, default=ReportStatus.queued,
+                              verbose_name=_('Status'))
+    error = models.TextField(blank=True, default='', verbose_name=_('Error'))
+    attempts = models.IntegerField(default=0, verbose_name=_('Attempts'))
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_('Created'))
+    started = models.DateTimeField(null=True, blank=True, verbose_name=_('Started'))
+    finished = models.DateTimeField(null=True, blank=True, verbose_name=_('Finished'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key'], name='core_report_job_key'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created'], name='core_report_job_status_idx'),
+        ]
+
 
 class Observations(models.Model):
     zone = models.ForeignKey(MPAZones, on_delete=models.CASCADE, related_name='observations')
@@ -117,6 +413,20 @@ class IndicatorTypes(models.Model):
     description = models.CharField(max_length=150, verbose_name=_('Description'))
     category = models.ForeignKey(IndicatorCategories, on_delete=models.CASCADE, related_name='indicator_types')
     unit = models.CharField(max_length=45, verbose_name=_('Indicator Unit'))
+    min_value = models.FloatField(null=True, blank=True, verbose_name=_('Minimum Value'),
+                                  help_text=_('Smallest value of this indicator over every model and MPA'))
+    max_value = models.FloatField(null=True, blank=True, verbose_name=_('Maximum Value'),
+                                  help_text=_('Largest value of this indicator over every model and MPA'))
+
+    def update_range(self):
+        # called whenever indicators of this type are loaded so requests don't have to aggregate them
+        min_max = self.indicators.exclude(value=np.nan).aggregate(
+            min_value=models.Min('value'),
+            max_value=models.Max('value')
+        )
+        self.min_value = min_max['min_value']
+        self.max_value = min_max['max_value']
+        self.save(update_fields=['min_value', 'max_value'])
 
 
 class IndicatorWeights(models.Model):
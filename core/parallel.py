@@ -0,0 +1,46 @@
+"""
+Running independent loader tasks in forked worker processes.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connections
+
+
+def _call_in_worker(function, item):
+    try:
+        return function(item)
+    finally:
+        # don't leave the worker's connection open between tasks
+        connections.close_all()
+
+
+def run_in_processes(function, items, workers: int = 1):
+    """
+    Call function(item) for each item, in up to 'workers' forked processes when workers > 1 and in this process
+    otherwise. Yields (item, result, error) as each call finishes, error is the exception the call raised or None.
+
+    Parameters:
+        function: picklable callable taking one item, use functools.partial to pass other arguments
+        items: iterable of picklable items
+        workers: number of processes to use
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            try:
+                yield item, function(item), None
+            except Exception as e:
+                yield item, None, e
+        return
+
+    # forked workers can't share the parent's connection, they each open their own
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=min(workers, len(items)), mp_context=context) as executor:
+        futures = {executor.submit(_call_in_worker, function, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
@@ -0,0 +1,87 @@
+"""
+Helpers for the Timeseries table, which is list partitioned by climate model (see migration 0034).
+
+Each climate model gets its own partition so a model's data can be dropped or replaced as a whole instead of
+deleting millions of rows, and queries for a single model only touch that model's partition. Rows for a model
+without a partition land in the default partition.
+"""
+import logging
+
+from django.db import connection, transaction
+
+from core import models
+
+logger = logging.getLogger('dto_info')
+
+TIMESERIES_TABLE = models.Timeseries._meta.db_table
+DEFAULT_PARTITION = f'{TIMESERIES_TABLE}_default'
+
+
+def timeseries_partition_name(climate_model: models.ClimateModels) -> str:
+    return f'{TIMESERIES_TABLE}_model_{int(climate_model.pk)}'
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [TIMESERIES_TABLE])
+        row = cursor.fetchone()
+
+    return row is not None and row[0] == 'p'
+
+
+def has_timeseries_partition(climate_model: models.ClimateModels) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [timeseries_partition_name(climate_model)])
+        return cursor.fetchone()[0] is not None
+
+
+def ensure_timeseries_partition(climate_model: models.ClimateModels):
+    """
+    Create the partition for a climate model if it doesn't exist yet. Any rows for the model that were written to
+    the default partition are moved into the new partition before it's attached.
+    """
+    if not is_partitioned() or has_timeseries_partition(climate_model):
+        return
+
+    name = timeseries_partition_name(climate_model)
+    model_id = int(climate_model.pk)
+    logger.info(f"Creating timeseries partition {name}")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE {name} (LIKE {TIMESERIES_TABLE} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE model_id = %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [model_id]
+        )
+        cursor.execute(f"ALTER TABLE {TIMESERIES_TABLE} ATTACH PARTITION {name} FOR VALUES IN ({model_id})")
+
+
+def drop_timeseries_partition(climate_model: models.ClimateModels):
+    """
+    Remove all of a climate model's timeseries data by dropping its partition. Falls back to a regular delete
+    when the table isn't partitioned.
+    """
+    models.TimeseriesCatalog.objects.filter(model=climate_model).delete()
+
+    if not is_partitioned():
+        models.Timeseries.objects.filter(model=climate_model).delete()
+        return
+
+    name = timeseries_partition_name(climate_model)
+    logger.info(f"Dropping timeseries partition {name}")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if has_timeseries_partition(climate_model):
+            cursor.execute(f"ALTER TABLE {TIMESERIES_TABLE} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+        cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE model_id = %s", [int(climate_model.pk)])
+
+
+def replace_timeseries_partition(climate_model: models.ClimateModels):
+    """Swap a climate model's partition for an empty one, ready for the model to be reloaded"""
+    drop_timeseries_partition(climate_model)
+    ensure_timeseries_partition(climate_model)
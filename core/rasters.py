@@ -0,0 +1,614 @@
+"""
+Reading and rendering the spatial rasters (GeoTIFFs under settings.RASTER_DIR) on the server.
+
+Tiles are read through a WarpedVRT in web mercator with decimated window reads, so GDAL uses the file's overviews
+when a tile covers many source pixels. Values are coloured with the raster set's ColorRamps entry, using the same
+ramps and linear interpolation as the spatial tab in the browser.
+
+Every read goes through open_raster(), which keeps a bounded pool of open dataset handles per worker process so
+requests don't pay for opening the file and reading its header each time. Point samples and zonal statistics only
+read the window of pixels they need.
+"""
+import contextlib
+import functools
+import gzip
+import hashlib
+import json
+import os
+import struct
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.cache import cache
+from rasterio import Affine, features, windows
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.errors import NotGeoreferencedWarning, WindowError
+from rasterio.io import MemoryFile
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform, transform_bounds, transform_geom
+from rasterio.windows import Window, from_bounds
+
+from core import models
+from core.files import atomic_write
+
+TILE_SIZE = 256
+
+WEB_MERCATOR = 'EPSG:3857'
+
+# half the width of the web mercator world in metres
+MERCATOR_ORIGIN = 20037508.342789244
+
+COLOR_RAMPS = {
+    'trend': [
+        (59, 76, 124), (255, 255, 255), (254, 250, 240), (254, 246, 225), (254, 242, 211), (254, 238, 196),
+        (254, 234, 181), (254, 230, 167), (254, 226, 152), (253, 221, 141), (253, 214, 135), (253, 208, 129),
+        (253, 201, 122), (253, 195, 116), (253, 188, 110), (253, 181, 104), (253, 175, 98), (252, 167, 93),
+        (250, 158, 89), (249, 150, 85), (248, 141, 82), (247, 132, 78), (246, 124, 74), (244, 115, 70),
+        (243, 107, 66), (239, 99, 62), (235, 91, 58), (231, 83, 55), (227, 75, 51), (224, 67, 47), (220, 59, 44),
+        (216, 51, 40), (211, 44, 38), (204, 37, 38), (197, 31, 38), (191, 25, 38), (184, 18, 38), (178, 12, 38),
+        (171, 6, 38), (165, 0, 38),
+    ],
+    'viridis': [
+        (68, 1, 84), (68, 1, 84), (70, 10, 93), (71, 19, 101), (72, 27, 109), (72, 35, 116), (71, 44, 122),
+        (70, 51, 127), (68, 58, 131), (66, 65, 134), (62, 73, 137), (60, 80, 139), (57, 86, 140), (54, 93, 141),
+        (50, 100, 142), (48, 106, 142), (45, 112, 142), (43, 117, 142), (40, 124, 142), (38, 130, 142),
+        (36, 135, 142), (34, 141, 141), (32, 147, 140), (31, 153, 138), (31, 159, 136), (32, 164, 134),
+        (37, 171, 130), (84, 197, 104), (42, 176, 127), (50, 182, 122), (59, 187, 117), (72, 193, 110),
+        (96, 202, 96), (110, 206, 88), (127, 211, 78), (142, 214, 69), (157, 217, 59), (173, 220, 48),
+        (192, 223, 37), (208, 225, 28), (223, 227, 24), (239, 229, 28), (253, 231, 37),
+    ],
+}
+
+DEFAULT_COLOR_RAMP = 'viridis'
+
+WGS84 = 'EPSG:4326'
+
+ZONAL_PERCENTILES = [5, 25, 50, 75, 95]
+
+# COGs written by convert_to_cog() go in this folder under settings.RASTER_DIR
+COG_FOLDER = 'cog'
+
+# percentiles of a raster's values used to stretch its colour scale, so a few outliers don't wash out the legend
+STRETCH_PERCENTILES = (2, 98)
+HISTOGRAM_BINS = 1024
+
+# stacked raster sets are quantized to uint16, the largest value marks pixels without data
+STACK_NODATA = 65535
+STACK_LEVELS = 65534
+
+# metadata and stretch values are computed from reads at most this many pixels on a side, larger rasters are
+# read from their overviews
+METADATA_MAX_SIZE = 2048
+
+# open dataset handles kept by each worker process, least recently used first
+MAX_OPEN_DATASETS = 32
+_datasets = OrderedDict()
+_datasets_lock = threading.Lock()
+_datasets_pid = None
+
+
+def raster_file_path(raster: models.Rasters) -> str:
+    """The raster's cloud optimized GeoTIFF if it was converted when loaded, otherwise its original file"""
+    return os.path.join(settings.RASTER_DIR, raster.cog_file_name or raster.file_name)
+
+
+def convert_to_cog(path: str, cog_path: str):
+    """
+    Write a raster as a cloud optimized GeoTIFF: 256 pixel tiles, deflate compressed with a floating point
+    predictor and internal overviews, so tiles and windows can be read without reading the whole file. GDAL only
+    builds overviews for rasters larger than one tile.
+    """
+    os.makedirs(os.path.dirname(cog_path), exist_ok=True)
+    temp_path = f"{cog_path}.tmp"
+    try:
+        rasterio.shutil.copy(path, temp_path, driver='COG', COMPRESS='DEFLATE', PREDICTOR='YES', BLOCKSIZE=256,
+                             OVERVIEWS='AUTO', OVERVIEW_RESAMPLING='AVERAGE')
+        # GDAL writes the file itself so core.files.atomic_write doesn't fit, rename it into place the same way
+        os.replace(temp_path, cog_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+
+def raster_metadata(path: str) -> dict:
+    """
+    Bounds (in WGS84), crs, nodata, min/max and the STRETCH_PERCENTILES of a raster's first band, keyed by the
+    Rasters field names. Values come from a read of at most METADATA_MAX_SIZE pixels on a side, which is the whole
+    raster for the current files. Percentiles are taken from a histogram of the valid values.
+    """
+    with open_raster(path) as src:
+        scale = max(src.width / METADATA_MAX_SIZE, src.height / METADATA_MAX_SIZE, 1)
+        out_shape = (max(1, int(src.height / scale)), max(1, int(src.width / scale)))
+        data = src.read(1, out_shape=out_shape, masked=True).astype(float).filled(np.nan)
+
+        left, bottom, right, top = src.bounds
+        if src.crs and src.crs.to_string() != WGS84:
+            left, bottom, right, top = transform_bounds(src.crs, WGS84, left, bottom, right, top)
+
+        metadata = {
+            'left': left,
+            'bottom': bottom,
+            'right': right,
+            'top': top,
+            'crs': src.crs.to_string() if src.crs else '',
+            'nodata': src.nodata,
+            'min_value': None,
+            'max_value': None,
+            'stretch_min': None,
+            'stretch_max': None,
+        }
+
+    values = data[~np.isnan(data)]
+    if not values.size:
+        return metadata
+
+    minimum, maximum = float(values.min()), float(values.max())
+    metadata.update({'min_value': minimum, 'max_value': maximum, 'stretch_min': minimum, 'stretch_max': maximum})
+    if maximum > minimum:
+        counts, edges = np.histogram(values, bins=HISTOGRAM_BINS, range=(minimum, maximum))
+        cumulative = np.cumsum(counts) / values.size
+        low, high = (percentile / 100 for percentile in STRETCH_PERCENTILES)
+        metadata['stretch_min'] = float(edges[np.searchsorted(cumulative, low)])
+        metadata['stretch_max'] = float(edges[np.searchsorted(cumulative, high) + 1])
+
+    return metadata
+
+
+class _PooledDataset:
+    """A pooled dataset handle, 'users' counts the open_raster calls holding it, guarded by _datasets_lock"""
+
+    def __init__(self, modified: int, dataset):
+        self.modified = modified
+        self.dataset = dataset
+        self.lock = threading.Lock()
+        self.users = 0
+        self.retired = False
+
+    def retire(self):
+        # called with _datasets_lock held once the handle leaves the pool, the last user closes a handle in use
+        self.retired = True
+        if not self.users:
+            self.dataset.close()
+
+
+@contextlib.contextmanager
+def open_raster(path: str):
+    """
+    Open dataset handle for a raster from the process wide pool. The handle is reopened when the file changes and
+    the least recently used handle leaves the pool once more than MAX_OPEN_DATASETS are open. A handle that leaves
+    the pool is only closed once nobody is using it. Dataset handles aren't thread safe, so a handle is locked
+    while it's in use.
+    """
+    global _datasets_pid
+
+    modified = os.stat(path).st_mtime_ns
+    with _datasets_lock:
+        if _datasets_pid != os.getpid():
+            # handles inherited from a parent process share its file descriptors, start a new pool
+            _datasets.clear()
+            _datasets_pid = os.getpid()
+
+        entry = _datasets.get(path)
+        if entry is None or entry.modified != modified:
+            if entry is not None:
+                entry.retire()
+            entry = _PooledDataset(modified, rasterio.open(path))
+            _datasets[path] = entry
+        _datasets.move_to_end(path)
+        entry.users += 1
+
+        while len(_datasets) > MAX_OPEN_DATASETS:
+            _, evicted = _datasets.popitem(last=False)
+            evicted.retire()
+
+    try:
+        with entry.lock:
+            yield entry.dataset
+    finally:
+        with _datasets_lock:
+            entry.users -= 1
+            if entry.retired and not entry.users:
+                entry.dataset.close()
+
+
+def mercator_tile_bounds(z: int, x: int, y: int) -> tuple:
+    """(left, bottom, right, top) of an XYZ tile in web mercator metres"""
+    size = 2 * MERCATOR_ORIGIN / 2 ** z
+    left = -MERCATOR_ORIGIN + x * size
+    top = MERCATOR_ORIGIN - y * size
+    return left, top - size, left + size, top
+
+
+def color_ramp(name: str) -> np.ndarray:
+    """(n, 3) float array of the ramp's colours, unknown ramps fall back to viridis"""
+    return np.asarray(COLOR_RAMPS.get(name, COLOR_RAMPS[DEFAULT_COLOR_RAMP]), dtype=float)
+
+
+def colorize(data: np.ma.MaskedArray, ramp: str, vmin: float, vmax: float) -> np.ndarray:
+    """(4, rows, cols) uint8 RGBA image of 'data' scaled from vmin to vmax, masked values are transparent"""
+    colors = color_ramp(ramp)
+    span = vmax - vmin if vmax > vmin else 1.0
+    normalized = np.clip((np.ma.filled(data, vmin).astype(float) - vmin) / span, 0, 1)
+    positions = np.linspace(0, 1, len(colors))
+
+    image = np.empty((4,) + data.shape, dtype=np.uint8)
+    for band in range(3):
+        image[band] = np.rint(np.interp(normalized, positions, colors[:, band]))
+    image[3] = np.where(np.ma.getmaskarray(data), 0, 255)
+    return image
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    count, height, width = image.shape
+    # a tile image has no georeferencing of its own
+    with warnings.catch_warnings(), MemoryFile() as memory_file:
+        warnings.simplefilter('ignore', NotGeoreferencedWarning)
+        with memory_file.open(driver='PNG', width=width, height=height, count=count, dtype='uint8') as dataset:
+            dataset.write(image)
+        return memory_file.read()
+
+
+def read_tile(path: str, z: int, x: int, y: int, size: int = TILE_SIZE) -> np.ma.MaskedArray:
+    """
+    First band of the raster resampled onto an XYZ tile, masked where the raster has no data or doesn't cover the
+    tile.
+    """
+    tile = np.ma.masked_all((size, size), dtype='float32')
+
+    with open_raster(path) as src:
+        # without a nodata value the warp marks the area outside the source with an alpha band instead
+        options = {'add_alpha': True} if src.nodata is None else {}
+        with WarpedVRT(src, crs=WEB_MERCATOR, resampling=Resampling.nearest, **options) as vrt:
+            window = from_bounds(*mercator_tile_bounds(z, x, y), transform=vrt.transform)
+            try:
+                inner = window.intersection(Window(0, 0, vrt.width, vrt.height))
+            except WindowError:
+                return tile
+
+            # where the covered part of the raster lands in the tile, in tile pixels
+            scale_x = size / window.width
+            scale_y = size / window.height
+            col = int(round((inner.col_off - window.col_off) * scale_x))
+            row = int(round((inner.row_off - window.row_off) * scale_y))
+            width = min(size - col, max(1, int(round(inner.width * scale_x))))
+            height = min(size - row, max(1, int(round(inner.height * scale_y))))
+            if width <= 0 or height <= 0:
+                return tile
+
+            # a decimated read lets GDAL pick an overview instead of reading every source pixel
+            data = vrt.read(1, window=inner, out_shape=(height, width), masked=True, resampling=Resampling.nearest)
+
+    tile[row:row + height, col:col + width] = np.ma.masked_invalid(data)
+    return tile
+
+
+def render_tile(path: str, ramp: str, vmin: float, vmax: float, z: int, x: int, y: int) -> bytes:
+    return encode_png(colorize(read_tile(path, z, x, y), ramp, vmin, vmax))
+
+
+@functools.lru_cache(maxsize=256)
+def _file_value_range(path: str, modified: int) -> tuple:
+    with open_raster(path) as src:
+        data = np.ma.masked_invalid(src.read(1, masked=True))
+
+    if data.count() == 0:
+        return None, None
+    return float(data.min()), float(data.max())
+
+
+def raster_value_range(path: str) -> tuple:
+    """(min, max) of the raster's valid values, cached until the file changes"""
+    return _file_value_range(path, os.stat(path).st_mtime_ns)
+
+
+def stored_value_range(raster_set: models.SpatialRasterSets) -> tuple:
+    """
+    (min, max) over every raster in a set from the values stored on the Rasters rows when scripts/load_rasters.py
+    loaded them, never reading the files. (None, None) if any raster of the set has no stored range.
+    """
+    set_rasters = list(raster_set.rasters.all())
+    if not set_rasters or any(raster.min_value is None or raster.max_value is None for raster in set_rasters):
+        return None, None
+
+    return (min(raster.min_value for raster in set_rasters),
+            max(raster.max_value for raster in set_rasters))
+
+
+def raster_set_value_range(raster_set: models.SpatialRasterSets) -> tuple:
+    """
+    (min, max) over every raster in a set, so all the rasters of a set (e.g. the 12 months) share one colour scale.
+    Uses the values stored on the Rasters rows when they were loaded, otherwise reads the files. Missing files are
+    skipped, (None, None) if there's nothing to read.
+    """
+    minimum, maximum = stored_value_range(raster_set)
+    if minimum is not None:
+        return minimum, maximum
+
+    set_rasters = list(raster_set.rasters.all())
+    minimums = []
+    maximums = []
+    for raster in set_rasters:
+        path = raster_file_path(raster)
+        if not os.path.exists(path):
+            continue
+        low, high = raster_value_range(path)
+        if low is not None:
+            minimums.append(low)
+            maximums.append(high)
+
+    if not minimums:
+        return None, None
+    return min(minimums), max(maximums)
+
+
+def sample_raster(path: str, lng: float, lat: float):
+    """Value of the raster's first band at a longitude/latitude, None outside the raster or where it has no data"""
+    with open_raster(path) as src:
+        x, y = (lng, lat)
+        if src.crs and src.crs.to_string() != WGS84:
+            xs, ys = transform(WGS84, src.crs, [lng], [lat])
+            x, y = xs[0], ys[0]
+
+        row, col = src.index(x, y)
+        if not (0 <= row < src.height and 0 <= col < src.width):
+            return None
+
+        value = src.read(1, window=Window(col, row, 1, 1), masked=True)
+
+    value = np.ma.masked_invalid(value)
+    return None if value.mask.all() else float(value[0, 0])
+
+
+def geometry_shape(geometry: GEOSGeometry, crs) -> dict:
+    """GeoJSON dict of a WGS84 geometry in the raster's crs"""
+    shape = json.loads(geometry.json)
+    if crs and crs.to_string() != WGS84:
+        shape = transform_geom(WGS84, crs, shape)
+    return shape
+
+
+def geometry_pixels(shape: dict, raster_transform, width: int, height: int):
+    """
+    (window, mask) of the pixels of a raster grid inside a geometry, where the window covers the geometry's bounding
+    box and the mask is True for the pixels inside it. Pixels count when their centre is inside the geometry, a
+    geometry smaller than a pixel uses every pixel it touches instead. None if the geometry misses the grid.
+    """
+    bounding = from_bounds(*features.bounds(shape), transform=raster_transform)
+    col, row = int(np.floor(bounding.col_off)), int(np.floor(bounding.row_off))
+    window = Window(col, row, int(np.ceil(bounding.col_off + bounding.width)) - col,
+                    int(np.ceil(bounding.row_off + bounding.height)) - row)
+    try:
+        window = window.intersection(Window(0, 0, width, height))
+    except WindowError:
+        return None
+
+    window_transform = windows.transform(window, raster_transform)
+    out_shape = (int(window.height), int(window.width))
+    for all_touched in (False, True):
+        mask = features.geometry_mask([shape], out_shape=out_shape, transform=window_transform, invert=True,
+                                      all_touched=all_touched)
+        if mask.any():
+            return window, mask
+
+    return None
+
+
+def summarize(values: np.ndarray) -> list:
+    """
+    Statistics of each row of a (rasters, pixels) array, NaN where a raster has no data. Each row gets a dict of
+    count, mean, std, min, max and the ZONAL_PERCENTILES, or None if it has no valid pixels.
+    """
+    values = np.atleast_2d(values).astype(float)
+    counts = np.count_nonzero(~np.isnan(values), axis=1)
+
+    summaries = [None] * len(values)
+    valid = counts > 0
+    if not valid.any():
+        return summaries
+
+    rows = values[valid]
+    columns = {
+        'count': counts[valid],
+        'mean': np.nanmean(rows, axis=1),
+        'std': np.nanstd(rows, axis=1),
+        'min': np.nanmin(rows, axis=1),
+        'max': np.nanmax(rows, axis=1),
+    }
+    percentiles = np.nanpercentile(rows, ZONAL_PERCENTILES, axis=1)
+    columns.update({f'p{percentile}': percentiles[index] for index, percentile in enumerate(ZONAL_PERCENTILES)})
+
+    for position, index in enumerate(np.flatnonzero(valid)):
+        summaries[index] = {name: (int(column[position]) if name == 'count' else float(column[position]))
+                            for name, column in columns.items()}
+    return summaries
+
+
+def zonal_statistics(path: str, geometry: GEOSGeometry):
+    """
+    Statistics of the raster's first band inside a geometry: count, mean, std, min, max and the ZONAL_PERCENTILES.
+    Only the window covering the geometry is read. None if the geometry covers no valid pixels.
+    """
+    with open_raster(path) as src:
+        pixels = geometry_pixels(geometry_shape(geometry, src.crs), src.transform, src.width, src.height)
+        if pixels is None:
+            return None
+
+        window, mask = pixels
+        data = src.read(1, window=window, masked=True).astype(float).filled(np.nan)
+
+    return summarize(data[mask])[0]
+
+
+def raster_set_statistics(paths: list, zones) -> dict:
+    """
+    zonal_statistics of several rasters for every zone at once, as {(path, zone pk): statistics}. Zones without valid
+    pixels are left out.
+
+    Rasters on the same grid (e.g. the months of a set) are read into one stack, each zone's polygon is rasterized
+    once per grid and the statistics of every raster in the stack are computed in one vectorized pass per zone.
+
+    Parameters:
+        paths: raster files to summarize
+        zones: MPAZones (or anything with pk and geom) to compute the statistics for
+    """
+    # group the rasters by grid so masks can be shared
+    grids = {}
+    for path in paths:
+        with open_raster(path) as src:
+            key = (src.crs.to_string() if src.crs else None, tuple(src.transform), src.width, src.height)
+        grids.setdefault(key, []).append(path)
+
+    statistics = {}
+    for (crs, raster_transform, width, height), grid_paths in grids.items():
+        raster_transform = Affine(*raster_transform[:6])
+        stack = []
+        for path in grid_paths:
+            with open_raster(path) as src:
+                stack.append(src.read(1, masked=True).astype(float).filled(np.nan))
+        stack = np.stack(stack)
+
+        crs = CRS.from_string(crs) if crs else None
+        for zone in zones:
+            if zone.geom is None:
+                continue
+            pixels = geometry_pixels(geometry_shape(zone.geom, crs), raster_transform, width, height)
+            if pixels is None:
+                continue
+
+            window, mask = pixels
+            row, col = int(window.row_off), int(window.col_off)
+            block = stack[:, row:row + int(window.height), col:col + int(window.width)]
+            for path, summary in zip(grid_paths, summarize(block[:, mask])):
+                if summary is not None:
+                    statistics[(path, zone.pk)] = summary
+
+    return statistics
+
+
+def zonal_statistics_cache_key(raster: models.Rasters, zone: models.MPAZones) -> str:
+    """Cache key for a raster/MPA pair, changes when the raster file or the MPA's shape changes"""
+    modified = os.stat(raster_file_path(raster)).st_mtime_ns
+    shape = hashlib.sha1(bytes(zone.geom.wkb)).hexdigest()[:12]
+    return f"raster_zonal:{raster.pk}:{modified}:{zone.pk}:{shape}"
+
+
+def get_zonal_statistics(raster: models.Rasters, zone: models.MPAZones):
+    """
+    zonal_statistics for an MPA, from the shared cache when it was already computed. Rasters loaded by
+    scripts/load_rasters.py have them stored in RasterZonalStatistics, this is for anything computed on demand.
+    """
+    key = zonal_statistics_cache_key(raster, zone)
+    statistics = cache.get(key)
+    if statistics is None:
+        statistics = zonal_statistics(raster_file_path(raster), zone.geom)
+        # MPAs without valid pixels are cached too, as an empty dict
+        cache.set(key, statistics or {}, timeout=None)
+
+    return statistics or None
+
+
+def raster_stack_key(set_rasters: list) -> str:
+    """Identifies the content of a set's stack, changes whenever one of its rasters or their files change"""
+    parts = []
+    for raster in set_rasters:
+        stat = os.stat(raster_file_path(raster))
+        parts.append(f"{raster.pk}:{raster_file_path(raster)}:{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
+
+
+def build_raster_stack(raster_set: models.SpatialRasterSets, set_rasters: list) -> bytes:
+    """
+    Every raster of a set as one band of a quantized uint16 array, on the grid of the set's first raster.
+
+    Layout: uint32 header length | UTF-8 JSON header, space padded to a 4 byte boundary | one little-endian uint16
+    array of height * width values per band, row major, in the order of the header's 'bands'. A value q is
+    offset + q * scale, STACK_NODATA where there's no data.
+    """
+    with open_raster(raster_file_path(set_rasters[0])) as src:
+        crs, grid_transform, width, height = src.crs, src.transform, src.width, src.height
+        left, bottom, right, top = src.bounds
+
+    bands = []
+    for raster in set_rasters:
+        with open_raster(raster_file_path(raster)) as src:
+            if (src.crs, src.transform, src.width, src.height) == (crs, grid_transform, width, height):
+                data = src.read(1, masked=True)
+            else:
+                # bands have to line up, anything on another grid is warped onto the first raster's
+                with WarpedVRT(src, crs=crs, transform=grid_transform, width=width, height=height,
+                               resampling=Resampling.nearest) as vrt:
+                    data = vrt.read(1, masked=True)
+        bands.append(data.astype(float).filled(np.nan))
+    stack = np.stack(bands)
+
+    valid = ~np.isnan(stack)
+    minimum = float(stack[valid].min()) if valid.any() else 0.0
+    maximum = float(stack[valid].max()) if valid.any() else 0.0
+    scale = (maximum - minimum) / STACK_LEVELS if maximum > minimum else 1.0
+
+    quantized = np.full(stack.shape, STACK_NODATA, dtype='<u2')
+    quantized[valid] = np.rint((stack[valid] - minimum) / scale).astype('<u2')
+
+    if crs and crs.to_string() != WGS84:
+        left, bottom, right, top = transform_bounds(crs, WGS84, left, bottom, right, top)
+
+    header = json.dumps({
+        'id': raster_set.pk,
+        'title': raster_set.title,
+        'units': raster_set.units,
+        'precision': raster_set.precision,
+        'width': width,
+        'height': height,
+        'crs': crs.to_string() if crs else '',
+        'transform': list(grid_transform)[:6],
+        'bounds': [[bottom, left], [top, right]],
+        'bands': [{'id': raster.pk, 'label': raster.label} for raster in set_rasters],
+        'dtype': 'uint16',
+        'nodata': STACK_NODATA,
+        'scale': scale,
+        'offset': minimum,
+        'min': minimum,
+        'max': maximum,
+    }).encode('utf-8')
+    header += b' ' * (-(len(header) + 4) % 4)
+
+    return struct.pack('<I', len(header)) + header + quantized.tobytes()
+
+
+def raster_stack_cache_dir() -> str:
+    return settings.RASTER_STACK_CACHE_DIR
+
+
+def get_raster_stack(raster_set: models.SpatialRasterSets) -> tuple:
+    """
+    (etag, gzip compressed stack) for a raster set, built once and cached on disk until one of its rasters
+    changes. Raises FileNotFoundError if a raster's file is missing.
+    """
+    set_rasters = list(raster_set.rasters.all())
+    etag = raster_stack_key(set_rasters)
+    path = os.path.join(raster_stack_cache_dir(), f'{raster_set.pk}-{etag}.bin.gz')
+    try:
+        with open(path, 'rb') as file:
+            return etag, file.read()
+    except FileNotFoundError:
+        pass
+
+    payload = gzip.compress(build_raster_stack(raster_set, set_rasters), compresslevel=6, mtime=0)
+
+    atomic_write(path, payload)
+
+    # drop older versions of the set's stack
+    for file_name in os.listdir(raster_stack_cache_dir()):
+        if file_name.startswith(f'{raster_set.pk}-') and file_name != os.path.basename(path):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(raster_stack_cache_dir(), file_name))
+
+    return etag, payload
@@ -0,0 +1,361 @@
+"""
+PDF reports of an MPA's timeseries, rendered in the background.
+
+Requests are queued as ReportJobs rows by submit_report() and rendered by the run_report_worker command, so charting
+and building the PDF never ties up a web worker. Any number of workers can run at once, each claims the oldest queued
+job with SELECT ... FOR UPDATE SKIP LOCKED. Jobs are unique by their parameters and the climate model's dataset
+version, and finished PDFs are kept under settings.REPORT_CACHE_DIR/<key>.pdf, so a repeated request is served
+from disk until the model is reloaded. The generate_pdf view still returns the PDF itself, it claims the report's job
+and renders it in the request when it isn't cached yet.
+"""
+import datetime
+import hashlib
+import io
+import logging
+import os
+
+import matplotlib
+
+# the workers have no display, render the charts straight to images
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+
+from PIL import Image
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.utils import ImageReader
+from reportlab.lib.units import inch
+from reportlab.lib.pagesizes import letter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core import models
+from core.api.views import get_data_version, get_timeseries_dataframe
+from core.files import atomic_write
+
+logger = logging.getLogger('django')
+
+REPORT_FILE_NAME = "DTO_Save.pdf"
+
+# a running job that hasn't finished after this many attempts is marked failed instead of being queued again
+MAX_ATTEMPTS = 3
+
+
+def get_mpa_zone_info(mpa_id):
+    mpa = models.MPAZones.objects.get(pk=mpa_id)
+
+    mpa_name_label = "MPA Name:"
+    mpa_name_text = mpa.name_e
+
+    mpa_url_label = "MPA URL:"
+    mpa_url_text = f"{mpa.url_e}"
+
+    mpa_area_label = "km^2"
+    mpa_area_text = f"{mpa.km2}"
+
+    map = None
+    if mpa.name_e.lower() == 'st. anns bank marine protected area':
+        map = "st_anns_bank_mpa.png"
+
+    zone_info = [
+        (mpa_name_label, mpa_name_text),
+        (mpa_url_label, mpa_url_text),
+        (mpa_area_label, mpa_area_text),
+    ]
+
+    return map, zone_info
+
+
+def add_plot(title, mpa_id, ts_model=1, ts_type=1, depth=None, start_date='2020-01-01', end_date='2023-01-01',
+             indicator=1):
+    q_upper = 0.9
+    q_lower = 0.1
+
+    mpa_zone = models.MPAZones.objects.get(site_id=mpa_id)
+    indicator = models.TimeseriesVariables.objects.get(pk=indicator)
+    df = get_timeseries_dataframe(mpa_zone, ts_model, ts_type, depth, indicator=indicator)
+    if df is None:
+        raise ValueError(f"No data found for zone {mpa_zone}")
+
+    clim = df[(df.index <= '2022-12-31')]
+    clim = clim.groupby([clim.index.month, clim.index.day]).quantile()['value']
+    grouped = df.groupby([df.index.month, df.index.day])
+    upper = grouped.quantile(q=q_upper)['value']
+    lower = grouped.quantile(q=q_lower)['value']
+
+    df['upper'] = df.index.map(lambda x: upper[(x.month, x.day)])
+    df['lower'] = df.index.map(lambda x: lower[(x.month, x.day)])
+    df['climatology'] = df.index.map(lambda x: clim[(x.month, x.day)])
+
+    if start_date:
+        df = df[start_date:]
+
+    if end_date:
+        df = df[:end_date]
+
+    # Row: Add chart
+    figure, ax = plt.subplots(figsize=(10, 3.75))
+    plt.subplots_adjust(left=0.1, right=0.95, top=0.8, bottom=0.2)
+
+    plt.title(title)
+    plt.ylabel(f'{indicator.name}')
+    plt.xlabel("Date")
+    plt.xticks(rotation=30)
+
+    ax.set_xlim([df.index.min(), df.index.max()])
+
+    ax.fill_between(
+        df.index, df['value'], df['climatology'], where=(df['value'] > df['climatology']),
+        interpolate=True, color="red", alpha=0.25
+    )
+
+    ax.fill_between(
+        df.index, df['value'], df['climatology'], where=(df['value'] <= df['climatology']),
+        interpolate=True, color="blue", alpha=0.25
+    )
+
+    ax.fill_between(
+        df.index, df['upper'], df['lower'], where=(df['lower'] <= df['upper']),
+        interpolate=True, color="grey", alpha=0.5
+    )
+
+    ax.fill_between(
+        df.index, df['value'], df['upper'], where=(df['value'] > df['upper']),
+        interpolate=True, color="red", alpha=1.0
+    )
+
+    ax.fill_between(
+        df.index, df['value'], df['lower'], where=(df['value'] < df['lower']),
+        interpolate=True, color="blue", alpha=1.0
+    )
+
+    ax.plot(df['value'], color="#801515", linewidth=1)
+    ax.plot(df['climatology'], color="black", linewidth=0.7)
+
+    imgdata = io.BytesIO()
+    figure.savefig(imgdata, format='png')
+    # workers render many reports, free the figure instead of letting pyplot keep every one of them
+    plt.close(figure)
+    imgdata.seek(0)
+
+    return ImageReader(imgdata)
+
+
+def render_report(mpa_id, ts_model=1, ts_type=1, depth=None, start_date=None, end_date=None) -> bytes:
+    """The PDF report of an MPA's timeseries for a model, type, depth and date range"""
+    buffer = io.BytesIO()
+
+    margin = inch * 0.5
+    row_offset = letter[1] - margin
+
+    page_top = letter[1] - margin
+    page_bottom = margin
+    page_right = letter[0] - margin
+    page_left = margin
+
+    # align map from the bottom right of the page
+    thumbnail_map_size = 200, 200
+    thumbnail_map_position = (page_top - thumbnail_map_size[0]), page_right - thumbnail_map_size[1]
+
+    p = canvas.Canvas(buffer, pagesize=letter)
+
+    # Row: Add MPA description and Map
+    textob = p.beginText()
+    textob.setTextOrigin(page_left, page_top)
+    textob.setFont("Helvetica", 8)
+
+    map, zone_info = get_mpa_zone_info(mpa_id)
+
+    for line in zone_info:
+        textob.textLine(line[0])
+        textob.textLine(line[1])
+        textob.textLine("")
+
+    p.drawText(textob)
+
+    if map:
+        img = Image.open(os.path.join(settings.STATIC_ROOT, map))
+        img.thumbnail(thumbnail_map_size, Image.Resampling.LANCZOS)
+
+        p.drawInlineImage(img, thumbnail_map_position[1], thumbnail_map_position[0], showBoundary=True)
+
+        row_offset -= img.height + margin
+
+    plot = add_plot("Quartile Chart", mpa_id, ts_model, ts_type, depth, start_date=start_date, end_date=end_date)
+
+    ratio = (letter[0] - margin * 2) / plot.getSize()[0]
+
+    height = plot.getSize()[1] * ratio
+    width = plot.getSize()[0] * ratio
+
+    row_offset -= height
+
+    if row_offset - margin < 0:
+        rect_height = 100
+
+        textob = p.beginText()
+        textob.setTextOrigin(page_left + margin, row_offset + height - (rect_height / 2))
+        textob.setFont("Helvetica", 8)
+        textob.textLine("This is an example citation at the bottom of a page because we've run out of space here")
+
+        p.drawText(textob)
+
+        p.setFillGray(gray=0.5, alpha=0.5)
+        p.rect(margin, row_offset + height - rect_height, letter[0] - (margin * 2), rect_height, fill=1)
+
+        p.showPage()
+        row_offset = letter[1] - margin - height
+
+    p.drawImage(plot, margin, row_offset, width=width, height=height, showBoundary=True)
+
+    p.showPage()
+    p.save()
+
+    return buffer.getvalue()
+
+
+def default_report_dates(mpa_id, ts_model, ts_type, depth) -> tuple:
+    """First and last date of the MPA's series from the TimeseriesCatalog, (None, None) if it has no data"""
+    dates = models.TimeseriesCatalog.objects.filter(
+        zone_id=mpa_id, model_id=ts_model, type=ts_type, depth=depth
+    ).aggregate(first_date=Min('first_date'), last_date=Max('last_date'))
+
+    return dates['first_date'], dates['last_date']
+
+
+def report_key(mpa_id, ts_model, ts_type, depth, start_date, end_date, data_version) -> str:
+    parameters = f"{mpa_id}:{ts_model}:{ts_type}:{depth}:{start_date.isoformat()}:{end_date.isoformat()}:v{data_version}"
+    return hashlib.sha256(parameters.encode()).hexdigest()
+
+
+def report_path(job: models.ReportJobs) -> str:
+    return os.path.join(settings.REPORT_CACHE_DIR, f"{job.key}.pdf")
+
+
+def submit_report(mpa_id, ts_model=1, ts_type=1, depth=None, start_date=None, end_date=None) -> models.ReportJobs:
+    """
+    The job for a report, queued if no job for the same parameters and dataset version exists yet. Failed jobs, and
+    finished jobs whose PDF is gone, are queued again. Missing dates default to the range of the MPA's series.
+    Raises ValueError for an unknown MPA or model, unreadable dates or an MPA without data.
+
+    Parameters:
+        mpa_id: site_id of the MPA
+        ts_model: climate model id
+        ts_type: 1 bottom, 2 surface
+        depth: depth of the series, None for the total average bottom series
+        start_date: first date in the report, a date or an ISO formatted string
+        end_date: last date in the report, a date or an ISO formatted string
+    """
+    ts_type = int(ts_type)
+    if not models.MPAZones.objects.filter(pk=mpa_id).exists():
+        raise ValueError(f"Unknown MPA {mpa_id}")
+
+    data_version = get_data_version(ts_model)
+    if data_version is None:
+        raise ValueError(f"Unknown climate model {ts_model}")
+
+    if isinstance(start_date, str):
+        start_date = datetime.date.fromisoformat(start_date)
+    if isinstance(end_date, str):
+        end_date = datetime.date.fromisoformat(end_date)
+
+    if start_date is None or end_date is None:
+        first_date, last_date = default_report_dates(mpa_id, ts_model, ts_type, depth)
+        if first_date is None:
+            raise ValueError(f"No data found for MPA {mpa_id}")
+        start_date = start_date or first_date
+        end_date = end_date or last_date
+
+    key = report_key(mpa_id, ts_model, ts_type, depth, start_date, end_date, data_version)
+    job, created = models.ReportJobs.objects.get_or_create(key=key, defaults={
+        'zone_id': mpa_id, 'model_id': ts_model, 'type': ts_type, 'depth': depth, 'start_date': start_date,
+        'end_date': end_date, 'data_version': data_version,
+    })
+
+    expired = job.status == models.ReportStatus.done and not os.path.exists(report_path(job))
+    if not created and (job.status == models.ReportStatus.failed or expired):
+        # only the request that flips the status requeues the job, concurrent ones see it queued
+        models.ReportJobs.objects.filter(pk=job.pk, status=job.status).update(
+            status=models.ReportStatus.queued, error='', attempts=0, started=None, finished=None
+        )
+        job.refresh_from_db()
+
+    return job
+
+
+def claim_job(job_id=None):
+    """
+    Mark the oldest queued job, or the job with the id 'job_id' if it's still queued, as running and return it. None
+    if there is no such job or another worker claimed it first.
+    """
+    with transaction.atomic():
+        jobs = models.ReportJobs.objects.select_for_update(skip_locked=True).filter(status=models.ReportStatus.queued)
+        if job_id is not None:
+            jobs = jobs.filter(pk=job_id)
+        job = jobs.order_by('created').first()
+
+        if job is None:
+            return None
+
+        job.status = models.ReportStatus.running
+        job.started = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=['status', 'started', 'attempts'])
+
+    return job
+
+
+def run_job(job: models.ReportJobs):
+    """Render a claimed job's PDF to the report cache and record the outcome on the job"""
+    try:
+        pdf = render_report(job.zone_id, job.model_id, job.type, job.depth, job.start_date.isoformat(),
+                            job.end_date.isoformat())
+
+        atomic_write(report_path(job), pdf)
+
+        job.status = models.ReportStatus.done
+        job.error = ''
+    except Exception as e:
+        logger.exception(f"Report job {job.pk} failed")
+        job.status = models.ReportStatus.failed
+        job.error = str(e)
+
+    job.finished = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished'])
+
+
+def requeue_stale_jobs(timeout: int = None) -> int:
+    """
+    Queue running jobs again once they've been running longer than 'timeout' seconds (settings.REPORT_JOB_TIMEOUT),
+    their worker most likely died. Jobs that already used MAX_ATTEMPTS are marked failed. Returns the number requeued.
+    """
+    timeout = settings.REPORT_JOB_TIMEOUT if timeout is None else timeout
+    stale = models.ReportJobs.objects.filter(
+        status=models.ReportStatus.running, started__lt=timezone.now() - datetime.timedelta(seconds=timeout)
+    )
+
+    stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=models.ReportStatus.failed, error='The report timed out', finished=timezone.now()
+    )
+    return stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=models.ReportStatus.queued, started=None)
+
+
+def remove_outdated_reports() -> int:
+    """Delete the jobs and PDFs of reports built from an earlier dataset version, returns the number removed"""
+    outdated = []
+    for climate_model in models.ClimateModels.objects.all():
+        jobs = models.ReportJobs.objects.filter(model=climate_model, data_version__lt=climate_model.data_version)
+        outdated += list(jobs.exclude(status=models.ReportStatus.running))
+
+    for job in outdated:
+        try:
+            os.remove(report_path(job))
+        except FileNotFoundError:
+            pass
+
+    models.ReportJobs.objects.filter(pk__in=[job.pk for job in outdated]).delete()
+    return len(outdated)
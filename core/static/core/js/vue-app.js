@@ -225,10 +225,25 @@ const mapApp = createApp({
             }
         }
 
+        // The MPA files are content hashed so they can be cached forever, the manifest maps the plain file name to
+        // the current hashed one. Falls back to the plain name if there's no manifest.
+        let polygonManifest = null;
+        async function resolvePolygonFile(model_file) {
+            if (polygonManifest === null) {
+                try {
+                    const response = await fetch(paths.polygons_dir + 'mpa_manifest.json', {cache: 'no-cache'});
+                    polygonManifest = response.ok ? await response.json() : {};
+                } catch (error) {
+                    polygonManifest = {};
+                }
+            }
+            return polygonManifest[model_file] || model_file;
+        }
+
         async function loadMPAPolygons() {
 
             const modelId = state.model_id.toString().toUpperCase();
-            const model_file = `mpa_model_${modelId}.geojson`;
+            const model_file = await resolvePolygonFile(`mpa_model_${modelId}.geojson`);
             const geojsonUrl = paths.polygons_dir + model_file;
 
             try {
@@ -100,7 +100,8 @@ export const SpatialAnalysis = {
             geotiffLayer: null,
             activeRaster: null,
             activeLayer: null,
-            layerFiles: {}
+            layerFiles: {},
+            sampleTimer: null
         };
     },
 
@@ -219,6 +220,10 @@ export const SpatialAnalysis = {
                     entry.data.description = raster_set.description;
                     entry.data.units = raster_set.units;
                     entry.data.fixed = raster_set.precision;
+                    // the server colours the tiles over the range of the whole set
+                    entry.globalMin = raster_set.value_range.min;
+                    entry.globalMax = raster_set.value_range.max;
+                    entry.stack_url = raster_set.stack_url;
 
                     if (raster_set.rasters.length > 0) {
                         entry.data.rasters = []
@@ -331,8 +336,11 @@ export const SpatialAnalysis = {
             }
 
             const model_file = `mpa_model_${this.climate_model}.geojson`;
-            const geojsonUrl = this.path_to_mpafolder + model_file;
-            fetch(geojsonUrl)
+            // the manifest maps the plain file name to the current content hashed file
+            fetch(this.path_to_mpafolder + 'mpa_manifest.json', {cache: 'no-cache'})
+                .then(response => response.ok ? response.json() : {})
+                .catch(() => ({}))
+                .then(manifest => fetch(this.path_to_mpafolder + (manifest[model_file] || model_file)))
                 .then(response => {
                     if (!response.ok) {
                         throw new Error(`Could not load MPA Json file: ${response.status}`);
@@ -358,27 +366,43 @@ export const SpatialAnalysis = {
                 return;
             }
 
+            const layerProps = this.layerFiles[this.activeLayer];
+            if (layerProps.stack) {
+                // every band of a stacked set is already in the browser
+                const rasterData = layerProps.loadedRasters.find(raster => raster.label === this.activeRaster);
+                this.showValue(this.stackValue(layerProps.stack, rasterData.band, evt.latlng));
+                return;
+            }
+
+            // values are sampled on the server, wait for the mouse to settle before asking
+            clearTimeout(this.sampleTimer);
+            this.sampleTimer = setTimeout(() => this.showSample(evt.latlng), 150);
+        },
+
+        showValue(value) {
+            const layer_props = this.layerFiles[this.activeLayer];
+            const infoControl = document.getElementById('layer-info-control')
+            if (value !== null && value !== -9999 && value !== 0) {
+                infoControl.innerHTML = `<b>${layer_props.data.label}: ${parseFloat(value).toFixed(layer_props.data.fixed)} ${layer_props.data.units}</b>`;
+            } else {
+                infoControl.innerHTML = 'No data at this point';
+            }
+        },
+
+        async showSample(latlng) {
             const layer_props = this.layerFiles[this.activeLayer];
             const infoControl = document.getElementById('layer-info-control')
             const rasterData = layer_props.loadedRasters.find(raster => raster.label === this.activeRaster);
-            const georaster = rasterData.georaster;
-            const latlng = evt.latlng;
             try {
-                // Access the georaster directly and use its values method
-                const x = Math.floor((latlng.lng - georaster.xmin) / georaster.pixelWidth);
-                const y = Math.floor((georaster.ymax - latlng.lat) / georaster.pixelHeight);
-
-                // Check if within bounds
-                if (x >= 0 && x < georaster.width && y >= 0 && y < georaster.height) {
-                    const value = georaster.values[0][y][x];
-                    if (value !== undefined && value !== null && value !== -9999 && value !== 0) {
-                        infoControl.innerHTML = `<b>${layer_props.data.label}: ${parseFloat(value).toFixed(layer_props.data.fixed)} ${layer_props.data.units}</b>`;
-                    } else {
-                        infoControl.innerHTML = 'No data at this point';
-                    }
-                } else {
-                    infoControl.innerHTML = 'Outside data area';
-                }
+                const url = new URL(rasterData.sample_url, window.location.origin);
+                url.searchParams.set('lat', latlng.lat);
+                url.searchParams.set('lng', latlng.lng);
+
+                const response = await fetch(url.toString());
+                if (!response.ok) throw new Error(`HTTP error! Status: ${response.status}`);
+                const sample = await response.json();
+
+                this.showValue(sample.value);
             } catch (e) {
                 console.error('Error getting value:', e);
                 infoControl.innerHTML = 'Outside data area';
@@ -404,9 +428,9 @@ export const SpatialAnalysis = {
             const unitsLabel = document.getElementById('colorbar-units');
             const maxLabel = document.getElementById('colorbar-max');
             if (minLabel && maxLabel) {
-                minLabel.textContent = min.toFixed(4);
+                minLabel.textContent = min !== null ? min.toFixed(4) : "";
                 unitsLabel.textContent = "(" + units + ")";
-                maxLabel.textContent = max.toFixed(4);
+                maxLabel.textContent = max !== null ? max.toFixed(4) : "";
             }
         },
 
@@ -428,97 +452,147 @@ export const SpatialAnalysis = {
                 this.activeLayer = layerType;
                 const layerProps = this.layerFiles[this.activeLayer];
 
-                await this.loadGeoTiff(layerProps.data.rasters);
-                // this.layerFiles[this.activeLayer].data.rasters.forEach(raster => {
-                //     this.displayRaster(raster.label, true);
-                // });
+                if (layerProps.data.rasters.length > 1) {
+                    await this.loadRasterStack(layerProps);
+                } else {
+                    this.loadRasterLayers(layerProps.data.rasters);
+                }
                 this.updateColorbar();
             }
 
             const layerProps = this.layerFiles[this.activeLayer];
             selectedRaster = selectedRaster || layerProps.data.rasters[0].label;
-            this.displayRaster(selectedRaster, true);
+            this.displayRaster(selectedRaster);
         },
 
-        displayRaster(selectedRaster, reloadColors = false) {
+        displayRaster(selectedRaster) {
             const activeRasterData = this.layerFiles[this.activeLayer].loadedRasters.find(r => r.label === this.activeRaster);
             const newRasterData = this.layerFiles[this.activeLayer].loadedRasters.find(r => r.label === selectedRaster);
             if (activeRasterData) {
                 this.map.removeLayer(activeRasterData.layer); // Hide raster
                 this.activeRaster = null;
             }
+            if (!newRasterData.layer) {
+                // bands of a stacked set are drawn the first time they're shown
+                newRasterData.layer = this.stackBandLayer(this.layerFiles[this.activeLayer], newRasterData.band);
+            }
             this.map.addLayer(newRasterData.layer); // Show raster
             this.activeRaster = selectedRaster;
-
-            if (reloadColors) {
-                newRasterData.layer.updateColors(this.set_color)
-            }
         },
 
-        async loadGeoTiff(rasters) {
+        loadRasterLayers(rasters) {
             if (!rasters || rasters.length === 0) return;
 
-            const rasterPromises = rasters.map(raster => {
-                const url = this.path_to_geofolder + raster.file_name;
-                return fetch(url)
-                    .then(response => {
-                        if (!response.ok) throw new Error(`HTTP error! Status: ${response.status}`);
-                        return response.arrayBuffer();
-                    })
-                    .then(arrayBuffer => parseGeoraster(arrayBuffer))
-                    .then(georaster => {
-                        const layer = new GeoRasterLayer({
-                            georaster: georaster,
-                            resolution: 256,
-                        });
-
-                        return {
-                            label: raster.label,
-                            file_name: raster.file_name,
-                            georaster: georaster,
-                            layer: layer,
-                        };
-                    });
-            });
+            // the rasters are drawn from server rendered PNG tiles, only the tiles in view are downloaded
+            this.layerFiles[this.activeLayer].loadedRasters = rasters.map(raster => ({
+                label: raster.label,
+                file_name: raster.file_name,
+                sample_url: raster.sample_url,
+                layer: L.tileLayer(raster.tile_url, {maxZoom: 19}),
+            }));
+        },
 
+        async loadRasterStack(layerProps) {
+            // All the rasters of a set (e.g. the 12 months) come in one quantized uint16 array, so switching
+            // between them happens in the browser. no-cache revalidates with the stack's ETag.
             try {
-                this.layerFiles[this.activeLayer].loadedRasters = await Promise.all(rasterPromises);
+                if (!layerProps.stack) {
+                    const response = await fetch(layerProps.stack_url, {cache: 'no-cache'});
+                    if (!response.ok) throw new Error(`HTTP error! Status: ${response.status}`);
+                    const buffer = await response.arrayBuffer();
+
+                    const headerLength = new DataView(buffer).getUint32(0, true);
+                    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+                    const size = header.width * header.height;
+                    const bands = header.bands.map((band, index) =>
+                        new Uint16Array(buffer, 4 + headerLength + index * size * 2, size));
+
+                    if (header.crs !== 'EPSG:4326') {
+                        // only longitude/latitude grids are drawn locally
+                        throw new Error(`Unsupported stack crs ${header.crs}`);
+                    }
+                    layerProps.stack = {header, bands};
+                }
+            } catch (error) {
+                console.error('Error loading raster stack, using tiles instead:', error);
+                this.loadRasterLayers(layerProps.data.rasters);
+                return;
+            }
 
-                let globalMin = Infinity;
-                let globalMax = -Infinity;
+            layerProps.loadedRasters = layerProps.stack.header.bands.map((band, index) => ({
+                label: band.label,
+                band: index,
+                layer: null,
+            }));
+        },
 
-                this.layerFiles[this.activeLayer].loadedRasters.forEach(raster => {
-                    const {mins, maxs} = raster.georaster;
-                    globalMin = Math.min(globalMin, mins[0]);
-                    globalMax = Math.max(globalMax, maxs[0]);
-                });
-                this.layerFiles[this.activeLayer].globalMin = globalMin
-                this.layerFiles[this.activeLayer].globalMax = globalMax
-            } catch (error) {
-                console.error('Error loading rasters:', error);
+        stackValue(stack, index, latlng) {
+            const {header, bands} = stack;
+            const [[south, west], [north, east]] = header.bounds;
+            const col = Math.floor((latlng.lng - west) / (east - west) * header.width);
+            const row = Math.floor((north - latlng.lat) / (north - south) * header.height);
+            if (col < 0 || col >= header.width || row < 0 || row >= header.height) {
+                return null;
             }
+
+            const quantized = bands[index][row * header.width + col];
+            return quantized === header.nodata ? null : header.offset + quantized * header.scale;
         },
 
-        set_color(values) {
-            const layerProps = this.layerFiles[this.activeLayer];
+        stackBandLayer(layerProps, index) {
+            const {header, bands} = layerProps.stack;
+            const band = bands[index];
+            const [[south, west], [north, east]] = header.bounds;
             const colors = layerProps.colors;
             const min = layerProps.globalMin;
-            const max = layerProps.globalMax;
-            const value = values[0];
-
-            const normalizedValue = Math.max(0, Math.min(1, (value - min) / (max - min)));
+            const span = (layerProps.globalMax - min) || 1;
             const numSegments = colors.length - 1;
-            const segment = Math.min(Math.floor(normalizedValue * numSegments), numSegments - 1);
-            const segmentPosition = (normalizedValue * numSegments) - segment;
 
-            const color1 = colors[segment];
-            const color2 = colors[segment + 1];
+            // canvas rows are evenly spaced in web mercator, the way Leaflet stretches the image, so each one is
+            // filled from the raster row at its latitude
+            const mercatorY = lat => Math.log(Math.tan(Math.PI / 4 + lat * Math.PI / 360));
+            const top = mercatorY(north);
+            const bottom = mercatorY(south);
+
+            const canvas = document.createElement('canvas');
+            canvas.width = header.width;
+            canvas.height = header.height;
+            const context = canvas.getContext('2d');
+            const image = context.createImageData(header.width, header.height);
+
+            for (let row = 0; row < header.height; row++) {
+                const y = top - (row + 0.5) * (top - bottom) / header.height;
+                const lat = (2 * Math.atan(Math.exp(y)) - Math.PI / 2) * 180 / Math.PI;
+                const sourceRow = Math.min(header.height - 1, Math.floor((north - lat) / (north - south) * header.height));
+
+                for (let col = 0; col < header.width; col++) {
+                    const quantized = band[sourceRow * header.width + col];
+                    const pixel = (row * header.width + col) * 4;
+                    if (quantized === header.nodata) {
+                        image.data[pixel + 3] = 0;
+                        continue;
+                    }
 
-            const r = Math.round(color1.r + segmentPosition * (color2.r - color1.r));
-            const g = Math.round(color1.g + segmentPosition * (color2.g - color1.g));
-            const b = Math.round(color1.b + segmentPosition * (color2.b - color1.b));
+                    // same ramp interpolation as the server rendered tiles
+                    const value = header.offset + quantized * header.scale;
+                    const normalizedValue = Math.max(0, Math.min(1, (value - min) / span));
+                    const segment = Math.min(Math.floor(normalizedValue * numSegments), numSegments - 1);
+                    const segmentPosition = (normalizedValue * numSegments) - segment;
+                    const color1 = colors[segment];
+                    const color2 = colors[segment + 1];
+
+                    image.data[pixel] = Math.round(color1.r + segmentPosition * (color2.r - color1.r));
+                    image.data[pixel + 1] = Math.round(color1.g + segmentPosition * (color2.g - color1.g));
+                    image.data[pixel + 2] = Math.round(color1.b + segmentPosition * (color2.b - color1.b));
+                    image.data[pixel + 3] = 255;
+                }
+            }
+            context.putImageData(image, 0, 0);
 
-            return `rgba(${r}, ${g}, ${b}, 1.0)`;
+            const layer = L.imageOverlay(canvas.toDataURL(), [[south, west], [north, east]]);
+            // keep the pixels sharp instead of blurring them when zoomed in
+            layer.on('load', () => layer.getElement().style.imageRendering = 'pixelated');
+            return layer;
         },
     },
 
@@ -0,0 +1,178 @@
+"""
+Mapbox Vector Tiles of the MPA polygons, built by PostGIS and cached on disk.
+
+Cached tiles live under settings.TILE_CACHE_DIR/mpas/<model>/v<data version>/<z>/<x>/<y>.mvt. Reloading a model's
+timeseries bumps its data version, which changes the set of MPAs with data, so those tiles are never reused.
+Reloading the MPA shapes clears every cached MPA tile with invalidate_mpa_tiles().
+
+PNG tiles of the spatial rasters are cached under settings.TILE_CACHE_DIR/rasters/<raster>/<key>/<z>/<x>/<y>.png,
+where the key changes whenever the file, colour ramp or value range changes. That cache is bounded by
+settings.RASTER_TILE_CACHE_MAX_BYTES and evicts the least recently used tiles.
+"""
+import hashlib
+import logging
+import os
+import shutil
+
+from django.conf import settings
+from django.db import connection
+
+from core import models, rasters
+from core.files import atomic_write
+
+logger = logging.getLogger('django')
+
+MPA_TILE_LAYER = 'mpas'
+
+# tile size in MVT coordinates and the buffer around it, the PostGIS defaults
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+MAX_ZOOM = 22
+
+RASTER_TILE_LAYER = 'rasters'
+
+# check the size of the raster tile cache after this many tiles are written by a process
+RASTER_TILE_EVICT_INTERVAL = 200
+_raster_tiles_written = 0
+
+MPA_TILE_SQL = f"""
+WITH bounds AS (
+    SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+), tile AS (
+    SELECT ST_AsMVTGeom(ST_Transform(zone.geom, 3857), bounds.geom, {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+           zone.site_id,
+           zone.name_e AS name,
+           classification.name_e AS class,
+           classification.colour
+    FROM {models.MPAZones._meta.db_table} zone
+    JOIN bounds ON ST_Intersects(zone.geom, ST_Transform(bounds.geom, 4326))
+    LEFT JOIN {models.Classifications._meta.db_table} classification ON classification.id = zone.classification_id
+    WHERE EXISTS (
+        SELECT 1 FROM {models.TimeseriesCatalog._meta.db_table} catalog
+        WHERE catalog.zone_id = zone.site_id AND catalog.model_id = %(model)s
+    )
+)
+SELECT ST_AsMVT(tile.*, '{MPA_TILE_LAYER}', {TILE_EXTENT}, 'geom') FROM tile
+"""
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def mpa_tile_cache_dir() -> str:
+    return os.path.join(settings.TILE_CACHE_DIR, MPA_TILE_LAYER)
+
+
+def mpa_tile_path(climate_model: models.ClimateModels, z: int, x: int, y: int) -> str:
+    return os.path.join(mpa_tile_cache_dir(), str(climate_model.pk), f'v{climate_model.data_version}',
+                        str(z), str(x), f'{y}.mvt')
+
+
+def build_mpa_tile(climate_model: models.ClimateModels, z: int, x: int, y: int) -> bytes:
+    """MVT tile of the MPAs with data for a climate model, with the site_id, name, class and colour of each MPA"""
+    with connection.cursor() as cursor:
+        cursor.execute(MPA_TILE_SQL, {'z': z, 'x': x, 'y': y, 'model': climate_model.pk})
+        tile = cursor.fetchone()[0]
+
+    return bytes(tile) if tile else b''
+
+
+def get_mpa_tile(climate_model: models.ClimateModels, z: int, x: int, y: int) -> bytes:
+    """Cached MPA tile, built and written to the tile cache on a miss"""
+    path = mpa_tile_path(climate_model, z, x, y)
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        pass
+
+    tile = build_mpa_tile(climate_model, z, x, y)
+    atomic_write(path, tile)
+
+    return tile
+
+
+def invalidate_mpa_tiles():
+    """Remove every cached MPA tile, called when the MPA shapes are reloaded"""
+    logger.info("Clearing the MPA tile cache")
+    shutil.rmtree(mpa_tile_cache_dir(), ignore_errors=True)
+
+
+def raster_tile_cache_dir() -> str:
+    return os.path.join(settings.TILE_CACHE_DIR, RASTER_TILE_LAYER)
+
+
+def raster_tile_path(raster: models.Rasters, ramp: str, vmin: float, vmax: float, z: int, x: int, y: int) -> str:
+    stat = os.stat(rasters.raster_file_path(raster))
+    key = hashlib.sha1(f"{stat.st_mtime_ns}:{stat.st_size}:{ramp}:{vmin!r}:{vmax!r}".encode()).hexdigest()[:12]
+    return os.path.join(raster_tile_cache_dir(), str(raster.pk), key, str(z), str(x), f'{y}.png')
+
+
+def get_raster_tile(raster: models.Rasters, z: int, x: int, y: int) -> bytes:
+    """
+    Cached PNG tile of a raster coloured with its set's colour ramp over the set's value range, rendered and
+    written to the tile cache on a miss. Raises FileNotFoundError if the raster's file is missing.
+    """
+    global _raster_tiles_written
+
+    raster_set = raster.spatial_set
+    ramp = raster_set.color.name
+    vmin, vmax = rasters.raster_set_value_range(raster_set)
+    if vmin is None:
+        vmin, vmax = 0.0, 1.0
+
+    path = raster_tile_path(raster, ramp, vmin, vmax, z, x, y)
+    try:
+        with open(path, 'rb') as file:
+            tile = file.read()
+        # the modification time is the tile's last use for the LRU eviction, atime isn't reliable on noatime mounts
+        os.utime(path)
+        return tile
+    except FileNotFoundError:
+        pass
+
+    tile = rasters.render_tile(rasters.raster_file_path(raster), ramp, vmin, vmax, z, x, y)
+    atomic_write(path, tile)
+
+    _raster_tiles_written += 1
+    if _raster_tiles_written % RASTER_TILE_EVICT_INTERVAL == 0:
+        evict_raster_tiles()
+
+    return tile
+
+
+def evict_raster_tiles(max_bytes: int = None):
+    """Remove the least recently used raster tiles until the cache is back under 90% of max_bytes"""
+    max_bytes = settings.RASTER_TILE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    entries = []
+    total = 0
+    for directory, _, file_names in os.walk(raster_tile_cache_dir()):
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # another worker evicted it first
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    if total <= max_bytes:
+        return
+
+    target = max_bytes * 0.9
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    logger.info(f"Evicted {removed} raster tiles from the tile cache")
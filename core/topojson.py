@@ -0,0 +1,115 @@
+"""
+Minimal TopoJSON encoder for polygon layers.
+
+Coordinates are quantized to an integer grid, rings are cut at the junctions where neighbouring polygons start or
+stop sharing a boundary, and each arc is stored once. Polygons that share an edge reference the same arc (reversed
+with ~index on one side), and arcs are delta encoded as the TopoJSON spec allows for quantized topologies.
+"""
+from collections import defaultdict
+
+
+def _polygons(geometry: dict) -> list:
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    return geometry['coordinates']
+
+
+def _quantize_ring(ring, translate, scale) -> list:
+    points = [(round((x - translate[0]) / scale[0]), round((y - translate[1]) / scale[1])) for x, y, *_ in ring]
+    points = [point for index, point in enumerate(points) if index == 0 or point != points[index - 1]]
+    if points[0] != points[-1]:
+        points.append(points[0])
+    return points
+
+
+def _junctions(rings: list) -> set:
+    """Points where rings meet with different neighbours, i.e. where a shared boundary begins or ends"""
+    neighbours = defaultdict(set)
+    for ring in rings:
+        open_ring = ring[:-1]
+        count = len(open_ring)
+        for index, point in enumerate(open_ring):
+            pair = frozenset((open_ring[index - 1], open_ring[(index + 1) % count]))
+            neighbours[point].add(pair)
+
+    return {point for point, pairs in neighbours.items() if len(pairs) > 1}
+
+
+def _split_ring(ring: list, junctions: set) -> list:
+    open_ring = ring[:-1]
+    cuts = [index for index, point in enumerate(open_ring) if point in junctions]
+    if not cuts:
+        # start unshared rings at a fixed point so identical rings produce identical arcs
+        start = open_ring.index(min(open_ring))
+        rotated = open_ring[start:] + open_ring[:start]
+        return [rotated + [rotated[0]]]
+
+    rotated = open_ring[cuts[0]:] + open_ring[:cuts[0]]
+    rotated.append(rotated[0])
+    cuts = [index - cuts[0] for index in cuts] + [len(open_ring)]
+
+    return [rotated[start:end + 1] for start, end in zip(cuts, cuts[1:])]
+
+
+def _delta_encode(arc: list) -> list:
+    encoded = [list(arc[0])]
+    encoded += [[x - px, y - py] for (px, py), (x, y) in zip(arc, arc[1:])]
+    return encoded
+
+
+def topology(features: list, object_name: str, precision: int = 5) -> dict:
+    """
+    TopoJSON Topology with a single GeometryCollection of the Polygon/MultiPolygon 'features', quantized to
+    'precision' decimal places. Feature ids, properties and any other feature members are kept on the geometries.
+
+    Parameters:
+        features: GeoJSON Feature dicts
+        object_name: name of the GeometryCollection in the topology's objects
+        precision: decimal places kept, the quantization grid is 10^-precision degrees
+    """
+    features = [feature for feature in features if feature.get('geometry')]
+    coordinates = [(x, y) for feature in features for polygon in _polygons(feature['geometry'])
+                   for ring in polygon for x, y, *_ in ring]
+    if not coordinates:
+        return {'type': 'Topology', 'objects': {object_name: {'type': 'GeometryCollection', 'geometries': []}},
+                'arcs': []}
+
+    translate = [min(x for x, _ in coordinates), min(y for _, y in coordinates)]
+    scale = [10 ** -precision, 10 ** -precision]
+
+    quantized = [
+        [[_quantize_ring(ring, translate, scale) for ring in polygon] for polygon in _polygons(feature['geometry'])]
+        for feature in features
+    ]
+    junctions = _junctions([ring for polygons in quantized for polygon in polygons for ring in polygon])
+
+    arcs = []
+    arc_index = {}
+
+    def arc_id(arc):
+        key = tuple(arc)
+        if key in arc_index:
+            return arc_index[key]
+        reversed_key = key[::-1]
+        if reversed_key in arc_index:
+            return ~arc_index[reversed_key]
+        arc_index[key] = len(arcs)
+        arcs.append(arc)
+        return arc_index[key]
+
+    geometries = []
+    for feature, polygons in zip(features, quantized):
+        geometry = {
+            'type': 'MultiPolygon',
+            'arcs': [[[arc_id(arc) for arc in _split_ring(ring, junctions)] for ring in polygon]
+                     for polygon in polygons],
+        }
+        geometry.update({key: value for key, value in feature.items() if key not in ('type', 'geometry')})
+        geometries.append(geometry)
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': scale, 'translate': translate},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': [_delta_encode(arc) for arc in arcs],
+    }
@@ -15,4 +15,7 @@ urlpatterns = [
     path('max_date/', views.get_max_date, name='get_max_date'),
     path('get_climate_models/', views.get_climate_models, name='get_climate_models'),
     path('generate_pdf/', views.generate_pdf, name='generate_pdf'),
+    path('reports/', views.submit_report, name='submit_report'),
+    path('reports/<int:job_id>/', views.report_status, name='report_status'),
+    path('reports/<int:job_id>/download/', views.report_download, name='report_download'),
 ]
\ No newline at end of file
@@ -1,30 +1,21 @@
+import json
 import io
 import os
-import numpy as np
 import pandas as pd
 import branca.colormap as cm
 import logging
 
-import matplotlib.pyplot as plt
-
-from PIL import Image
-from django.db.models import Max, Min
-
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.units import inch
-from reportlab.lib.pagesizes import letter
+from django.db.models import Max
 
 from django.conf import settings
-from django.http import JsonResponse, HttpResponse, HttpResponseRedirect, FileResponse
-from django.urls import translate_url
-from django.shortcuts import render, redirect
+from django.http import JsonResponse, HttpResponse, HttpResponseRedirect, FileResponse, Http404
+from django.urls import translate_url, reverse
+from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.utils.translation import activate
 
 
-from core import models
-from core.api.views import get_timeseries_dataframe, get_base_timeseries, get_quantile_data
+from core import models, reports
 
 logger = logging.getLogger('')
 
@@ -77,16 +68,13 @@ def get_network_indicators(year, zone, climate_model):
         # },
     ]
 
-    db_indicators = zone.indicators.filter(model=climate_model, year=year)
-    if db_indicators.exists():
+    db_indicators = zone.indicators.filter(model=climate_model, year=year).select_related('type')
+    weights = dict(zone.indicator_weights.values_list('type', 'weight'))
+    if db_indicators:
         for db_indicator in db_indicators:
             value = db_indicator.value
-            min_max = db_indicator.type.indicators.exclude(value=np.nan).aggregate(
-                min_value=Min('value'),
-                max_value=Max('value')
-            )
-            min = min_max['min_value']
-            max = min_max['max_value']
+            min = db_indicator.type.min_value
+            max = db_indicator.type.max_value
             # Ensure min and max are not equal to avoid division by zero
             if max != min:
                 percentage = ((value - min) / (max - min)) * 100
@@ -100,7 +88,7 @@ def get_network_indicators(year, zone, climate_model):
                 'min': min,
                 'max': max,
                 'width': percentage,
-                'weight': zone.indicator_weights.get(type=db_indicator.type).weight,
+                'weight': weights.get(db_indicator.type.pk, 1),
                 'colorbar': 'success'
             })
 
@@ -205,11 +193,12 @@ def set_language(request):
     return HttpResponseRedirect(next_url)
 
 
-def add_attributes(mpa):
+def add_attributes(mpa, resolution='medium'):
     value = 20
-    simplified_poly = mpa.geom
-    if simplified_poly.num_coords > 10000:
-        simplified_poly = mpa.geom.simplify(1, preserve_topology=True)
+    # use the simplified geometry stored when the MPA shapes were loaded rather than simplifying on every request
+    geometry = next((geometry.geometry for geometry in mpa.geometries.all() if geometry.resolution == resolution), None)
+    if geometry is None:
+        geometry = mpa.serialized_representation or json.loads(mpa.geom.geojson)
 
     geo_json = {
         "type": "Feature",
@@ -223,201 +212,85 @@ def add_attributes(mpa):
             'km2': round(mpa.km2, 0),
             'ts_value': value,
         },
-        "geometry": {
-            "type": simplified_poly.geom_type,
-            "coordinates": simplified_poly.coords,
-        }
+        "geometry": geometry
     }
 
     return geo_json
 
 
-def get_mpa_zone_info(mpa_id):
-    mpa = models.MPAZones.objects.get(pk=mpa_id)
-
-    mpa_name_label = "MPA Name:"
-    mpa_name_text = mpa.name_e
-
-    mpa_url_label = "MPA URL:"
-    mpa_url_text = f"{mpa.url_e}"
-
-    mpa_area_label = "km^2"
-    mpa_area_text = f"{mpa.km2}"
-
-    map = None
-    if mpa.name_e.lower() == 'st. anns bank marine protected area':
-        map = "st_anns_bank_mpa.png"
-
-    zone_info = [
-        (mpa_name_label, mpa_name_text),
-        (mpa_url_label, mpa_url_text),
-        (mpa_area_label, mpa_area_text),
-    ]
-
-    return map, zone_info
-
-
-def add_plot(title, mpa_id, depth=None, start_date='2020-01-01', end_date='2023-01-01', indicator=1):
-    q_upper = 0.9
-    q_lower = 0.1
-
-    mpa_zone = models.MPAZones.objects.get(site_id=mpa_id)
-    indicator = models.TimeseriesVariables.objects.get(pk=indicator)
-    df = get_timeseries_dataframe(mpa_zone, depth, indicator=indicator)
-
-    clim = df[(df.index <= '2022-12-31')]
-    clim = clim.groupby([clim.index.month, clim.index.day]).quantile()['value']
-    grouped = df.groupby([df.index.month, df.index.day])
-    upper = grouped.quantile(q=q_upper)['value']
-    lower = grouped.quantile(q=q_lower)['value']
-
-    df['upper'] = df.index.map(lambda x: upper[(x.month, x.day)])
-    df['lower'] = df.index.map(lambda x: lower[(x.month, x.day)])
-    df['climatology'] = df.index.map(lambda x: clim[(x.month, x.day)])
-
-    if start_date:
-        df = df[start_date:]
-
-    if end_date:
-        df = df[:end_date]
-
-    # Row: Add chart
-    figure, ax = plt.subplots(figsize=(10, 3.75))
-    plt.subplots_adjust(left=0.1, right=0.95, top=0.8, bottom=0.2)
+def report_job_data(job: models.ReportJobs) -> dict:
+    data = {
+        'id': job.pk,
+        'status': job.status,
+        'error': job.error,
+        'status_url': reverse('core:report_status', args=[job.pk]),
+        'download_url': None,
+    }
+    if job.status == models.ReportStatus.done:
+        data['download_url'] = reverse('core:report_download', args=[job.pk])
 
-    plt.title(title)
-    plt.ylabel(f'{indicator.name}')
-    plt.xlabel("Date")
-    plt.xticks(rotation=30)
+    return data
 
-    ax.set_xlim([df.index.min(), df.index.max()])
-    # ax.plot(df.index, df['temperature'], df.index, df['climatology'])
 
-    ax.fill_between(
-        df.index, df['value'], df['climatology'], where=(df['value'] > df['climatology']),
-        interpolate=True, color="red", alpha=0.25
-    )
+def submit_report(request):
+    """
+    Queue a PDF report for the MPA, dates and depth in the query string, using the session's climate model. Returns
+    the job, identical requests share one job until the model's data is reloaded.
+    """
+    mpa_id, climate_model, depth, start_date, end_date, timeseries_type = parse_request_variables(request)
 
-    ax.fill_between(
-        df.index, df['value'], df['climatology'], where=(df['value'] <= df['climatology']),
-        interpolate=True, color="blue", alpha=0.25
-    )
+    try:
+        job = reports.submit_report(mpa_id, climate_model, timeseries_type, depth, start_date, end_date)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    ax.fill_between(
-        df.index, df['upper'], df['lower'], where=(df['lower'] <= df['upper']),
-        interpolate=True, color="grey", alpha=0.5
-    )
+    return JsonResponse(report_job_data(job), status=200 if job.status == models.ReportStatus.done else 202)
 
-    ax.fill_between(
-        df.index, df['value'], df['upper'], where=(df['value'] > df['upper']),
-        interpolate=True, color="red", alpha=1.0
-    )
 
-    ax.fill_between(
-        df.index, df['value'], df['lower'], where=(df['value'] < df['lower']),
-        interpolate=True, color="blue", alpha=1.0
-    )
+def report_status(request, job_id):
+    job = get_object_or_404(models.ReportJobs, pk=job_id)
+    return JsonResponse(report_job_data(job))
 
-    ax.plot(df['value'], color="#801515", linewidth=1)
-    ax.plot(df['climatology'], color="black", linewidth=0.7)
 
-    imgdata = io.BytesIO()
-    figure.savefig(imgdata, format='png')
-    imgdata.seek(0)
+def report_download(request, job_id):
+    job = get_object_or_404(models.ReportJobs, pk=job_id)
+    if job.status != models.ReportStatus.done:
+        return JsonResponse(report_job_data(job), status=409)
 
-    return ImageReader(imgdata)
+    try:
+        return FileResponse(open(reports.report_path(job), 'rb'), as_attachment=True,
+                            filename=reports.REPORT_FILE_NAME)
+    except FileNotFoundError:
+        raise Http404("The report has expired, submit it again")
 
 
 def generate_pdf(request):
+    """
+    The PDF report for the MPA, dates and depth in the query string. A report that was already rendered is served from
+    the report cache, otherwise it's rendered in this request and stored for the next one. Use submit_report to have
+    the report workers render it instead.
+    """
     mpa_id, climate_model, depth, start_date, end_date, timeseries_type = parse_request_variables(request)
 
-    timeseries = models.Timeseries.objects.order_by('date_time')
-    if not start_date:
-        start_date = timeseries.first().date_time
-
-    if not end_date:
-        end_date = timeseries.last().date_time
-
-    if not mpa_id:
-        return FileResponse()
-
-    buffer = io.BytesIO()
-
-    margin = inch * 0.5
-    row_offset = letter[1] - margin
-
-    page_top = letter[1] - margin
-    page_bottom = margin
-    page_right = letter[0] - margin
-    page_left = margin
-
-    # align map from the bottom right of the page
-    thumbnail_map_size = 200, 200
-    thumbnail_map_position = (page_top - thumbnail_map_size[0]), page_right - thumbnail_map_size[1]
-
-    p = canvas.Canvas(buffer, pagesize=letter)
-
-    # Row: Add MPA description and Map
-    textob = p.beginText()
-    textob.setTextOrigin(page_left, page_top)
-    textob.setFont("Helvetica", 8)
-
-    map, zone_info = get_mpa_zone_info(mpa_id)
-
-    for line in zone_info:
-        textob.textLine(line[0])
-        textob.textLine(line[1])
-        textob.textLine("")
-
-    p.drawText(textob)
-
-    if map:
-        img = Image.open(os.path.join(settings.STATIC_ROOT, map))
-        img.thumbnail(thumbnail_map_size, Image.Resampling.LANCZOS)
-
-        p.drawInlineImage(img, thumbnail_map_position[1], thumbnail_map_position[0], showBoundary=True)
-
-        row_offset -= img.height + margin
-
-    # df.set_index('date_time', inplace=True)
-
-    year_span = 30 / 6
-    year = 1993
-    plot = add_plot("Quartile Chart", mpa_id, depth, start_date=start_date, end_date=end_date)
-    year += year_span
-
-    ratio = (letter[0] - margin * 2) / plot.getSize()[0]
-
-    height = plot.getSize()[1] * ratio
-    width = plot.getSize()[0] * ratio
-
-    row_offset -= height
-
-    if row_offset - margin < 0:
-        rect_height = 100
-
-        textob = p.beginText()
-        textob.setTextOrigin(page_left + margin, row_offset + height - (rect_height / 2))
-        textob.setFont("Helvetica", 8)
-        textob.textLine("This is an example citation at the bottom of a page because we've run out of space here")
-
-        p.drawText(textob)
-
-        p.setFillGray(gray=0.5, alpha=0.5)
-        p.rect(margin, row_offset + height - rect_height, letter[0] - (margin * 2), rect_height, fill=1)
-
-        p.showPage()
-        row_offset = letter[1] - margin - height
-
-    p.drawImage(plot, margin, row_offset, width=width, height=height, showBoundary=True)
+    try:
+        job = reports.submit_report(mpa_id, climate_model, timeseries_type, depth, start_date, end_date)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    row_offset -= margin
+    if job.status != models.ReportStatus.done or not os.path.exists(reports.report_path(job)):
+        claimed = reports.claim_job(job.pk)
+        if claimed is None:
+            # a report worker is already rendering it, don't wait on the queue
+            pdf = reports.render_report(job.zone_id, job.model_id, job.type, job.depth, job.start_date.isoformat(),
+                                        job.end_date.isoformat())
+            return FileResponse(io.BytesIO(pdf), as_attachment=True, filename=reports.REPORT_FILE_NAME)
 
-    p.showPage()
-    p.save()
+        job = claimed
+        reports.run_job(job)
+        if job.status == models.ReportStatus.failed:
+            return JsonResponse(report_job_data(job), status=500)
 
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename="DTO_Save.pdf")
+    return report_download(request, job.pk)
 
 
 def get_anomaly(request):
@@ -517,11 +390,11 @@ def get_max_date(request):
     ts_model = int(request.session.get('selected_model', 1))
     ts_model = request.GET.get('model', ts_model)
 
-    return JsonResponse({'max_date': models.Timeseries.objects.filter(type=ts_type, model=ts_model).aggregate(Max('date_time'))["date_time__max"]})
+    return JsonResponse({'max_date': models.TimeseriesCatalog.objects.filter(type=ts_type, model=ts_model).aggregate(Max('last_date'))["last_date__max"]})
 
 def get_climate_models(request):
     mpa_id = int(request.GET.get('mpa_id', -1))
     mpa = models.MPAZones.objects.get(site_id=mpa_id)
-    climate_models = models.Timeseries.objects.filter(zone=mpa).values_list('model', flat=True).distinct()
+    climate_models = models.TimeseriesCatalog.objects.filter(zone=mpa).values_list('model', flat=True).distinct()
     models_array = [(m.pk, f'{m.name}') for m in models.ClimateModels.objects.filter(pk__in=climate_models)]
     return JsonResponse({'climate_models': models_array})
\ No newline at end of file
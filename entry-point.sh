@@ -6,4 +6,9 @@
 #python manage.py check
 python manage.py collectstatic --noinput
 python manage.py migrate --noinput
+# once the migrations have run, fill the climatology cache in the background so the first requests after a deploy
+# don't pay for it
+python manage.py warm_climatology &
+# render the queued PDF reports outside the web workers
+python manage.py run_report_worker &
 python -m gunicorn config.wsgi:application --bind 0.0.0.0:8000 --workers 3
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+Micro-benchmark comparing the old row-by-row timeseries/quantile payload assembly on a DataFrame of Timeseries rows
+against the column-wise builders in core.api.views on the same series read back from TimeseriesArrays. The series is
+a synthetic 30 year series by default, which needs no database access, or a stored series when a TimeseriesArrays id
+is given.
+
+Run with:
+    python manage.py shell -c "from scripts import benchmark_timeseries_payload; benchmark_timeseries_payload.run()"
+    python manage.py shell -c "from scripts import benchmark_timeseries_payload; benchmark_timeseries_payload.run(series_id=1)"
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from rest_framework.renderers import JSONRenderer
+
+from core import models
+from core.api.views import build_timeseries_records, build_quantile_records
+from core.climatology import compute_climatology
+
+
+def rows_dataframe(rows):
+    """DataFrame of Timeseries rows, built the way get_timeseries_dataframe built it before the packed series"""
+    df = pd.DataFrame(list(rows))
+    df['date_time'] = pd.to_datetime(df['date_time'])
+    df.set_index('date_time', inplace=True)
+    return df
+
+
+def packed_dataframe(series: models.TimeseriesArrays):
+    """DataFrame of a packed series, built the way get_timeseries_array_dataframe builds it"""
+    dates, values = series.get_series()
+    return pd.DataFrame({'value': values}, index=pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='date_time'))
+
+
+def synthetic_frames(start_date='1993-01-01', end_date='2022-12-31', seed=0):
+    """A synthetic series as Timeseries rows and as the TimeseriesArrays row the loader would pack them into"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start_date, end_date, name='date_time')
+    day = dates.dayofyear.to_numpy()
+    # the model output is written with a few decimal places
+    values = np.round(5 + 4 * np.sin(2 * np.pi * day / 365.25) + rng.normal(0, 0.75, len(dates)), 4)
+
+    rows = [{'date_time': date, 'value': float(value)} for date, value in zip(dates.date, values)]
+
+    series = models.TimeseriesArrays()
+    series.set_series(dates.values, values)
+    return rows_dataframe(rows), packed_dataframe(series)
+
+
+def stored_frames(series_id):
+    """A stored packed series and the Timeseries rows it was packed from"""
+    series = models.TimeseriesArrays.objects.get(pk=series_id)
+    rows = models.Timeseries.objects.filter(
+        zone=series.zone_id, model=series.model_id, type=series.type, indicator=series.indicator_id,
+        depth=series.depth
+    ).order_by('date_time').values('date_time', 'value')
+    return rows_dataframe(rows), packed_dataframe(series)
+
+
+def add_observations(df, seed=0, observation_rate=0.02):
+    """Join a sparse set of observations the same way get_timeseries_dataframe_with_observations does"""
+    rng = np.random.default_rng(seed)
+    values = df['value'].to_numpy()
+    observed = rng.random(len(df)) < observation_rate
+    obs_df = pd.DataFrame({
+        'observation': np.round(values[observed] + rng.normal(0, 0.5, observed.sum()), 4),
+        'count': rng.integers(1, 20, observed.sum()),
+        'std': np.round(rng.random(observed.sum()), 4),
+    }, index=df.index[observed])
+
+    return df.join(obs_df, how='left')
+
+
+def multi_index_frame(values):
+    """Day of year array as the (month, day) indexed frame the old code looked values up in"""
+    days = pd.date_range('2000-01-01', '2000-12-31')
+    index = pd.MultiIndex.from_arrays([days.month, days.day])
+    return pd.DataFrame({'value': values}, index=index)
+
+
+def legacy_timeseries_records(df, climatology, std, ts_type):
+    return [{
+        "type": {
+            "id": ts_type,
+            "label": dict(models.Timeseries.TIMESERIES_TYPES).get(ts_type),
+        },
+        "date": f'{date.strftime("%Y-%m-%d")} 00:01',
+        "ts_data": str(daily_data['value'].item()),
+        "climatology": f'{climatology["value"][date.month, date.day]}',
+        "std_dev": f'{std["value"][date.month, date.day]}',
+        "observation": ({
+            'value': daily_data['observation'],
+            'count': daily_data['count'],
+            'std_dev': daily_data['std'] } if 'observation' in daily_data and pd.notnull(daily_data['observation']) else None)
+    } for date, daily_data in df.iterrows()]
+
+
+def legacy_quantile_records(df, lower, upper):
+    return [{"date": f'{date.strftime("%Y-%m-%d")} 00:01',
+             "lowerq": f'{lower["value"][date.month, date.day]}',
+             "upperq": f'{upper["value"][date.month, date.day]}'}
+            for date, mt in df.iterrows()]
+
+
+def run(repeat=3, series_id=None):
+    rows_df, packed_df = stored_frames(series_id) if series_id else synthetic_frames()
+    assert rows_df.index.equals(packed_df.index), "the packed series has different dates than the rows"
+    rows_df = add_observations(rows_df)
+    packed_df = add_observations(packed_df)
+
+    # the old code computed the climatology from the rows, the new one reads the materialized Climatologies row
+    legacy_climatology = compute_climatology(rows_df.index, rows_df['value'].to_numpy())
+    stored = models.Climatologies()
+    stored.set_climatology(compute_climatology(packed_df.index, packed_df['value'].to_numpy()))
+    climatology = stored.get_climatology()
+
+    lower = climatology.quantile(0.1)
+    upper = climatology.quantile(0.9)
+
+    median_frame = multi_index_frame(legacy_climatology.median)
+    std_frame = multi_index_frame(legacy_climatology.std)
+    lower_frame = multi_index_frame(legacy_climatology.quantile(0.1))
+    upper_frame = multi_index_frame(legacy_climatology.quantile(0.9))
+
+    renderer = JSONRenderer()
+
+    # the payloads must render to identical JSON
+    legacy = renderer.render(legacy_timeseries_records(rows_df, median_frame, std_frame, 1))
+    vectorized = renderer.render(build_timeseries_records(packed_df, climatology, 1))
+    assert legacy == vectorized, "timeseries payloads differ"
+
+    legacy = renderer.render(legacy_quantile_records(rows_df, lower_frame, upper_frame))
+    vectorized = renderer.render(build_quantile_records(packed_df, lower, upper))
+    assert legacy == vectorized, "quantile payloads differ"
+
+    timings = {
+        'timeseries (iterrows)': lambda: legacy_timeseries_records(rows_df, median_frame, std_frame, 1),
+        'timeseries (vectorized)': lambda: build_timeseries_records(packed_df, climatology, 1),
+        'quantile (iterrows)': lambda: legacy_quantile_records(rows_df, lower_frame, upper_frame),
+        'quantile (vectorized)': lambda: build_quantile_records(packed_df, lower, upper),
+    }
+
+    print(f"{len(rows_df)} daily rows, best of {repeat}")
+    for label, func in timings.items():
+        seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f"{label:<25} {seconds * 1000:10.1f} ms")
+
+
+if __name__ == '__main__':
+    run()
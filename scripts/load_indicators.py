@@ -1,158 +1,16 @@
-import math
-import os
+import functools
 import re
 import pandas as pd
-import numpy as np
+
+from django.db import transaction
 
 from core import models
+from core.parallel import run_in_processes
 
 from pathlib import Path
 from tqdm import tqdm
 
 
-def load_onset_of_spring(mpa, data, climate_model, batch_size=1000):
-    """
-    Load onset of spring data into the database with batched bulk inserts.
-
-    Parameters:
-    mpa: MPA object to associate with the time series data
-    data: Pandas DataFrame containing onset of spring data
-    climate_model: What climate model to use when saving data
-    batch_size: Number of records to insert in each database batch
-    """
-    try:
-        # Setup tracking variables
-        add_data = []
-        total_rows = len(data)
-        rows_processed = 0
-        batches_completed = 0
-        unit = "Onset of Spring Anomalies (weeks)"
-
-        indicator_category = models.IndicatorCategories.objects.get_or_create(name="Unknown")[0]
-        indicator_type = models.IndicatorTypes.objects.get_or_create(name="Anomaly in Onset of Spring (weeks)", unit=unit, category=indicator_category)[0]
-        models.IndicatorWeights.objects.get_or_create(type=indicator_type, zone=mpa)
-        indicator_type.indicators.filter(zone=mpa).delete()
-
-        # Initialize progress bar
-        with tqdm(total=total_rows, desc=f"Loading data ({indicator_type.name})") as pbar:
-            # Process each row
-            for row in data.iterrows():
-                try:
-                    # Convert value to float or NaN
-                    value = float(row[1].iloc[0])
-                except ValueError:
-                    value = np.nan
-
-                # Create new time series entry
-                add_data.append(
-                    models.Indicators(
-                        zone=mpa,
-                        type=indicator_type,
-                        model=climate_model,
-                        year=row[0],
-                        value=value,
-                    )
-                )
-
-                rows_processed += 1
-
-                # Batch insert when reaching batch size
-                if len(add_data) >= batch_size:
-                    models.Indicators.objects.bulk_create(add_data)
-                    batches_completed += 1
-                    pbar.set_postfix(batches=batches_completed)
-                    add_data = []
-
-                # Update progress bar
-                pbar.update(1)
-
-            # Insert any remaining records
-            if add_data:
-                models.Indicators.objects.bulk_create(add_data)
-                batches_completed += 1
-
-        print(f"Completed loading {rows_processed} records in {batches_completed} batches")
-
-    except Exception as e:
-        print(f"Error loading onset of spring data: {str(e)}")
-        raise
-
-
-def read_onset_of_spring(mpa, filename, climate_model, date_col='Date', chunksize=100000):
-    """
-    Read and load onset of spring data from a CSV file with chunking for large files.
-
-    Parameters:
-    mpa: MPA object to associate with the time series
-    filename: Path to CSV file containing time series data
-    date_col: Column name containing date information
-    chunksize: Number of rows to process at once (for large files)
-    """
-    try:
-        file_path = Path(filename)
-        print(f"Loading time series from {file_path.name}")
-
-        # Get file size for reporting
-        file_size_mb = file_path.stat().st_size / (1024 * 1024)
-        print(f"File size: {file_size_mb:.2f} MB")
-
-        # For large files, use chunking
-        if file_size_mb > 50:  # Threshold for chunking (50MB)
-            print(f"Large file detected, processing in chunks of {chunksize} rows")
-
-            # Process file in chunks with progress bar
-            reader = pd.read_csv(filename, chunksize=chunksize)
-
-            # Process each chunk
-            for i, chunk in enumerate(tqdm(reader, desc="Processing chunks")):
-                chunk = chunk.set_index(date_col)
-                load_onset_of_spring(mpa, chunk, climate_model)
-
-        else:
-            # For smaller files, read all at once
-            timeseries = pd.read_csv(filename)
-            timeseries = timeseries.set_index(date_col)
-            print(f"Read {len(timeseries)} timeseries records")
-            load_onset_of_spring(mpa, timeseries, climate_model)
-
-    except Exception as e:
-        print(f"Error reading time series file {filename}: {str(e)}")
-        raise
-
-def load_mpas_from_dict(data: dict, climate_model):
-    """
-    Load time series data for multiple MPAs from dictionary containing file paths.
-
-    Parameters:
-    data (dict): Dictionary with MPA IDs as keys and file paths as values
-    """
-    print(f"Stage 1: Processing {len(data)} MPAs...")
-    # Main progress bar for MPAs
-    with tqdm(total=len(data), desc="Loading MPAs") as mpa_pbar:
-        for mpa_id, mpa_dict in data.items():
-            try:
-                # Update description with current MPA ID
-                mpa_pbar.set_description(f"Loading MPA {mpa_id}")
-
-                # Get MPA and clear existing data
-                mpa = models.MPAZones.objects.get(pk=mpa_id)
-
-                # Stage 1: Process Onset Of Spring
-                mpa_pbar.set_postfix(file="Onset of Spring Anomalies")
-                spring_anom = mpa_dict.get('ONSET_OF_SPRING')
-                if spring_anom:
-                    read_onset_of_spring(mpa, spring_anom, climate_model)
-
-                mpa_pbar.update(1)
-
-            except models.MPAZones.DoesNotExist:
-                print(f"Warning: MPA with ID {mpa_id} not found in database")
-            except Exception as e:
-                print(f"Error processing MPA {mpa_id}: {str(e)}")
-
-    print("Data loading complete!")
-
-
 def build_surface_mpa_dictionary(data_directory) -> dict:
     """
     Build a dictionary mapping MPA IDs to their associated temperature time series files.
@@ -196,131 +54,189 @@ def build_surface_mpa_dictionary(data_directory) -> dict:
     return data
 
 
-def load_std_anomaly(indicator_type, climate_model, zone, timeseries_type):
+class Indicator:
+    """
+    An indicator computed for every zone of a climate model at once. 'compute' takes the climate model and returns
+    a DataFrame with zone_id, year and value columns. If 'model_names' is set the indicator only applies to those
+    models.
     """
-    Load standardized anomaly data into the database for a specific indicator type, climate model, zone, and timeseries type.
+
+    def __init__(self, name, unit, compute, category="Unknown", model_names=None):
+        self.name = name
+        self.unit = unit
+        self.compute = compute
+        self.category = category
+        self.model_names = model_names
+
+    def applies_to(self, climate_model: models.ClimateModels) -> bool:
+        return self.model_names is None or climate_model.name.lower() in [name.lower() for name in self.model_names]
+
+
+# registered indicators by key, add new ones with register_indicator
+INDICATORS: dict[str, Indicator] = {}
+
+
+def register_indicator(key, name, unit, category="Unknown", model_names=None):
+    def decorator(compute):
+        INDICATORS[key] = Indicator(name, unit, compute, category, model_names)
+        return compute
+    return decorator
+
+
+def daily_values(climate_model: models.ClimateModels, timeseries_type, indicator=1) -> pd.DataFrame:
+    """
+    Daily zone_id, date_time, value rows of the total average bottom or surface series for every zone of a model.
+    Packed series are used where they exist, anything else is read from the Timeseries table in one query.
+    """
+    frames = []
+    packed_zones = []
+    series_arrays = models.TimeseriesArrays.objects.filter(model=climate_model, indicator=indicator,
+                                                           type=timeseries_type, depth=None)
+    for series in series_arrays:
+        dates, values = series.get_series()
+        frames.append(pd.DataFrame({'zone_id': series.zone_id, 'date_time': dates, 'value': values}))
+        packed_zones.append(series.zone_id)
+
+    rows = models.Timeseries.objects.filter(
+        model=climate_model, indicator=indicator, type=timeseries_type, depth=None
+    ).exclude(zone__in=packed_zones).values_list('zone_id', 'date_time', 'value')
+    frames.append(pd.DataFrame.from_records(list(rows), columns=['zone_id', 'date_time', 'value']))
+
+    daily = pd.concat(frames, ignore_index=True)
+    daily['date_time'] = pd.to_datetime(daily['date_time'])
+    return daily
+
+
+def standardized_anomalies(daily: pd.DataFrame, climatology_years=30) -> pd.DataFrame:
+    """
+    Annual standardized anomaly for each zone: the annual mean less the mean of the first 'climatology_years'
+    annual means, divided by their standard deviation.
 
     Parameters:
-    indicator_type: The variable this timeseries tracks (e.g., 'Temperature', 'Salinity').
-    climate_model: The model the timeseries is based on (e.g., 'GLORYS', 'Canso100', 'CIOPS').
-    zone: The MPA (Marine Protected Area) the anomaly is being generated for.
-    timeseries_type: The type of timeseries data (1 = Bottom, 2 = Surface).
+    daily: DataFrame of zone_id, date_time and value rows
+    climatology_years: Number of years, from the start of each zone's series, in the climatology
     """
+    # Step 1: Calculate annual mean temperatures for each zone and year
+    annual_means = daily.groupby(['zone_id', daily['date_time'].dt.year.rename('year')])['value'].mean()
 
-    indicator_type.indicators.filter(zone=zone, model=climate_model).delete()
+    # Step 2 & 3: climatology mean and standard deviation of the first years of each zone
+    climatology = annual_means.groupby(level='zone_id').head(climatology_years).groupby(level='zone_id').agg(['mean', 'std'])
 
-    mpa_timeseries = zone.timeseries.filter(model=climate_model, indicator=1, type=timeseries_type, depth=None).order_by('date_time')
+    # Step 4: Annual standardized anomaly
+    anomaly = annual_means.sub(climatology['mean'], level='zone_id').div(climatology['std'], level='zone_id')
+    return anomaly.rename('value').reset_index()
 
-    if not mpa_timeseries.exists():
-        return
 
-    df = pd.DataFrame(list(mpa_timeseries.values('date_time', 'depth', 'value')))
-    df['date_time'] = pd.to_datetime(df['date_time'])
-    df.set_index('date_time', inplace=True)
+@register_indicator('bottom_std_anomaly', "Total Average Bottom Standardized Temperature Anomaly",
+                    'Standardized Anomalies (σ)')
+def bottom_std_anomaly(climate_model: models.ClimateModels) -> pd.DataFrame:
+    return standardized_anomalies(daily_values(climate_model, 1))
 
-    # Step 1: Calculate annual mean temperatures for each year
-    df['year'] = df.index.year
-    annual_means = df.groupby('year')['value'].mean()
 
-    # Step 2: Calculate annual climatology (mean of annual means from 1993 to 2021)
-    climatology_years = annual_means.iloc[:30]
-    climatology_mean = climatology_years.mean()
+@register_indicator('surface_std_anomaly', "Surface Standardized Temperature Anomaly", 'Standardized Anomalies (σ)')
+def surface_std_anomaly(climate_model: models.ClimateModels) -> pd.DataFrame:
+    return standardized_anomalies(daily_values(climate_model, 2))
 
-    # Step 3: Calculate standard deviation for climatology (std deviation of the 30 years)
-    climatology_std = climatology_years.std()
 
-    # Step 4: Annual standardized anomaly
-    anomaly = (annual_means - climatology_mean) / climatology_std
-
-    data = {
-        'dates': [str(year) for year in anomaly.index],
-        'values': anomaly.values.tolist()
-    }
-
-    add_data = []
-    rows_processed = 0
-    batches_completed = 0
-    total_rows = len(anomaly)
-    batch_size = 1000
-
-    with tqdm(total=total_rows, desc=f"Loading data ({indicator_type.name})") as pbar:
-        # Process each row
-        for year, val in zip(data['dates'], data['values']):
-            try:
-                # Convert value to float or NaN
-                value = float(val)
-            except ValueError:
-                value = np.nan
-
-            # Create new time series entry
-            add_data.append(
-                models.Indicators(
-                    zone=zone,
-                    type=indicator_type,
-                    model=climate_model,
-                    year=year,
-                    value=value,
-                )
-            )
-
-            rows_processed += 1
-
-            # Batch insert when reaching batch size
-            if len(add_data) >= batch_size:
-                models.Indicators.objects.bulk_create(add_data)
-                batches_completed += 1
-                pbar.set_postfix(batches=batches_completed)
-                add_data = []
-
-            # Update progress bar
-            pbar.update(1)
-
-        # Insert any remaining records
-        if add_data:
-            models.Indicators.objects.bulk_create(add_data)
-            batches_completed += 1
-
-
-def load_std_anomalies(climate_model: models.ClimateModels, batch_limit=10):
+@register_indicator('onset_of_spring', "Anomaly in Onset of Spring (weeks)", "Onset of Spring Anomalies (weeks)",
+                    model_names=['GLORYS'])
+def onset_of_spring(climate_model: models.ClimateModels, data_directory=Path('./scripts/data/GLORYS_surface/'),
+                    date_col='Date') -> pd.DataFrame:
+    frames = []
+    for mpa_id, mpa_dict in build_surface_mpa_dictionary(data_directory).items():
+        data = pd.read_csv(mpa_dict['ONSET_OF_SPRING'], index_col=date_col)
+        frames.append(pd.DataFrame({
+            'zone_id': mpa_id,
+            'year': data.index.astype(int),
+            'value': pd.to_numeric(data.iloc[:, 0], errors='coerce').to_numpy(),
+        }))
+
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['zone_id', 'year', 'value'])
+
+
+def replace_indicators(indicator: Indicator, climate_model: models.ClimateModels, data: pd.DataFrame):
+    """
+    Replace all of a climate model's values for an indicator with one bulk insert.
+
+    Parameters:
+    indicator: Registered indicator the values are for
+    climate_model: The model the values were computed from
+    data: DataFrame with zone_id, year and value columns
+    """
+    indicator_category = models.IndicatorCategories.objects.get_or_create(name=indicator.category)[0]
+    indicator_type = models.IndicatorTypes.objects.get_or_create(
+        name=indicator.name, unit=indicator.unit, category=indicator_category
+    )[0]
+
+    zone_ids = set(models.MPAZones.objects.filter(site_id__in=data['zone_id'].unique().tolist())
+                   .values_list('site_id', flat=True))
+    if missing := set(data['zone_id'].unique().tolist()) - zone_ids:
+        print(f"Warning: MPAs {sorted(missing)} not found in database, skipping")
+    data = data[data['zone_id'].isin(zone_ids)]
+
+    with transaction.atomic():
+        indicator_type.indicators.filter(model=climate_model).delete()
+        models.Indicators.objects.bulk_create([
+            models.Indicators(zone_id=zone_id, type=indicator_type, model=climate_model, year=year, value=value)
+            for zone_id, year, value in zip(data['zone_id'].tolist(), data['year'].tolist(), data['value'].tolist())
+        ], batch_size=5000)
+
+        weighted_zones = set(indicator_type.indicator_weights.values_list('zone_id', flat=True))
+        models.IndicatorWeights.objects.bulk_create([
+            models.IndicatorWeights(type=indicator_type, zone_id=zone_id) for zone_id in zone_ids - weighted_zones
+        ])
+
+        indicator_type.update_range()
+
+    print(f"Loaded {len(data)} {indicator.name} values for {len(zone_ids)} MPAs")
+
+
+def compute_indicator(key, climate_model: models.ClimateModels) -> pd.DataFrame:
+    return INDICATORS[key].compute(climate_model)
+
+
+def run_indicators(climate_model: models.ClimateModels, keys=None, workers=1):
+    """
+    Compute registered indicators for every zone of a climate model and store them.
+
+    Parameters:
+    climate_model: The model to compute indicators for
+    keys: Keys of the indicators to compute, every indicator that applies to the model if None
+    workers: Number of processes to compute indicators in. Indicators are independent so each can be computed
+        in its own process, results are written by this process.
+    """
+    keys = [key for key in (keys or INDICATORS) if INDICATORS[key].applies_to(climate_model)]
+
+    results = {}
+    computed = run_in_processes(functools.partial(compute_indicator, climate_model=climate_model), keys, workers)
+    for key, data, error in tqdm(computed, total=len(keys), desc=f"Computing indicators ({climate_model.name})"):
+        if error is not None:
+            print(f"Error computing {key}: {str(error)}")
+            continue
+        results[key] = data
+
+    for key, data in results.items():
+        replace_indicators(INDICATORS[key], climate_model, data)
+
+
+def load_std_anomalies(climate_model: models.ClimateModels, workers=1):
     # for each Model, for each Zone, for each year, for each timeseries type (surface, bottom)
     # compute a standardized anomaly and store it in the Indicators table
     #
     # we won't be computing a std. anomaly for each depth. Just the general surface and the total average bottom
-    indicator_category = models.IndicatorCategories.objects.get_or_create(name="Unknown")[0]
-
-    types = [1, 2] # 1 is Bottom, 2 is surface
-
-    unit = 'Standardized Anomalies (σ)'
-    zone_ids = climate_model.timeseries.values_list('zone__site_id', flat=True).distinct()
-    zones_total = models.MPAZones.objects.filter(site_id__in=zone_ids)
-    total = zones_total.count()
-    batches = math.ceil(float(total / batch_limit))
-    print(str(batches))
-    with tqdm(total=total, desc=f"Loading data ({climate_model.name})") as pbar:
-        for batch in range(batches):
-            zones = zones_total[batch_limit * batch: batch_limit * batch + batch_limit]
-            for zone in zones:
-                for timeseries_type in types:
-                    name = ("Total Average Bottom" if timeseries_type == 1 else "Surface") + " Standardized Temperature Anomaly"
-                    std_anom_indicator = \
-                    models.IndicatorTypes.objects.get_or_create(name=name, unit=unit, category=indicator_category)[0]
-                    models.IndicatorWeights.objects.get_or_create(type=std_anom_indicator, zone=zone)
-                    load_std_anomaly(std_anom_indicator, climate_model, zone, timeseries_type)
-            pbar.update(len(zones))
+    run_indicators(climate_model, ['bottom_std_anomaly', 'surface_std_anomaly'], workers)
     print(f"Data Transfer Completed!")
 
 
 def load_ciopse():
     cm = models.ClimateModels.objects.get(name__iexact='ciopse')
-    load_std_anomalies(cm, 4)
+    load_std_anomalies(cm)
 
 
 def load_onset():
     model = models.ClimateModels.objects.get_or_create(name="GLORYS", priority=1)
-    data_directory = Path('./scripts/data/GLORYS_surface/')
-    glorys_data = build_surface_mpa_dictionary(data_directory)
-    load_mpas_from_dict(glorys_data, climate_model=model[0])
+    run_indicators(model[0], ['onset_of_spring'])
 
-def load_mpas():
-    load_std_anomalies()
-    load_onset()
+def load_mpas(workers=1):
+    for climate_model in models.ClimateModels.objects.all():
+        run_indicators(climate_model, workers=workers)
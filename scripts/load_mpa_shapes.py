@@ -1,10 +1,15 @@
+import json
 import geopandas as gpd
 
 from django.contrib.gis.db.models import Union
 from django.contrib.gis.geos import MultiPolygon, GEOSGeometry
 from django.core.management import call_command
+from django.db import transaction
+from tqdm import tqdm
 
-from core import models
+from core import models, tiles
+from core.geometry import RESOLUTIONS, simplified_geojson
+from scripts import load_rasters
 
 # Auto-generated `LayerMapping` dictionary for mpa model
 mpa_mapping = {
@@ -160,5 +165,39 @@ def update_mpas(reload=False):
             print(f"Could not load zone {mpa.name_e} - {shp.OBJECTI}")
             print(str(e))
 
+        # full resolution GeoJSON, so it never has to be generated while serving a request
+        mpa.serialized_representation = json.loads(mpa.geom.geojson) if mpa.geom else None
+
     models.MPAZones.objects.bulk_create(new_mpa_list)
-    models.MPAZones.objects.bulk_update(update_mpa_list, ['name_e', 'name_f', 'url_e', 'url_f', 'km2', 'classification', 'geom'])
\ No newline at end of file
+    models.MPAZones.objects.bulk_update(update_mpa_list, ['name_e', 'name_f', 'url_e', 'url_f', 'km2', 'classification', 'geom', 'serialized_representation'])
+
+    build_mpa_geometries(new_mpa_list + update_mpa_list)
+    tiles.invalidate_mpa_tiles()
+
+    # the raster statistics are per MPA shape
+    load_rasters.load_all_raster_statistics()
+
+
+def build_mpa_geometries(mpas=None):
+    """
+    Store a simplified, quantized GeoJSON geometry for each zoom band in core.geometry.RESOLUTIONS
+
+    Parameters:
+    mpas: MPAs to build the geometries for, every MPA if None
+    """
+    if mpas is None:
+        mpas = models.MPAZones.objects.all()
+
+    geometries = []
+    for mpa in tqdm(mpas, desc="Simplifying MPA geometries"):
+        if not mpa.geom:
+            continue
+
+        for resolution, _, tolerance, precision in RESOLUTIONS:
+            geometries.append(models.MPAZoneGeometries(
+                zone=mpa, resolution=resolution, geometry=simplified_geojson(mpa.geom, tolerance, precision)
+            ))
+
+    with transaction.atomic():
+        models.MPAZoneGeometries.objects.filter(zone__in=[mpa.pk for mpa in mpas]).delete()
+        models.MPAZoneGeometries.objects.bulk_create(geometries)
\ No newline at end of file
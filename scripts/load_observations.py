@@ -1,7 +1,10 @@
 import os
 import re
+import numpy as np
 import pandas as pd
 
+from django.db import transaction
+
 from core import models
 from tqdm import tqdm
 
@@ -9,7 +12,8 @@ from tqdm import tqdm
 # --------------------------------------------------------------------
 # | date | 66 m T | 66 m std(T) | 66 m | 78 m T | 78 m std(T) | 78 m | etc...
 # --------------------------------------------------------------------
-def load_observations(zone: models.MPAZones, indicator: models.TimeseriesVariables, dataframe: pd.DataFrame):
+def load_observations(zone: models.MPAZones, indicator: models.TimeseriesVariables, dataframe: pd.DataFrame,
+                      batch_size=5000):
     # Find all depths from column names (e.g., '66 m T')
     depth_pattern = re.compile(r"(\d+)\s*m\s*T")
     depths = []
@@ -18,24 +22,38 @@ def load_observations(zone: models.MPAZones, indicator: models.TimeseriesVariabl
         if match:
             depths.append(int(match.group(1)))
 
-    zone.observations.all().delete()
-
-    for _, row in tqdm(dataframe.iterrows(), desc=f"Loading {zone.name_e} observations"):
-        date = row['Date']
-        for depth in depths:
-            value = row.get(f"{depth} m T")
-            std = row.get(f"{depth} m std(T)")
-            count = row.get(f"{depth} m N")
-            if pd.notnull(value) and pd.notnull(std) and count > 0:
-                models.Observations.objects.create(
-                    zone=zone,
-                    indicator=indicator,
-                    date_time=date,
-                    depth=depth,
-                    value=value,
-                    std=std,
-                    count=int(count)
-                )
+    # a depth needs its value, std and count columns
+    depths = [depth for depth in depths
+              if {f"{depth} m T", f"{depth} m std(T)", f"{depth} m N"}.issubset(dataframe.columns)]
+
+    def depth_array(suffix):
+        columns = dataframe[[f"{depth} m {suffix}" for depth in depths]]
+        return columns.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+
+    # (date, depth) arrays for each of the triplet columns
+    values = depth_array("T")
+    stds = depth_array("std(T)")
+    counts = depth_array("N")
+
+    keep = ~np.isnan(values) & ~np.isnan(stds) & (counts > 0)
+    rows, columns = np.nonzero(keep)
+
+    dates = pd.to_datetime(dataframe['Date']).dt.date.to_numpy()
+    observations = [
+        models.Observations(zone=zone, indicator=indicator, date_time=date, depth=depth, value=value, std=std,
+                            count=count)
+        for date, depth, value, std, count in zip(
+            dates[rows], np.asarray(depths, dtype=np.int64)[columns].tolist(), values[rows, columns].tolist(),
+            stds[rows, columns].tolist(), counts[rows, columns].astype(np.int64).tolist()
+        )
+    ]
+
+    # replace the zone's observations in one transaction so readers never see a partly loaded zone
+    with transaction.atomic():
+        zone.observations.filter(indicator=indicator).delete()
+        models.Observations.objects.bulk_create(observations, batch_size=batch_size)
+
+    return len(observations)
 
 
 def load_mpa():
@@ -1,5 +1,12 @@
 
+import os
+
+from django.conf import settings
+from django.db import transaction
+from tqdm import tqdm
+
 from core import models
+from core.rasters import COG_FOLDER, convert_to_cog, raster_file_path, raster_metadata, raster_set_statistics
 
 rasters = [
     {
@@ -132,7 +139,71 @@ rasters = [
     },
 ]
 
-def load_raster(raster_data: dict) -> None:
+def prepare_raster(raster: models.Rasters) -> models.Rasters:
+    """
+    Convert a raster's file to a cloud optimized GeoTIFF and set its bounds, crs, nodata, value range and stretch
+    values. The COG is only rewritten when the original file is newer. The raster isn't saved.
+    """
+    source = os.path.join(settings.RASTER_DIR, raster.file_name)
+    if not os.path.exists(source):
+        print(f"Missing raster file {source}, it can't be converted")
+        return raster
+
+    cog_file_name = f"{COG_FOLDER}/{raster.file_name}"
+    cog_path = os.path.join(settings.RASTER_DIR, cog_file_name)
+    if not os.path.exists(cog_path) or os.path.getmtime(cog_path) < os.path.getmtime(source):
+        convert_to_cog(source, cog_path)
+    raster.cog_file_name = cog_file_name
+
+    for field, value in raster_metadata(cog_path).items():
+        setattr(raster, field, value)
+
+    return raster
+
+
+def load_raster_statistics(raster_set: models.SpatialRasterSets, zones: list = None) -> int:
+    """
+    Compute and store the RasterZonalStatistics of every raster in a set for every MPA, replacing any the set already
+    had. Returns the number of rows stored.
+
+    Parameters:
+        raster_set: the set to compute the statistics for
+        zones: MPAZones to compute the statistics for, all of them if not given. Passing the zones in lets several
+            sets share one query.
+    """
+    if zones is None:
+        zones = list(models.MPAZones.objects.only('site_id', 'geom'))
+
+    set_rasters = {}
+    for raster in raster_set.rasters.all():
+        path = raster_file_path(raster)
+        if not os.path.exists(path):
+            print(f"Missing raster file {path}, no statistics for {raster}")
+            continue
+        set_rasters.setdefault(path, []).append(raster)
+
+    statistics = raster_set_statistics(list(set_rasters), zones)
+    rows = [
+        models.RasterZonalStatistics(raster=raster, zone_id=zone_id, **summary)
+        for (path, zone_id), summary in statistics.items()
+        for raster in set_rasters[path]
+    ]
+
+    with transaction.atomic():
+        models.RasterZonalStatistics.objects.filter(raster__spatial_set=raster_set).delete()
+        models.RasterZonalStatistics.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
+
+
+def load_all_raster_statistics():
+    """Recompute the zonal statistics of every raster set, e.g. after the MPA shapes are reloaded"""
+    zones = list(models.MPAZones.objects.only('site_id', 'geom'))
+    for raster_set in tqdm(models.SpatialRasterSets.objects.all(), desc="Raster zonal statistics"):
+        load_raster_statistics(raster_set, zones)
+
+
+def load_raster(raster_data: dict, zones: list = None) -> models.SpatialRasterSets:
     model = models.ClimateModels.objects.get(name__iexact=raster_data['model'])
 
     color = models.ColorRamps.objects.get_or_create(name=raster_data['color'])[0]
@@ -150,13 +221,21 @@ def load_raster(raster_data: dict) -> None:
 
     if rasters:=raster_data.get('rasters', None):
         for order, raster in enumerate(rasters):
-            models.Rasters.objects.create(spatial_set=raster_set, order=(order+1), label=raster['label'], file_name=raster['file_name'])
+            raster = models.Rasters(spatial_set=raster_set, order=(order+1), label=raster['label'], file_name=raster['file_name'])
+            prepare_raster(raster).save()
+
+    load_raster_statistics(raster_set, zones)
+
+    return raster_set
 
 
 def load_rasters():
     models.SpatialRasterSets.objects.all().delete()
-    for raster_data in rasters:
-        load_raster(raster_data)
+
+    # every set is summarized over the same MPAs, read them once
+    zones = list(models.MPAZones.objects.only('site_id', 'geom'))
+    for raster_data in tqdm(rasters, desc="Loading rasters"):
+        load_raster(raster_data, zones)
 
 
 if __name__ == '__main__':
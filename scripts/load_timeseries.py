@@ -3,7 +3,8 @@ import re
 import pandas as pd
 import numpy as np
 
-from core import models
+from core import models, partitions
+from scripts import load_timeseries2
 
 from pathlib import Path
 from tqdm import tqdm
@@ -170,6 +171,7 @@ def load_mpas_from_dict(data: dict, climate_model):
     data (dict): Dictionary with MPA IDs as keys and file paths as values
     """
     print(f"Stage 1: Processing {len(data)} MPAs...")
+    partitions.ensure_timeseries_partition(climate_model)
 
     # Main progress bar for MPAs
     with tqdm(total=len(data), desc="Loading MPAs") as mpa_pbar:
@@ -182,6 +184,8 @@ def load_mpas_from_dict(data: dict, climate_model):
                 mpa = models.MPAZones.objects.get(pk=mpa_id)
                 timeseries_type = mpa_dict.get('TYPE', 1)  # 1 == Bottom Timeseries
                 mpa.timeseries.filter(model=climate_model, type=timeseries_type).delete()
+                # the API reads the packed arrays first, drop them with the rows so stale data isn't served
+                mpa.timeseries_arrays.filter(model=climate_model, type=timeseries_type).delete()
 
                 # Stage 2: Process bottom temperature (simpler file)
                 print(f"Timeseries Type {timeseries_type}")
@@ -196,6 +200,10 @@ def load_mpas_from_dict(data: dict, climate_model):
                 if depth_ts:
                     read_depth_timeseries(mpa, depth_ts, climate_model, timeseries_type)
 
+                mpa_pbar.set_postfix(file="Packing")
+                load_timeseries2.pack_timeseries(climate_model, mpa=mpa, timeseries_type=timeseries_type)
+
+                models.TimeseriesCatalog.refresh(zone=mpa, model=climate_model, type=timeseries_type)
                 mpa_pbar.update(1)
 
             except models.MPAZones.DoesNotExist:
@@ -203,6 +211,9 @@ def load_mpas_from_dict(data: dict, climate_model):
             except Exception as e:
                 print(f"Error processing MPA {mpa_id}: {str(e)}")
 
+    # invalidate cached climatologies for the reloaded model
+    climate_model.bump_data_version()
+
     print("Data loading complete!")
 
 
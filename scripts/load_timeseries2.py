@@ -1,8 +1,17 @@
+import functools
+import hashlib
+import io
 import os
 import re
+import time
 import numpy as np
 import pandas as pd
-from core import models
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core import models, partitions
+from core.parallel import run_in_processes
+from core.climatology import compute_climatology
 
 from scripts import load_indicators
 
@@ -13,74 +22,231 @@ import logging
 
 logger = logging.getLogger('dto_info')
 
+TIMESERIES_COPY_COLUMNS = ['zone_id', 'model_id', 'indicator_id', 'type', 'depth', 'date_time', 'value']
+
+
+def read_timeseries_csv(filename, date_col='Date', value_col=None, chunksize=None):
+    """
+    Read a timeseries CSV as a float64 value column indexed by date, skipping any columns that aren't needed.
+
+    Parameters:
+    filename: Path to CSV file containing time series data
+    date_col: Column name containing date information
+    value_col: Column containing the values, defaults to the first column after the date column
+    chunksize: If set, return an iterator of frames with this many rows each
+    """
+    if value_col is None:
+        columns = pd.read_csv(filename, nrows=0).columns
+        value_col = next(col for col in columns if col != date_col)
+
+    if chunksize is None:
+        return next(_read_timeseries_chunks(filename, date_col, value_col, None))
+
+    return _read_timeseries_chunks(filename, date_col, value_col, chunksize)
+
+
+def _read_timeseries_chunks(filename, date_col, value_col, chunksize):
+    read_args = dict(usecols=[date_col, value_col], index_col=date_col, parse_dates=[date_col])
+    rows_read = 0
+    try:
+        reader = pd.read_csv(filename, dtype={value_col: 'float64'}, chunksize=chunksize, **read_args)
+        for chunk in ([reader] if chunksize is None else reader):
+            yield chunk
+            rows_read += len(chunk)
+    except ValueError:
+        # the column has entries that aren't numbers, read the rest of the file as text and turn those into NaN
+        reader = pd.read_csv(filename, dtype={value_col: str}, chunksize=chunksize,
+                             skiprows=range(1, rows_read + 1), **read_args)
+        for chunk in ([reader] if chunksize is None else reader):
+            yield chunk.apply(pd.to_numeric, errors='coerce')
+
+
+def timeseries_frame(mpa, dates, values, climate_model: models.ClimateModels,
+                     variable: models.TimeseriesVariables, timeseries_type=1, depth=None) -> pd.DataFrame:
+    """
+    Build the rows for the Timeseries table as one typed frame with a column per database column.
+
+    Parameters:
+    mpa: MPA object to associate with the time series data
+    dates: Date of each row
+    values: Value of each row, anything that isn't a number is stored as NaN
+    climate_model: What climate model to use when saving data
+    variable: Timeseries type e.g Temperature, Salinity, Chlorophyll
+    timeseries_type: 1 = Bottom timeseries, 2 = Surface timeseries
+    depth: Depth value (in meters) for the time series, or None for surface data. Can also be an array with a
+        depth for each row.
+    """
+    length = len(values)
+    return pd.DataFrame({
+        'zone_id': np.full(length, mpa.pk, dtype=np.int64),
+        'model_id': np.full(length, climate_model.pk, dtype=np.int64),
+        'indicator_id': np.full(length, variable.pk, dtype=np.int64),
+        'type': np.full(length, timeseries_type, dtype=np.int64),
+        'depth': pd.array(np.broadcast_to(np.nan if depth is None else depth, length), dtype='Int64'),
+        'date_time': pd.to_datetime(dates).values,
+        'value': pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64),
+    }, columns=TIMESERIES_COPY_COLUMNS)
+
+
+def copy_timeseries(frame: pd.DataFrame, chunksize=500000):
+    """
+    Stream a frame built by timeseries_frame into the Timeseries table with COPY FROM STDIN, a chunk of rows
+    at a time so the CSV text for the whole frame never has to be in memory.
+
+    Parameters:
+    frame: Rows to insert, with the columns in TIMESERIES_COPY_COLUMNS
+    chunksize: Number of rows to send per COPY
+    """
+    sql = (f"COPY {models.Timeseries._meta.db_table} ({', '.join(TIMESERIES_COPY_COLUMNS)}) "
+           f"FROM STDIN WITH (FORMAT csv, NULL '')")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(frame), chunksize):
+            buffer = io.StringIO()
+            # NaN values are written as 'NaN' which postgres reads as a float NaN, missing depths as NULL
+            chunk = frame.iloc[start:start + chunksize].astype({'depth': 'string'}).fillna({'depth': ''})
+            chunk.to_csv(buffer, header=False, index=False, na_rep='NaN', date_format='%Y-%m-%d')
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+
+
+def insert_timeseries(frame: pd.DataFrame, batch_size=1000):
+    """
+    Insert a frame built by timeseries_frame. On PostgreSQL the rows are streamed in with COPY, other
+    databases fall back to batched bulk inserts.
+
+    Parameters:
+    frame: Rows to insert, with the columns in TIMESERIES_COPY_COLUMNS
+    batch_size: Number of records to insert in each database batch when COPY isn't available
+    """
+    if connection.vendor == 'postgresql':
+        copy_timeseries(frame)
+    else:
+        frame = frame.astype({'depth': object}).replace({'depth': {pd.NA: None}})
+        models.Timeseries.objects.bulk_create(
+            [models.Timeseries(**row) for row in frame.to_dict('records')], batch_size=batch_size
+        )
+
+
 def load_series(mpa, timeseries, climate_model: models.ClimateModels, variable: models.TimeseriesVariables,
                 timeseries_type=1, depth=None, batch_size=1000):
     """
-    Load time series data into the database with batched bulk inserts.
+    Load time series data into the database.
 
     Parameters:
     mpa: MPA object to associate with the time series data
-    timeseries: Pandas DataFrame containing time series data
+    timeseries: Pandas Series, or single column DataFrame, containing time series data indexed by date
     climate_model: What climate model to use when saving data
     timeseries_type: 1 = Bottom timeseries, 2 = Surface timeseries
     depth: Depth value (in meters) for the time series, or None for surface data
     variable: ID of the indicator type (default: 1 for temperature)
-    batch_size: Number of records to insert in each database batch
+    batch_size: Number of records to insert in each database batch when COPY isn't available
     """
     try:
-        # Setup tracking variables
-        add_time_series = []
-        total_rows = len(timeseries)
-        rows_processed = 0
-        batches_completed = 0
-
-        # Initialize progress bar
-        with tqdm(total=total_rows, desc=f"Loading data (depth={depth})") as pbar:
-            # Process each row
-            for row in timeseries.iterrows():
-                try:
-                    # Convert value to float or NaN
-                    value = float(row[1].iloc[0])
-                except ValueError:
-                    value = np.nan
-
-                # Create new time series entry
-                add_time_series.append(
-                    models.Timeseries(
-                        zone=mpa,
-                        model=climate_model,
-                        date_time=row[0],
-                        value=value,
-                        depth=depth,
-                        indicator=variable,
-                        type=timeseries_type,
-                    )
-                )
-
-                rows_processed += 1
-
-                # Batch insert when reaching batch size
-                if len(add_time_series) >= batch_size:
-                    models.Timeseries.objects.bulk_create(add_time_series)
-                    batches_completed += 1
-                    pbar.set_postfix(batches=batches_completed)
-                    add_time_series = []
-
-                # Update progress bar
-                pbar.update(1)
-
-            # Insert any remaining records
-            if add_time_series:
-                models.Timeseries.objects.bulk_create(add_time_series)
-                batches_completed += 1
-
-        print(f"Completed loading {rows_processed} records in {batches_completed} batches")
+        if isinstance(timeseries, pd.DataFrame):
+            timeseries = timeseries.iloc[:, 0]
+
+        frame = timeseries_frame(mpa, timeseries.index, timeseries, climate_model, variable, timeseries_type, depth)
+        insert_timeseries(frame, batch_size)
+
+        print(f"Completed loading {len(frame)} records (depth={depth})")
+        return len(frame)
 
     except Exception as e:
         print(f"Error loading time series data: {str(e)}")
         raise
 
 
+def delete_series(mpa, climate_model: models.ClimateModels, variable: models.TimeseriesVariables, timeseries_type,
+                  depths):
+    """
+    Delete the Timeseries rows and packed arrays of some depths of an MPA's series.
+
+    Parameters:
+    mpa: MPA the series belong to
+    climate_model: Model the series were loaded for
+    variable: Timeseries type e.g Temperature, Salinity, Chlorophyll
+    timeseries_type: 1 = Bottom timeseries, 2 = Surface timeseries
+    depths: Depths to delete, None is the total average bottom/surface series
+    """
+    depths = list(depths)
+    if not depths:
+        return
+
+    depth_filter = Q(depth__in=[depth for depth in depths if depth is not None])
+    if None in depths:
+        depth_filter |= Q(depth__isnull=True)
+
+    series_filter = dict(model=climate_model, indicator=variable, type=timeseries_type)
+    mpa.timeseries.filter(depth_filter, **series_filter).delete()
+    mpa.timeseries_arrays.filter(depth_filter, **series_filter).delete()
+
+
+def store_series_array(mpa, timeseries, climate_model: models.ClimateModels, variable: models.TimeseriesVariables,
+                       timeseries_type=1, depth=None):
+    """
+    Replace the packed TimeseriesArrays row for a single series.
+
+    Parameters:
+    mpa: MPA object to associate with the time series data
+    timeseries: Pandas Series of values indexed by date
+    climate_model: What climate model to use when saving data
+    variable: Timeseries type e.g Temperature, Salinity, Chlorophyll
+    timeseries_type: 1 = Bottom timeseries, 2 = Surface timeseries
+    depth: Depth value (in meters) for the time series, or None for the total average bottom/surface series
+    """
+    values = pd.to_numeric(timeseries, errors='coerce')
+    dates = pd.to_datetime(timeseries.index).values
+
+    mpa.timeseries_arrays.filter(model=climate_model, indicator=variable, type=timeseries_type, depth=depth).delete()
+    if not len(dates):
+        return
+
+    series = models.TimeseriesArrays(zone=mpa, model=climate_model, indicator=variable, type=timeseries_type, depth=depth)
+    series.set_series(dates, values.to_numpy())
+    series.save()
+
+    # materialize the day of year climatology so requests don't have to group the daily data
+    climatology = models.Climatologies(series=series)
+    climatology.set_climatology(compute_climatology(dates, values.to_numpy()))
+    climatology.save()
+
+
+def pack_timeseries(climate_model: models.ClimateModels = None, mpa=None, timeseries_type=None):
+    """
+    Build TimeseriesArrays rows from data already in the Timeseries table, for series that were loaded
+    before the packed arrays existed or by a loader that only writes the Timeseries rows.
+
+    Parameters:
+    climate_model: Only pack series for this model, or every model if None
+    mpa: Only pack series of this MPA, or every MPA if None
+    timeseries_type: Only pack series of this type, or every type if None
+    """
+    timeseries = models.Timeseries.objects.all()
+    if climate_model:
+        timeseries = timeseries.filter(model=climate_model)
+    if mpa:
+        timeseries = timeseries.filter(zone=mpa)
+    if timeseries_type:
+        timeseries = timeseries.filter(type=timeseries_type)
+
+    series_keys = timeseries.values_list('zone', 'model', 'indicator', 'type', 'depth').distinct()
+    for zone_id, model_id, indicator_id, timeseries_type, depth in tqdm(series_keys, desc="Packing series"):
+        rows = models.Timeseries.objects.filter(
+            zone=zone_id, model=model_id, indicator=indicator_id, type=timeseries_type, depth=depth
+        ).order_by('date_time').values_list('date_time', 'value')
+
+        dates, values = zip(*rows)
+        store_series_array(
+            models.MPAZones.objects.get(pk=zone_id),
+            pd.Series(values, index=dates),
+            models.ClimateModels.objects.get(pk=model_id),
+            models.TimeseriesVariables.objects.get(pk=indicator_id),
+            timeseries_type,
+            depth
+        )
+
+
 def read_timeseries_chunk(mpa, filename, climate_model: models.ClimateModels, variable: models.TimeseriesVariables,
                           timeseries_type=1, date_col='Date', chunksize=100000):
     """
@@ -93,7 +259,10 @@ def read_timeseries_chunk(mpa, filename, climate_model: models.ClimateModels, va
     variable: Timeseries type e.g Temperature, Salinity, Chlorophyll
     date_col: Column name containing date information
     chunksize: Number of rows to process at once (for large files)
+
+    Returns the number of rows loaded
     """
+    rows = 0
     try:
         file_path = Path(filename)
         logger.info(f"Loading time series from {file_path.name}")
@@ -107,19 +276,24 @@ def read_timeseries_chunk(mpa, filename, climate_model: models.ClimateModels, va
             logger.info(f"Large file detected, processing in chunks of {chunksize} rows")
 
             # Process file in chunks with progress bar
-            reader = pd.read_csv(filename, chunksize=chunksize)
+            reader = read_timeseries_csv(filename, date_col, chunksize=chunksize)
 
-            # Process each chunk
+            # Process each chunk, keeping the value column so the whole series can be packed at the end
+            series_chunks = []
             for i, chunk in enumerate(tqdm(reader, desc="Processing chunks")):
-                chunk = chunk.set_index(date_col)
-                load_series(mpa, chunk, climate_model, variable, timeseries_type)
+                rows += load_series(mpa, chunk, climate_model, variable, timeseries_type)
+                series_chunks.append(chunk.iloc[:, 0])
+
+            store_series_array(mpa, pd.concat(series_chunks), climate_model, variable, timeseries_type)
 
         else:
             # For smaller files, read all at once
-            timeseries = pd.read_csv(filename)
-            timeseries = timeseries.set_index(date_col)
+            timeseries = read_timeseries_csv(filename, date_col)
             logger.info(f"Read {len(timeseries)} time series records")
-            load_series(mpa, timeseries, climate_model, variable, timeseries_type)
+            rows += load_series(mpa, timeseries, climate_model, variable, timeseries_type)
+            store_series_array(mpa, timeseries.iloc[:, 0], climate_model, variable, timeseries_type)
+
+        return rows
 
     except Exception as e:
         logger.info(f"Error reading time series file {filename}: {str(e)}")
@@ -129,96 +303,292 @@ def read_timeseries_chunk(mpa, filename, climate_model: models.ClimateModels, va
 def read_depth_timeseries(mpa_name, filename, climate_model: models.ClimateModels, variable: models.TimeseriesVariables,
                           timeseries_type=1, date_col='Date'):
     """
-    Read time series data from a CSV file with multiple columns representing different depths.
+    Read time series data from a CSV file with multiple columns representing different depths. The wide file
+    is melted once into date, depth and value arrays and written in a single stream, then each depth is packed.
+    Existing data for the depths in the file is replaced, other depths of the MPA's series are left alone.
 
     Parameters:
     mpa_name: MPA object to associate with the time series data
     filename: Path to CSV file containing depth time series
     date_col: Column name containing date information
+
+    Returns the number of rows loaded and the list of depths they were loaded for
     """
     try:
         # Load the data
         logger.info(f"Reading depth time series from {Path(filename).name}")
-        timeseries = pd.read_csv(filename)
-        timeseries = timeseries.set_index(date_col)
-
-        # Get total columns for progress tracking
-        total_depths = len(timeseries.columns)
-        logger.info(f"Found {total_depths} depth columns to process")
 
-        # Process each depth with progress bar
-        for col in tqdm(timeseries.columns, desc="Processing depths"):
-            try:
-                # Extract depth value from column name (e.g., "10 m depth" -> 10)
-                depth = int(col.split(' ')[0])
-
-                # Get single-column dataframe for this depth
-                depth_timeseries = timeseries[[col]]
+        # Extract depth values from the column names (e.g., "10 m depth" -> 10)
+        columns = pd.read_csv(filename, nrows=0).columns.drop(date_col)
+        depths = pd.to_numeric(columns.str.extract(r'^(-?\d+)(?: |$)', expand=False), errors='coerce')
+        for col in columns[depths.isna()]:
+            logger.error(f"Error processing column '{col}': no depth in the column name")
+
+        depth_columns = columns[depths.notna()]
+        depths = depths[depths.notna()].astype(np.int64)
+
+        read_args = dict(usecols=[date_col, *depth_columns], index_col=date_col, parse_dates=[date_col])
+        try:
+            timeseries = pd.read_csv(filename, dtype={col: 'float64' for col in depth_columns}, **read_args)
+        except ValueError:
+            # some entries aren't numbers, read the values as text and turn those into NaN
+            timeseries = pd.read_csv(filename, dtype={col: str for col in depth_columns}, **read_args)
+            timeseries = timeseries.apply(pd.to_numeric, errors='coerce')
+        values = timeseries[depth_columns].to_numpy(dtype=np.float64)
+
+        # depths the model has no values for at all don't get a series
+        has_data = ~np.isnan(values).all(axis=0)
+        for col in depth_columns[~has_data]:
+            logger.info(f"Skipping column '{col}': no values")
+
+        depths = depths[has_data]
+        values = values[:, has_data]
+        dates = timeseries.index.values
+        logger.info(f"Found {len(depths)} depth columns to process")
+
+        delete_series(mpa_name, climate_model, variable, timeseries_type, depths.tolist())
+
+        # one row per date per depth, grouped by depth
+        frame = timeseries_frame(
+            mpa_name, np.tile(dates, len(depths)), values.T.ravel(), climate_model, variable, timeseries_type,
+            np.repeat(depths, len(dates))
+        )
+        insert_timeseries(frame)
+        logger.info(f"Completed loading {len(frame)} records for {len(depths)} depths")
 
-                # Load the data for this depth
-                load_series(mpa_name, depth_timeseries, climate_model, variable, timeseries_type, depth)
+        for index, depth in enumerate(tqdm(depths, desc="Packing depths")):
+            store_series_array(mpa_name, pd.Series(values[:, index], index=dates), climate_model, variable,
+                               timeseries_type, int(depth))
 
-            except (ValueError, IndexError) as e:
-                logger.error(f"Error processing column '{col}': {str(e)}")
-                continue
+        return len(frame), depths.tolist()
 
     except Exception as e:
         logger.error(f"Error processing file {filename}: {str(e)}")
         raise
 
 
-def load_mpas_from_array(data: list):
+def file_sha256(file_name, block_size=1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_file_unchanged(climate_model: models.ClimateModels, file_name) -> bool:
     """
-    Load time series data for multiple MPAs from dictionary containing file paths.
+    Check a source file against its load manifest. The size and modification time are compared first, the
+    content hash is only computed when the size matches but the file was touched.
 
     Parameters:
-    data (dict): Dictionary with MPA IDs as keys and file paths as values
+    climate_model: Model the file is loaded for
+    file_name: Path to the source file
     """
-    logger.info(f"Stage 1: Processing {len(data)} MPAs...")
+    manifest = models.LoadManifests.objects.filter(model=climate_model, path=os.path.normpath(file_name)).first()
+    if manifest is None:
+        return False
+
+    stat = os.stat(file_name)
+    if manifest.size != stat.st_size:
+        return False
+
+    if manifest.mtime != stat.st_mtime:
+        if manifest.sha256 != file_sha256(file_name):
+            return False
+
+        # same content, just touched. Record the new time so the file isn't hashed again next run
+        manifest.mtime = stat.st_mtime
+        manifest.save(update_fields=['mtime'])
+
+    return True
+
+
+def record_load_manifest(climate_model: models.ClimateModels, file_name, series: list[dict]):
+    """
+    Save the manifest for a source file after it loaded successfully.
+
+    Parameters:
+    climate_model: Model the file was loaded for
+    file_name: Path to the source file
+    series: zone, indicator, type and depth of each series the file produced
+    """
+    stat = os.stat(file_name)
+    models.LoadManifests.objects.update_or_create(
+        model=climate_model,
+        path=os.path.normpath(file_name),
+        defaults={'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': file_sha256(file_name), 'series': series}
+    )
+
+
+def remove_stale_series(climate_model: models.ClimateModels, file_name, previous: list[dict], series: list[dict]):
+    """
+    Delete the series a file produced when it was last loaded but no longer produces. Series another file's load
+    manifest lists are kept, that file loads them too.
+
+    Parameters:
+    climate_model: Model the file is loaded for
+    file_name: Path to the source file
+    previous: series from the file's previous load manifest
+    series: series the file produced this time
+    """
+    for entry in previous:
+        if entry in series:
+            continue
+
+        claimed = models.LoadManifests.objects.filter(model=climate_model, series__contains=[entry]).exclude(
+            path=os.path.normpath(file_name)
+        )
+        if claimed.exists():
+            continue
+
+        mpa = models.MPAZones(pk=entry['zone'])
+        variable = models.TimeseriesVariables(pk=entry['indicator'])
+        delete_series(mpa, climate_model, variable, entry['type'], [entry['depth']])
+
+
+def load_file(file_dict: dict, force=False) -> dict:
+    """
+    Replace the series for one MPA file, unless the file hasn't changed since it was last loaded. Only the series
+    the file contains, or listed in its previous load manifest, are replaced. Files that load different depths of
+    the same MPA series (e.g. the Canso100 and Canso100_GL_levs vlev_mean files) don't remove each other's depths.
+
+    Parameters:
+    file_dict: Dictionary with the 'file_name', 'climate_model', 'timeseries_type' and 'variable' to load
+    force: Reload the file even if its load manifest says it hasn't changed
+
+    Returns a result dictionary with the file name, status ('loaded', 'unchanged', 'skipped' or 'failed'), the
+    number of rows loaded, the seconds it took and the error message if the file failed.
+    """
+    climate_model = file_dict['climate_model']
+    variable = file_dict['variable']
+    file_path_name = file_dict['file_name']
+    file_name = os.path.basename(file_path_name)
+    timeseries_type = file_dict['timeseries_type']
+
+    result = {'file_name': file_name, 'status': 'skipped', 'rows': 0, 'seconds': 0.0, 'error': None}
+    start = time.perf_counter()
+
+    mpa_site_id = file_name.split('_')[0]
+    if not mpa_site_id.isdigit():
+        return result
+
+    try:
+        # Get MPA and clear existing data
+        mpa = models.MPAZones.objects.get(pk=mpa_site_id)
+    except models.MPAZones.DoesNotExist:
+        logger.error(f"MPA {mpa_site_id} not found, skipping")
+        result['error'] = f"MPA {mpa_site_id} not found"
+        return result
+
+    try:
+        # the delete, the new rows and the manifest are committed together, a failed file keeps its old data and
+        # manifest so it's retried on the next run
+        with transaction.atomic():
+            if not force and is_file_unchanged(climate_model, file_path_name):
+                logger.info(f"{file_name} is unchanged since it was last loaded, skipping")
+                result['status'] = 'unchanged'
+                return result
+
+            logger.info(f"Loading MPA {mpa_site_id}, Timeseries Type {timeseries_type}")
+            previous = models.LoadManifests.objects.filter(
+                model=climate_model, path=os.path.normpath(file_path_name)
+            ).values_list('series', flat=True).first() or []
 
-    # Main progress bar for MPAs
-    with tqdm(total=len(data), desc="Loading MPAs") as mpa_pbar:
-        for file_dict in data:
-            climate_model = file_dict['climate_model']
-            variable = file_dict['variable']
-            file_path_name = file_dict['file_name']
-            file_name = os.path.basename(file_path_name)
-            timeseries_type = file_dict['timeseries_type']
-
-            mpa_site_id = file_name.split('_')[0]
-            if not mpa_site_id.isdigit():
-                continue
-
-            mpa_pbar.set_description(f"Loading MPA {mpa_site_id}")
-            try:
-                # Update description with current MPA ID
-
-                # Get MPA and clear existing data
-                mpa = models.MPAZones.objects.get(pk=mpa_site_id)
-            except:
-                logger.error(f"MPA {mpa_site_id} not found, skipping")
-                continue
-
-            # Stage 2: Process bottom temperature (simpler file)
-            logger.info(f"Timeseries Type {timeseries_type}")
-            mpa_pbar.set_postfix(file=f"Temperature")
             if 'ts.csv' in file_name:
-                mpa.timeseries.filter(model=climate_model, indicator=variable, type=timeseries_type, depth=None).delete()
-                read_timeseries_chunk(mpa, file_path_name, climate_model, variable, timeseries_type)
+                depths = [None]
+                delete_series(mpa, climate_model, variable, timeseries_type, depths)
+                result['rows'] = read_timeseries_chunk(mpa, file_path_name, climate_model, variable,
+                                                       timeseries_type)
             elif 'vlev_mean.csv' in file_name or 'vlev_mean_GL.csv' in file_name:
-                mpa.timeseries.filter(model=climate_model, indicator=variable, type=timeseries_type, depth__gt=0).delete()
-                read_depth_timeseries(mpa, file_path_name, climate_model, variable, timeseries_type)
+                result['rows'], depths = read_depth_timeseries(mpa, file_path_name, climate_model, variable,
+                                                               timeseries_type)
             else:
                 logger.error(f"Skipping file: {file_name} (unrecognized pattern)")
-                continue
+                return result
+
+            series = [
+                {'zone': mpa.pk, 'indicator': variable.pk, 'type': timeseries_type, 'depth': depth}
+                for depth in depths
+            ]
+            remove_stale_series(climate_model, file_path_name, previous, series)
+            record_load_manifest(climate_model, file_path_name, series)
+            models.TimeseriesCatalog.refresh(zone=mpa, model=climate_model, indicator=variable, type=timeseries_type)
+
+        result['status'] = 'loaded'
+    except Exception as e:
+        logger.error(f"Failed to load {file_name}: {str(e)}")
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    finally:
+        result['seconds'] = time.perf_counter() - start
+
+    return result
+
+
+def log_load_summary(results: list[dict]):
+    """Log the totals for a load and the errors for any files that failed"""
+    loaded = [result for result in results if result['status'] == 'loaded']
+    unchanged = [result for result in results if result['status'] == 'unchanged']
+    failed = [result for result in results if result['status'] == 'failed']
 
+    logger.info(
+        f"Loaded {len(loaded)} files ({sum(result['rows'] for result in loaded)} rows) in "
+        f"{sum(result['seconds'] for result in results):.1f} worker seconds, {len(unchanged)} unchanged, "
+        f"{len(results) - len(loaded) - len(unchanged) - len(failed)} skipped, {len(failed)} failed"
+    )
+    for result in failed:
+        logger.error(f"{result['file_name']}: {result['error']}")
+
+
+def load_mpas_from_array(data: list, workers: int = 1, force=False) -> list[dict]:
+    """
+    Load time series data for multiple MPAs from dictionary containing file paths.
+
+    Parameters:
+    data (list): List of dictionaries with the file path, climate model, timeseries type and variable to load
+    workers: Number of processes to load files in. Each file is an independent MPA series so they can be
+        loaded in parallel, each worker uses its own database connection.
+    force: Reload every file, even the ones whose load manifest says they haven't changed
+
+    Returns the result from load_file for each file. A file that fails doesn't stop the others from loading.
+    """
+    logger.info(f"Stage 1: Processing {len(data)} MPAs...")
+
+    climate_models = {file_dict['climate_model'].pk: file_dict['climate_model'] for file_dict in data}.values()
+
+    # make sure each model has its own Timeseries partition before writing to it
+    for climate_model in climate_models:
+        partitions.ensure_timeseries_partition(climate_model)
+
+    # results are kept in the same order as data
+    results = [None] * len(data)
+    positions = {id(file_dict): index for index, file_dict in enumerate(data)}
+    with tqdm(total=len(data), desc="Loading MPAs") as mpa_pbar:
+        for file_dict, result, error in run_in_processes(functools.partial(load_file, force=force), data, workers):
+            if error is not None:
+                # the worker process itself died, load_file already catches errors from the load
+                file_name = os.path.basename(file_dict['file_name'])
+                logger.error(f"Worker failed loading {file_name}: {str(error)}")
+                result = {'file_name': file_name, 'status': 'failed', 'rows': 0, 'seconds': 0.0, 'error': str(error)}
+            results[positions[id(file_dict)]] = result
+            mpa_pbar.update(1)
+
+    # invalidate cached climatologies for every model that had a file reloaded
+    reloaded = {file_dict['climate_model'].pk for file_dict, result in zip(data, results) if result['status'] == 'loaded'}
+    for climate_model in climate_models:
+        if climate_model.pk in reloaded:
+            climate_model.bump_data_version()
+
+    log_load_summary(results)
     logger.info("Data loading complete!")
 
+    return results
+
 
 def load_canso100():
     load_model('Canso100', 'CANSO100')
 
-def load_model(model_dir, climate_model):
+def load_model(model_dir, climate_model, workers=1, force=False):
 
     root_path = Path(f'./scripts/data/model_bottom_conditions_tables/{model_dir}/')
     logger.info(f"Loading {climate_model.name} files")
@@ -257,9 +627,9 @@ def load_model(model_dir, climate_model):
             }
         )
 
-    load_mpas_from_array(load_dict)
+    load_mpas_from_array(load_dict, workers, force)
 
-def load_model_file(model_dir, file_name, model_name):
+def load_model_file(model_dir, file_name, model_name, force=False):
 
     root_path = Path(f'./scripts/data/model_bottom_conditions_tables/{model_dir}/')
     logger.info(f"Loading {model_name} files")
@@ -296,47 +666,60 @@ def load_model_file(model_dir, file_name, model_name):
         }
     )
 
-    load_mpas_from_array(load_dict)
+    load_mpas_from_array(load_dict, force=force)
     climate_model.indicators.filter()
     load_indicators.load_std_anomalies(climate_model)
 
 
-def load_mpas():
-    models.ClimateModels.objects.exclude(name__iexact='glorys').delete()
+def get_model(pk, model_name) -> models.ClimateModels:
+    return models.ClimateModels.objects.get_or_create(pk=pk, defaults={'name': model_name, 'priority': 2})[0]
+
+
+def load_mpas(workers=1, force=False):
+    # workers: number of processes to load each model's files with, see load_mpas_from_array
+    # force: drop every model and reload all of their files. Otherwise only files that changed since the
+    #   last load are reloaded
+    if force:
+        # swapping a model's partition for an empty one is far cheaper than cascading the delete through its
+        # timeseries rows, the delete below then only cascades through the packed arrays and the smaller tables.
+        # The models are recreated with the same ids, so they load straight into the empty partitions.
+        for climate_model in models.ClimateModels.objects.exclude(name__iexact='glorys'):
+            partitions.replace_timeseries_partition(climate_model)
+        models.ClimateModels.objects.exclude(name__iexact='glorys').delete()
 
     model_name = "Canso100"
-    climate_model = models.ClimateModels.objects.create(pk=2, name=model_name, priority=2)
-    load_model('Canso100', climate_model)
-    load_model('Canso100_GL_levs', climate_model)
+    climate_model = get_model(2, model_name)
+    load_model('Canso100', climate_model, workers, force)
+    load_model('Canso100_GL_levs', climate_model, workers, force)
     climate_model.indicators.filter()
     load_indicators.load_std_anomalies(climate_model)
 
     model_name = "Canso500"
-    climate_model = models.ClimateModels.objects.create(pk=3, name=model_name, priority=2)
-    load_model('Canso500', climate_model)
-    load_model('Canso500_GL_levs', climate_model)
+    climate_model = get_model(3, model_name)
+    load_model('Canso500', climate_model, workers, force)
+    load_model('Canso500_GL_levs', climate_model, workers, force)
     climate_model.indicators.filter()
     load_indicators.load_std_anomalies(climate_model)
 
     model_name = "CIOPSE"
-    climate_model = models.ClimateModels.objects.create(pk=4, name=model_name, priority=2)
-    load_model('CIOPSE/Run1', climate_model)
-    load_model('CIOPSE/Run2', climate_model)
-    load_model('CIOPSE/Run3', climate_model)
-    load_model('CIOPSE_GL_levs', climate_model)
+    climate_model = get_model(4, model_name)
+    load_model('CIOPSE/Run1', climate_model, workers, force)
+    load_model('CIOPSE/Run2', climate_model, workers, force)
+    load_model('CIOPSE/Run3', climate_model, workers, force)
+    load_model('CIOPSE_GL_levs', climate_model, workers, force)
     climate_model.indicators.filter()
     load_indicators.load_std_anomalies(climate_model)
 
     model_name = "Fundy500"
-    climate_model = models.ClimateModels.objects.create(pk=5, name=model_name, priority=2)
-    load_model('Fundy500', climate_model)
-    load_model('Fundy500_GL_levs', climate_model)
+    climate_model = get_model(5, model_name)
+    load_model('Fundy500', climate_model, workers, force)
+    load_model('Fundy500_GL_levs', climate_model, workers, force)
     climate_model.indicators.filter()
     load_indicators.load_std_anomalies(climate_model)
 
     model_name = "SJ100"
-    climate_model = models.ClimateModels.objects.create(pk=6, name=model_name, priority=2)
-    load_model('SJ100', climate_model)
-    load_model('SJ100_GL_levs', climate_model)
+    climate_model = get_model(6, model_name)
+    load_model('SJ100', climate_model, workers, force)
+    load_model('SJ100_GL_levs', climate_model, workers, force)
     climate_model.indicators.filter()
     load_indicators.load_std_anomalies(climate_model)